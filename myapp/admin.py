@@ -1,16 +1,74 @@
-from django.contrib import admin
-from .models import Category, Product, Client, Order, Profile
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from .bulk import MAX_STOCK, increase_stock, reprice, toggle_availability
+from .models import Category, Product, Client, Order, Profile, AvatarJob, DailyOrderRollup
+from .order_export import CONTENT_TYPES, export_rows, stream_rows
+from .pagination import ApproximateCountPaginator
+from .status import advance_orders
 
 
-def increase_product_stock(request, queryset):
-    for qs in queryset:
-        qs.stock += 50
-        qs.save()
+class ProductActionForm(ActionForm):
+    amount = forms.DecimalField(required=False, label='Amount',
+                                help_text='Units for "increase stock", percent for "reprice".')
+
+
+# Amount as read by "increase stock"; a price cut is negative, but not a restock
+UNITS = forms.IntegerField(required=False, min_value=1, max_value=MAX_STOCK)
+
+
+def _amount(request, default=None):
+    try:
+        amount = ProductActionForm.base_fields['amount'].clean(request.POST.get('amount'))
+    except ValidationError:
+        return default
+    return default if amount is None else amount
+
+
+@admin.action(description='Increase stock (by Amount, default 50)')
+def increase_product_stock(modeladmin, request, queryset):
+    try:
+        units = UNITS.clean(request.POST.get('amount')) or 50
+    except ValidationError as exc:
+        modeladmin.message_user(request, f'Amount: {" ".join(exc.messages)}', messages.ERROR)
+        return
+    result = increase_stock(queryset, units)
+    modeladmin.message_user(request, f'Increase stock by {units}: {result}.')
+
+
+@admin.action(description='Refill selected products (+100)')
+def refill_products(modeladmin, request, queryset):
+    result = increase_stock(queryset, 100)
+    modeladmin.message_user(request, f'Refill: {result}.')
+
+
+@admin.action(description='Toggle availability')
+def toggle_product_availability(modeladmin, request, queryset):
+    modeladmin.message_user(request, f'Toggle availability: {toggle_availability(queryset)}.')
+
+
+@admin.action(description='Reprice by Amount percent')
+def reprice_products(modeladmin, request, queryset):
+    percent = _amount(request)
+    if percent is None:
+        modeladmin.message_user(request, 'Enter the percentage in Amount.', messages.ERROR)
+        return
+    try:
+        result = reprice(queryset, percent)
+    except ValueError as exc:
+        modeladmin.message_user(request, str(exc), messages.ERROR)
+        return
+    modeladmin.message_user(request, f'Reprice by {percent}%: {result}.')
 
 
 class ProductAdmin(admin.ModelAdmin):
     list_display = ('name', 'category', 'price', 'stock', 'available')
-    actions = [increase_product_stock]
+    actions = [increase_product_stock, refill_products, toggle_product_availability, reprice_products]
+    action_form = ProductActionForm
 
     class Meta:
         model = Product
@@ -24,10 +82,112 @@ def interested_in(obj):
 class ClientAdmin(admin.ModelAdmin):
     list_display = ('first_name', 'last_name', 'city', interested_in)
     interested_in.short_description = 'Interested in'
+    search_fields = ('username',)
+    search_help_text = 'Exact username'
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
 
     class Meta:
         model = Client
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('interested_in')
+
+    def get_search_results(self, request, queryset, search_term):
+        # auth_user.username is unique, so an exact match is an index lookup
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        return queryset.filter(username=search_term), False
+
+
+def _export_orders(queryset, fmt):
+    response = StreamingHttpResponse(stream_rows(export_rows(queryset), fmt), content_type=CONTENT_TYPES[fmt])
+    filename = f'orders-{timezone.localdate():%Y%m%d}.{fmt}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+# With "select all", the queryset is every order matching the changelist filters.
+@admin.action(description='Export selected orders as CSV')
+def export_orders_csv(modeladmin, request, queryset):
+    return _export_orders(queryset, 'csv')
+
+
+@admin.action(description='Export selected orders as JSON Lines')
+def export_orders_jsonl(modeladmin, request, queryset):
+    return _export_orders(queryset, 'jsonl')
+
+
+def _advance(modeladmin, request, queryset, status, label):
+    try:
+        result = advance_orders(queryset, status)
+    except ValueError as exc:
+        modeladmin.message_user(request, str(exc), messages.ERROR)
+        return
+    modeladmin.message_user(request, f'{label}: {result}.')
+
+
+@admin.action(description='Mark selected orders shipped')
+def ship_orders(modeladmin, request, queryset):
+    _advance(modeladmin, request, queryset, Order.SHIPPED, 'Ship')
+
+
+@admin.action(description='Mark selected orders delivered')
+def deliver_orders(modeladmin, request, queryset):
+    _advance(modeladmin, request, queryset, Order.DELIVERED, 'Deliver')
+
+
+@admin.action(description='Cancel selected orders (returns stock)')
+def cancel_orders(modeladmin, request, queryset):
+    _advance(modeladmin, request, queryset, Order.CANCELLED, 'Cancel')
+
+
+class OrderAdmin(admin.ModelAdmin):
+    list_display = ('id', 'product', 'client', 'num_units', 'order_status', 'status_date')
+    list_select_related = ('product', 'client')
+    list_filter = ('order_status', 'product__category__warehouse')
+    date_hierarchy = 'status_date'
+    raw_id_fields = ('product', 'client')
+    search_fields = ('client__username', 'product__name')
+    search_help_text = 'Order id, exact client username or exact product name'
+    actions = [ship_orders, deliver_orders, cancel_orders, export_orders_csv, export_orders_jsonl]
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
+
+    class Meta:
+        model = Order
+
+    def get_search_results(self, request, queryset, search_term):
+        # Resolve the term to keys first so every lookup can use an index,
+        # instead of LIKE '%term%' across two joined tables.
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        if search_term.isdigit():
+            return queryset.filter(pk=int(search_term)), False
+        return queryset.filter(
+            Q(client_id__in=Client.objects.filter(username=search_term).values('pk'))
+            | Q(product_id__in=Product.objects.filter(name=search_term).values('pk'))
+        ), False
+
+
+class DailyOrderRollupAdmin(admin.ModelAdmin):
+    # maintained by refresh_rollups; read-only here
+    list_display = ('day', 'category', 'province', 'order_status', 'num_orders', 'num_units', 'total_revenue')
+    list_select_related = ('category',)
+    list_filter = ('order_status', 'province', 'category__warehouse')
+    date_hierarchy = 'day'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 
 # Register your models here.
 
@@ -35,5 +195,7 @@ class ClientAdmin(admin.ModelAdmin):
 admin.site.register(Category)
 admin.site.register(Product, ProductAdmin)
 admin.site.register(Client, ClientAdmin)
-admin.site.register(Order),
+admin.site.register(Order, OrderAdmin)
 admin.site.register(Profile)
+admin.site.register(AvatarJob)
+admin.site.register(DailyOrderRollup, DailyOrderRollupAdmin)
@@ -0,0 +1,140 @@
+"""
+Revenue, units and order counts, aggregated in SQL.
+
+``order_totals`` groups the orders themselves; ``rollup_totals`` answers the
+same question from DailyOrderRollup, one row per day, category, client
+province and status, which is what dashboards should read. Orders have no
+creation date, so "day" is the order's ``status_date``.
+
+Triggers (migration 0014, SQLite only) append every change to an order's
+contribution to RollupChange, and ``refresh_rollups`` adds the changes up to
+the newest one it saw into the rollups in a single statement, so its cost
+follows the number of changed orders, not the size of the table. Revenue is
+``price * num_units`` at the product's current price: repricing a product
+changes every order of it, so the trigger only records its category in
+RollupRebuild and the refresh rebuilds that category from its orders.
+"""
+from decimal import Decimal
+
+from django.db import connections, router, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Max, Sum
+
+from .models import Category, DailyOrderRollup, Order, RollupChange, RollupRebuild
+
+# report dimension -> lookup on Order and on DailyOrderRollup
+DIMENSIONS = {
+    'day': ('status_date', 'day'),
+    'category': ('product__category', 'category'),
+    'warehouse': ('product__category__warehouse', 'category__warehouse'),
+    'province': ('client__province', 'province'),
+    'status': ('order_status', 'order_status'),
+}
+CENT = Decimal('0.01')
+
+
+def _grouped(queryset, by, side):
+    """``queryset.values()`` over the report dimensions ``by``, named as in DIMENSIONS."""
+    unknown = [name for name in by if name not in DIMENSIONS]
+    if unknown:
+        raise ValueError(f'Unknown dimensions: {", ".join(unknown)}. Choose from: {", ".join(DIMENSIONS)}.')
+    names = [name for name in by if DIMENSIONS[name][side] == name]
+    renamed = {name: F(DIMENSIONS[name][side]) for name in by if DIMENSIONS[name][side] != name}
+    return queryset.values(*names, **renamed).order_by(*by)
+
+
+def _rows(grouped):
+    rows = list(grouped)
+    for row in rows:
+        # SQLite sums decimals as floats
+        if row['revenue'] is not None:
+            row['revenue'] = row['revenue'].quantize(CENT)
+    return rows
+
+
+def order_totals(by=('category',), orders=None):
+    """Totals per combination of ``by`` dimensions, straight from the orders."""
+    orders = Order.objects.all() if orders is None else orders
+    revenue = ExpressionWrapper(F('product__price') * F('num_units'),
+                                output_field=DecimalField(max_digits=20, decimal_places=2))
+    return _rows(_grouped(orders, by, 0).annotate(
+        orders=Count('id'), units=Sum('num_units'), revenue=Sum(revenue)))
+
+
+def rollup_totals(by=('category',), start=None, end=None, statuses=None):
+    """
+    Totals per combination of ``by`` dimensions from the rollups, for days
+    from ``start`` to ``end`` inclusive and the given order statuses.
+    """
+    rollups = DailyOrderRollup.objects.all()
+    if start is not None:
+        rollups = rollups.filter(day__gte=start)
+    if end is not None:
+        rollups = rollups.filter(day__lte=end)
+    if statuses is not None:
+        rollups = rollups.filter(order_status__in=statuses)
+    return _rows(_grouped(rollups, by, 1).annotate(
+        orders=Sum('num_orders'), units=Sum('num_units'), revenue=Sum('total_revenue')))
+
+
+def _rebuild(orders, using):
+    rows = order_totals(('day', 'category', 'province', 'status'), orders)
+    DailyOrderRollup.objects.using(using).bulk_create((
+        DailyOrderRollup(day=row['day'], category_id=row['category'], province=row['province'],
+                         order_status=row['status'], num_orders=row['orders'], num_units=row['units'],
+                         total_revenue=row['revenue'])
+        for row in rows
+    ), batch_size=1000)
+    return len(rows)
+
+
+def _apply_changes(using, newest):
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    rollups = qn(DailyOrderRollup._meta.db_table)
+    changes = qn(RollupChange._meta.db_table)
+    categories = qn(Category._meta.db_table)
+    key = 'day, category_id, province, order_status'
+    with connection.cursor() as cursor:
+        # Changes for a category deleted since are dropped; its rollups went with it.
+        cursor.execute(
+            f'INSERT INTO {rollups} ({key}, num_orders, num_units, total_revenue) '
+            f'SELECT {key}, SUM(num_orders), SUM(num_units), SUM(total_revenue) FROM {changes} '
+            f'WHERE id <= %s AND category_id IN (SELECT id FROM {categories}) GROUP BY {key} '
+            f'ON CONFLICT ({key}) DO UPDATE SET '
+            f'num_orders = {rollups}.num_orders + excluded.num_orders, '
+            f'num_units = {rollups}.num_units + excluded.num_units, '
+            f'total_revenue = ROUND({rollups}.total_revenue + excluded.total_revenue, 2)',
+            [newest])
+
+
+def refresh_rollups(full=False):
+    """
+    Bring the rollups up to date. Returns the number of changes applied, or
+    with ``full`` the number of rollup rows rebuilt from the orders.
+    """
+    using = router.db_for_write(DailyOrderRollup)
+    changes = RollupChange.objects.using(using)
+    rebuilds = RollupRebuild.objects.using(using)
+    with transaction.atomic(using=using):
+        if full:
+            changes.all().delete()
+            rebuilds.all().delete()
+            DailyOrderRollup.objects.using(using).all().delete()
+            # Read the primary: a lagging replica would write stale totals.
+            return _rebuild(Order.objects.using(using), using)
+        newest = changes.aggregate(newest=Max('id'))['newest'] or 0
+        newest_rebuild = rebuilds.aggregate(newest=Max('id'))['newest'] or 0
+        if not newest and not newest_rebuild:
+            return 0
+        # The orders are read in the same transaction as the changes, so a
+        # rebuilt category already includes its pending changes.
+        stale = set(rebuilds.filter(id__lte=newest_rebuild).values_list('category_id', flat=True))
+        applied = rebuilds.filter(id__lte=newest_rebuild).delete()[0]
+        applied += changes.filter(id__lte=newest, category_id__in=stale).delete()[0]
+        _apply_changes(using, newest)
+        applied += changes.filter(id__lte=newest).delete()[0]
+        if stale:
+            DailyOrderRollup.objects.using(using).filter(category__in=stale).delete()
+            _rebuild(Order.objects.using(using).filter(product__category__in=stale), using)
+        DailyOrderRollup.objects.using(using).filter(num_orders=0).delete()
+        return applied
@@ -0,0 +1,160 @@
+"""
+Read-only JSON catalog API.
+
+    GET api/categories/
+    GET api/categories/<id>/products/
+    GET api/products/<id>/
+    GET api/search/?q=<words>[&category=<id>][&available=1|0|any]
+
+Lists are keyset paginated (``?cursor=``, ``?size=``) and every endpoint takes
+``?fields=a,b`` to return only some fields; other query parameters are ignored.
+Bodies of 200 bytes or more are gzip-compressed for clients that accept it.
+
+The encoded body is cached together with a strong ETag hashed from it, so the
+ETag changes with any field (stock included), differs between gzip and
+identity, and is the same on every worker. A client revalidating unchanged data
+gets a 304 straight from the cached ETag, without a query or any rendering.
+"""
+import hashlib
+import json
+import re
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import quote_etag, urlencode
+from django.utils.text import compress_string
+from django.views.decorators.http import require_safe
+
+from .catalog_cache import catalog_cache
+from .models import Category, Product
+from .pagination import keyset_page, page_size_from
+from .search import AVAILABILITY, search_products
+
+CATEGORY_FIELDS = ('id', 'name', 'warehouse')
+PRODUCT_FIELDS = ('id', 'category', 'name', 'description', 'price', 'stock', 'available', 'interested')
+COLUMNS = {'category': 'category_id'}
+# the query parameters any endpoint reads; only these key the cache and
+# carry over into next-page links
+QUERY_PARAMS = ('q', 'category', 'available', 'fields', 'size', 'cursor')
+# as GZipMiddleware
+GZIP_MIN_LENGTH = 200
+_ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def query_params(request):
+    """The non-empty QUERY_PARAMS of ``request``, in a fixed order."""
+    return {name: request.GET[name] for name in QUERY_PARAMS if request.GET.get(name)}
+
+
+def encode_body(payload, gzipped):
+    """``(body, content encoding, ETag)`` of ``payload`` as compact JSON."""
+    body = json.dumps(payload, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+    encoding = None
+    if gzipped and len(body) >= GZIP_MIN_LENGTH:
+        compressed = compress_string(body)
+        if len(compressed) < len(body):
+            body, encoding = compressed, 'gzip'
+    return body, encoding, quote_etag(hashlib.md5(body).hexdigest())
+
+
+def api_view(view):
+    """Wrap ``view`` (which returns a payload dict) with caching, ETags and gzip."""
+    @require_safe
+    def api(request, *args, **kwargs):
+        gzipped = bool(_ACCEPTS_GZIP.search(request.META.get('HTTP_ACCEPT_ENCODING', '')))
+        try:
+            body, encoding, etag = catalog_cache.get_or_load(
+                'api', lambda: encode_body(view(request, *args, **kwargs), gzipped),
+                request.path, urlencode(query_params(request)), gzipped)
+        except ApiError as exc:
+            response = JsonResponse({'error': str(exc)}, status=exc.status)
+        else:
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = HttpResponse(body, content_type='application/json')
+                if encoding:
+                    response['Content-Encoding'] = encoding
+            response['ETag'] = etag
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+    api.__name__ = view.__name__
+    api.__doc__ = view.__doc__
+    return api
+
+
+def selected_fields(request, allowed):
+    """Fields requested with ``?fields=``, or all of ``allowed``."""
+    requested = request.GET.get('fields')
+    if not requested:
+        return allowed
+    fields = tuple(dict.fromkeys(name.strip() for name in requested.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in allowed]
+    if unknown:
+        raise ApiError(f'Unknown fields: {", ".join(unknown)}. Choose from: {", ".join(allowed)}.')
+    return fields
+
+
+def serialize(row, fields):
+    item = {}
+    for name in fields:
+        column = COLUMNS.get(name, name)
+        value = row[column] if isinstance(row, dict) else getattr(row, column)
+        item[name] = str(value) if name == 'price' else value
+    return item
+
+
+def page_payload(request, queryset, fields):
+    """One keyset page of ``queryset`` as ``{"results": [...], "next": url}``."""
+    page_size = page_size_from(request, settings.CATALOG_PAGE_SIZE, settings.CATALOG_MAX_PAGE_SIZE)
+    columns = {'id', *(COLUMNS.get(name, name) for name in fields)}
+    page = keyset_page(queryset.values(*columns), ('id',), request.GET.get('cursor'), page_size)
+    return {'results': [serialize(row, fields) for row in page], 'next': next_page_url(request, page)}
+
+
+def next_page_url(request, page):
+    if not page.has_next:
+        return None
+    return request.path + '?' + urlencode({**query_params(request), 'cursor': page.next_cursor})
+
+
+@api_view
+def categories(request):
+    return page_payload(request, Category.objects.all(), selected_fields(request, CATEGORY_FIELDS))
+
+
+@api_view
+def category_products(request, cat_no):
+    fields = selected_fields(request, PRODUCT_FIELDS)
+    if not Category.objects.filter(pk=cat_no).exists():
+        raise ApiError('No such category.', status=404)
+    return page_payload(request, Product.objects.filter(category_id=cat_no, available=True), fields)
+
+
+@api_view
+def product(request, prod_id):
+    fields = selected_fields(request, PRODUCT_FIELDS)
+    row = Product.objects.filter(pk=prod_id).values(*{COLUMNS.get(name, name) for name in fields}).first()
+    if row is None:
+        raise ApiError('No such product.', status=404)
+    return serialize(row, fields)
+
+
+@api_view
+def search(request):
+    fields = selected_fields(request, PRODUCT_FIELDS)
+    try:
+        category = int(request.GET['category']) if request.GET.get('category') else None
+    except ValueError:
+        raise ApiError('category must be an id.')
+    available = AVAILABILITY.get(request.GET.get('available', '1'), True)
+    page_size = page_size_from(request, settings.CATALOG_PAGE_SIZE, settings.CATALOG_MAX_PAGE_SIZE)
+    page = search_products(request.GET.get('q'), category, available, request.GET.get('cursor'), page_size)
+    return {'results': [serialize(product, fields) for product in page], 'next': next_page_url(request, page)}
@@ -0,0 +1,167 @@
+"""
+Async versions of the catalog and order views, served under ``async/``.
+
+Queries use the async ORM and the catalog cache's async API. Django's session
+and auth lookups are still blocking, so ``_user`` resolves the user once per
+request in a worker thread and stores it on the request; templates then read
+the already-loaded user (and profile) without touching the database from the
+event loop. Order placement runs the form validation and the stock
+reservation, which need a transaction, in a worker thread.
+"""
+from datetime import datetime
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404
+from django.shortcuts import redirect, render
+from django.urls import reverse
+
+from .catalog_cache import catalog_cache
+from .counters import get_interest_counter
+from .forms import InterestForm, OrderForm
+from .middleware import LOGIN_AT
+from .models import Category, Client, Order, Product, Profile
+from .pagination import akeyset_page, page_size_from
+from .reservations import ReservationStatus, reserve_order
+
+
+async def _list(queryset):
+    return [item async for item in queryset]
+
+
+async def _user(request):
+    """Load the session user off the event loop, with its profile for templates."""
+    user = await sync_to_async(auth.get_user)(request)
+    if user.is_authenticated:
+        profile = await Profile.objects.filter(user_id=user.pk).afirst()
+        # Cache the reverse relation, a missing profile included.
+        Profile.user.field.remote_field.set_cached_value(user, profile)
+    request.user = user
+    return user
+
+
+def login_required(view):
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await _user(request)
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+async def index(request):
+    cat_list = await catalog_cache.aget_or_load('categories', lambda: _list(Category.objects.order_by('id')[:10]))
+    await _user(request)
+    msg = ""
+    last_login = "your logged out"
+    if request.login_expired:
+        msg = "Your last login was more than one hour ago"
+    elif request.session.get(LOGIN_AT):
+        last_login = datetime.fromtimestamp(request.session[LOGIN_AT]).replace(microsecond=0)
+    context = {
+        'cat_list': cat_list,
+        'last_login': last_login,
+        'user': request.user,
+        'msg': msg
+    }
+    return render(request, 'myapp/index.html', context=context)
+
+
+async def detail(request, cat_no):
+    category = await catalog_cache.aget_or_load('category', lambda: Category.objects.filter(pk=cat_no).afirst(),
+                                                cat_no)
+    if category is None:
+        raise Http404('No Category matches the given query.')
+    cursor = request.GET.get('cursor')
+    page_size = page_size_from(request, settings.CATALOG_PAGE_SIZE, settings.CATALOG_MAX_PAGE_SIZE)
+    products = await catalog_cache.aget_or_load(
+        'category-products',
+        lambda: akeyset_page(Product.objects.filter(category=category, available=True), ('id',), cursor, page_size),
+        cat_no, page_size, cursor,
+    )
+    await _user(request)
+    return render(request, 'myapp/detail.html', {'category': category, 'products': products})
+
+
+async def products(request):
+    cursor = request.GET.get('cursor')
+    page_size = page_size_from(request, settings.CATALOG_PAGE_SIZE, settings.CATALOG_MAX_PAGE_SIZE)
+    prodlist = await catalog_cache.aget_or_load(
+        'products',
+        lambda: akeyset_page(Product.objects.filter(available=True), ('id',), cursor, page_size),
+        page_size, cursor,
+    )
+    await _user(request)
+    return render(request, 'myapp/products.html', {'prodlist': prodlist})
+
+
+@login_required
+async def place_order(request):
+    msg = ''
+    if request.method == 'POST':
+        form = OrderForm(request.POST, user=request.user)
+        if await sync_to_async(form.is_valid)():
+            order = form.save(commit=False)
+            result = await sync_to_async(reserve_order)(order)
+            if result.reserved:
+                msg = 'Your order has been placed successfully.'
+            else:
+                if result.status is ReservationStatus.INSUFFICIENT:
+                    msg = 'We do not have sufficient stock to fill your order !!!'
+                else:
+                    msg = 'The store is busy right now, please try placing your order again.'
+                return render(request, 'myapp/order_response.html', {'msg': msg})
+    else:
+        form = OrderForm(user=request.user)
+    # Rendering the form looks up the selected client and product.
+    return await sync_to_async(render)(request, 'myapp/placeorder.html', {'form': form, 'msg': msg})
+
+
+@login_required
+async def productdetail(request, prod_id):
+    try:
+        msg = ''
+        product = await Product.objects.aget(id=prod_id)
+        counter = get_interest_counter()
+        if request.method == 'GET':
+            form = InterestForm()
+        elif request.method == 'POST':
+            form = InterestForm(request.POST)
+            if form.is_valid():
+                interested = form.cleaned_data['interested']
+                if int(interested) == 1:
+                    # May flush the buffered counts to the database.
+                    await sync_to_async(counter.increment)(product.id)
+                    return redirect(reverse('myapp:async-index'))
+        product.interested += counter.pending(product.id)
+        return render(request, 'myapp/productdetail.html', {'form': form, 'msg': msg, 'product': product})
+    except Product.DoesNotExist:
+        msg = 'The requested product does not exist. Please provide correct product id !!!'
+        return render(request, 'myapp/productdetail.html', {'msg': msg})
+
+
+async def myorders(request):
+    try:
+        user = await _user(request)
+        if not user.is_authenticated:
+            return redirect('myapp:login')
+        client = await Client.objects.aget(pk=user.pk)
+        products = Product.objects.filter(order__client=client).distinct().order_by('name')
+        product_names = await _list(products.values_list('name', flat=True))
+        msg = f'Orders placed by {client} :-'
+        if not product_names:
+            msg = f'{client} has not placed any orders'
+        history = await akeyset_page(
+            Order.objects.filter(client=client).select_related('product').with_line_total(),
+            ('-status_date', '-id'),
+            cursor=request.GET.get('cursor'),
+            page_size=settings.ORDER_HISTORY_PAGE_SIZE,
+        )
+        return render(request, 'myapp/myorders.html', {'orders': product_names, 'history': history, 'msg': msg})
+    except Client.DoesNotExist:
+        msg = 'You are not a registered client'
+        return render(request, 'myapp/myorders.html', {'msg': msg})
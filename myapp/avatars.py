@@ -0,0 +1,133 @@
+"""
+Background avatar processing.
+
+Saving a profile with a new avatar only records the upload's content hash and
+queues an ``AvatarJob``; a small thread pool then renders JPEG and WebP
+variants for every size in ``AVATAR_PIPELINE['SIZES']``. Variants are stored
+by content hash, so re-uploading the same picture costs nothing, and the
+profile shows a placeholder until its current hash has been processed.
+
+Jobs left pending by a restart are picked up by ``manage.py process_avatars``,
+which can also take back jobs whose worker died while running them. A job that
+raises anywhere after being claimed is marked failed, never left running.
+"""
+import datetime
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import Q
+from django.templatetags.static import static
+from django.utils import timezone
+from PIL import Image
+
+from .models import AvatarJob, Profile
+
+DEFAULTS = {
+    'SYNC': False,
+    'WORKERS': 2,
+    'SIZES': (100, 200, 400),
+}
+PLACEHOLDER = 'myapp/avatar-placeholder.svg'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _config():
+    return {**DEFAULTS, **getattr(settings, 'AVATAR_PIPELINE', {})}
+
+
+def variant_name(source_hash, size, fmt='jpeg'):
+    extension = 'webp' if fmt == 'webp' else 'jpg'
+    return f'profile_images/variants/{source_hash}/{size}.{extension}'
+
+
+def variant_url(profile, size=100, fmt='jpeg'):
+    if profile.processed_hash:
+        return default_storage.url(variant_name(profile.processed_hash, size, fmt))
+    return static(PLACEHOLDER)
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=_config()['WORKERS'],
+                                               thread_name_prefix='avatars')
+    return _executor
+
+
+def enqueue_avatar(profile):
+    """Queue processing of the profile's current avatar once the save commits."""
+    job = AvatarJob.objects.create(profile=profile, source_hash=profile.avatar_hash)
+    if _config()['SYNC']:
+        transaction.on_commit(lambda: process_job(job.pk))
+    else:
+        transaction.on_commit(lambda: _get_executor().submit(_run_in_worker, job.pk))
+    return job
+
+
+def _run_in_worker(job_id):
+    try:
+        process_job(job_id)
+    finally:
+        connection.close()
+
+
+def render_variants(source, source_hash, sizes):
+    """Write a JPEG and a WebP variant of ``source`` for each size."""
+    with Image.open(source) as original:
+        original.load()
+        image = original.convert('RGB')
+    for size in sizes:
+        variant = image.copy()
+        variant.thumbnail((size, size))
+        for fmt in ('jpeg', 'webp'):
+            name = variant_name(source_hash, size, fmt)
+            if default_storage.exists(name):
+                continue
+            buffer = io.BytesIO()
+            variant.save(buffer, format=fmt.upper(), quality=85)
+            default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def _run_job(job_id):
+    job = AvatarJob.objects.select_related('profile').get(pk=job_id)
+    profile = job.profile
+    if profile.avatar_hash == job.source_hash:
+        with default_storage.open(profile.avatar.name, 'rb') as source:
+            render_variants(source, job.source_hash, _config()['SIZES'])
+        # Only publish if the avatar has not been replaced in the meantime.
+        Profile.objects.filter(pk=profile.pk, avatar_hash=job.source_hash).update(processed_hash=job.source_hash)
+    # else superseded by a newer upload, which has its own job
+    AvatarJob.objects.filter(pk=job_id).update(status=AvatarJob.DONE, finished_at=timezone.now())
+
+
+def process_job(job_id):
+    """Run one job and return its final status, or None if it was already claimed."""
+    claimed = AvatarJob.objects.filter(pk=job_id, status=AvatarJob.PENDING).update(
+        status=AvatarJob.RUNNING, started_at=timezone.now())
+    if not claimed:
+        return None
+    try:
+        _run_job(job_id)
+    except Exception as exc:
+        # In a worker thread an escaping exception would only reach the Future.
+        AvatarJob.objects.filter(pk=job_id).update(
+            status=AvatarJob.FAILED, error=str(exc) or type(exc).__name__, finished_at=timezone.now())
+        return AvatarJob.FAILED
+    return AvatarJob.DONE
+
+
+def reclaim_stalled(older_than):
+    """Put jobs running for more than ``older_than`` seconds back in the queue; returns how many."""
+    cutoff = timezone.now() - datetime.timedelta(seconds=older_than)
+    stalled = AvatarJob.objects.filter(status=AvatarJob.RUNNING).filter(
+        Q(started_at__lt=cutoff) | Q(started_at__isnull=True))
+    return stalled.update(status=AvatarJob.PENDING, started_at=None)
@@ -0,0 +1,156 @@
+"""
+Benchmark scenarios run through ``manage.py benchmark <scenario>``.
+
+Each scenario runs against a throwaway, file-backed copy of the schema so it
+never touches real data, and returns a flat dict of results.
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.db import connections
+
+SCENARIOS = {}
+
+
+def register(cls):
+    SCENARIOS[cls.name] = cls()
+    return cls
+
+
+class Scenario:
+    name = None
+    help = ''
+
+    def add_arguments(self, parser):
+        pass
+
+    def run(self, stdout, **options):
+        raise NotImplementedError
+
+
+@contextmanager
+def scratch_database(alias='default'):
+    """Create a migrated, file-backed test database and drop it afterwards."""
+    connection = connections[alias]
+    tmpdir = tempfile.mkdtemp(prefix='myapp-bench-')
+    if connection.vendor == 'sqlite':
+        # Threads need a real file, not the shared in-memory test database.
+        connection.settings_dict['TEST']['NAME'] = os.path.join(tmpdir, 'bench.sqlite3')
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    # Replicas read the scratch database too, as they do under the test runner.
+    mirrors = [other for other in connections.all()
+               if other.settings_dict.get('TEST', {}).get('MIRROR') == alias]
+    originals = [other.settings_dict['NAME'] for other in mirrors]
+    for other in mirrors:
+        other.close()
+        other.creation.set_as_test_mirror(connection.settings_dict)
+    try:
+        yield connection
+    finally:
+        for other, original in zip(mirrors, originals):
+            other.close()
+            other.settings_dict['NAME'] = original
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def run_threads(target, count, *args):
+    """Run ``target(index, *args)`` on ``count`` threads; return elapsed seconds."""
+    errors = []
+
+    def worker(index):
+        try:
+            target(index, *args)
+        except Exception as exc:  # surfaced after join
+            errors.append(exc)
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    if errors:
+        raise errors[0]
+    return elapsed
+
+
+def http_client(**defaults):
+    """A test client whose Host header passes the default ALLOWED_HOSTS."""
+    from django.test import Client
+    defaults.setdefault('HTTP_HOST', 'localhost')
+    return Client(**defaults)
+
+
+def timed_requests(client, url, count, status=200):
+    """GET ``url`` ``count`` times; return per-request latencies in ms."""
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        response = client.get(url)
+        samples.append((time.perf_counter() - start) * 1000)
+        if response.status_code != status:
+            raise RuntimeError(f'GET {url} returned {response.status_code}')
+    return samples
+
+
+@contextmanager
+def count_queries(alias='default'):
+    """Count the queries run on ``alias`` inside the block; yields a one-item list."""
+    counter = [0]
+
+    def wrapper(execute, sql, params, many, context):
+        counter[0] += 1
+        return execute(sql, params, many, context)
+
+    with connections[alias].execute_wrapper(wrapper):
+        yield counter
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """
+    Regressions of ``results`` against ``baseline``, as messages.
+
+    Keys ending in ``_per_s`` regress when they drop by more than
+    ``tolerance`` (a fraction), keys ending in ``_ms`` or ``_s`` when they grow
+    by more than that, and keys ending in ``_queries`` on any increase. Other
+    keys, and keys missing from either side, are not compared.
+    """
+    regressions = []
+    for key, old in baseline.items():
+        new = results.get(key)
+        if new is None or isinstance(old, bool) or not isinstance(old, (int, float)):
+            continue
+        if key.endswith('_per_s'):
+            worse = new < old * (1 - tolerance)
+        elif key.endswith(('_ms', '_s')):
+            worse = new > old * (1 + tolerance)
+        elif key.endswith('_queries'):
+            worse = new > old
+        else:
+            continue
+        if worse:
+            regressions.append(f'{key}: {old} -> {new}')
+    return regressions
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+# Scenario modules register themselves on import.
+from . import (  # noqa: E402,F401
+    analytics, api, asgi, catalog_cache, checkout, order_export, order_form, pages, reservations, search, sessions,
+    sqlite_profiles, status,
+)
@@ -0,0 +1,89 @@
+import datetime
+import random
+import statistics
+import time
+
+from django.db import connection, transaction
+
+from myapp.analytics import order_totals, refresh_rollups, rollup_totals
+from myapp.models import Category, Client, Order, Product
+
+from . import Scenario, count_queries, register
+from .order_form import add_clients
+
+
+def add_orders(count, days, rng):
+    """Insert ``count`` random orders over the last ``days`` days; creates a catalog and clients on first use."""
+    if not Category.objects.exists():
+        categories = Category.objects.bulk_create(
+            Category(name=f'Category {i}', warehouse=warehouse)
+            for i, warehouse in enumerate(['Windsor', 'London', 'Waterloo'] * 4))
+        Product.objects.bulk_create(Product(category=rng.choice(categories), name=f'Product {i}',
+                                            price=rng.randint(100, 100000) / 100) for i in range(500))
+        add_clients(0, 2000)
+        client_ids = list(Client.objects.values_list('pk', flat=True))
+        provinces = [code for code, name in Client.PROVINCE_CHOICES]
+        for index, province in enumerate(provinces):
+            Client.objects.filter(pk__in=client_ids[index::len(provinces)]).update(province=province)
+    product_ids = list(Product.objects.values_list('pk', flat=True))
+    client_ids = list(Client.objects.values_list('pk', flat=True))
+    first_day = datetime.date.today() - datetime.timedelta(days=days)
+    with transaction.atomic(), connection.cursor() as cursor:
+        for offset in range(0, count, 10000):
+            cursor.executemany(
+                'INSERT INTO myapp_order (product_id, client_id, num_units, order_status, status_date) '
+                'VALUES (%s, %s, %s, %s, %s)',
+                [(rng.choice(product_ids), rng.choice(client_ids), rng.randint(1, 5), rng.randint(0, 3),
+                  first_day + datetime.timedelta(days=rng.randrange(days)))
+                 for _ in range(min(10000, count - offset))])
+
+
+@register
+class OrderAnalytics(Scenario):
+    name = 'analytics'
+    help = 'Order reports aggregated from the orders versus the daily rollups, and rollup refresh cost.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=200000)
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--changes', type=int, default=1000, help='Orders changed before the incremental refresh.')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per report.')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def run(self, stdout, orders, days, changes, repeat, seed, **options):
+        rng = random.Random(seed)
+        add_orders(orders, days, rng)
+
+        results = {'orders': Order.objects.count()}
+        start = time.perf_counter()
+        results['rollup_rows'] = refresh_rollups(full=True)
+        results['full_refresh_s'] = round(time.perf_counter() - start, 2)
+
+        sample = Order.objects.order_by('?')[:1000]
+        with count_queries() as queries:
+            start = time.perf_counter()
+            sum(order.total_cost() for order in sample)
+            per_order_ms = (time.perf_counter() - start) * 1000
+        results['total_cost_1000_orders_ms'] = round(per_order_ms, 1)
+        results['total_cost_1000_orders_queries'] = queries[0]
+
+        for by in [('category',), ('warehouse',), ('province', 'status'), ('day',)]:
+            name = '_'.join(by)
+            results[f'{name}_live_p50_ms'] = self.measure(lambda: order_totals(by), repeat)
+            results[f'{name}_rollup_p50_ms'] = self.measure(lambda: rollup_totals(by), repeat)
+
+        pks = list(Order.objects.order_by('?').values_list('pk', flat=True)[:changes])
+        Order.objects.filter(pk__in=pks).update(order_status=2, status_date=datetime.date.today())
+        start = time.perf_counter()
+        results['incremental_refresh_changes'] = refresh_rollups()
+        results['incremental_refresh_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        results['rollups_match'] = order_totals(('day', 'status')) == rollup_totals(('day', 'status'))
+        return results
+
+    def measure(self, report, repeat):
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            report()
+            samples.append((time.perf_counter() - start) * 1000)
+        return round(statistics.median(samples), 2)
@@ -0,0 +1,56 @@
+import statistics
+
+from django.urls import reverse
+
+from myapp.catalog_cache import catalog_cache
+from myapp.models import Category, Product
+
+from . import Scenario, http_client, register, timed_requests
+
+
+@register
+class ApiVersusHtml(Scenario):
+    name = 'api'
+    help = 'Throughput and payload size of the JSON API versus the HTML catalog pages.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--size', type=int, default=50, help='Page size for both interfaces.')
+        parser.add_argument('--requests', type=int, default=300, help='Requests per page and mode.')
+
+    def run(self, stdout, products, size, requests, **options):
+        category = Category.objects.create(name='Bench')
+        Product.objects.bulk_create(
+            Product(category=category, name=f'Product {i}', description='A product. ' * 10, price=10)
+            for i in range(products))
+        catalog_cache.invalidate()
+
+        pages = {
+            'html_category': reverse('myapp:detail', args=[category.pk]) + f'?size={size}',
+            'api_category': reverse('myapp:api-category-products', args=[category.pk]) + f'?size={size}',
+            'api_category_fields': (reverse('myapp:api-category-products', args=[category.pk])
+                                    + f'?size={size}&fields=id,name,price'),
+            'html_products': reverse('myapp:products') + f'?size={size}',
+            'api_categories': reverse('myapp:api-categories') + f'?size={size}',
+        }
+        plain = http_client()
+        gzip = http_client(HTTP_ACCEPT_ENCODING='gzip')
+        results = {}
+        for page, url in pages.items():
+            results.update(self.measure(page, plain, url, requests))
+            if page.startswith('api'):
+                results.update(self.measure(f'{page}_gzip', gzip, url, requests))
+                etag = gzip.get(url)['ETag']
+                revalidate = http_client(HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etag)
+                samples = timed_requests(revalidate, url, requests, status=304)
+                results[f'{page}_304_per_s'] = round(1000 * len(samples) / sum(samples), 1)
+        return results
+
+    def measure(self, page, client, url, requests):
+        body = len(client.get(url).content)
+        samples = timed_requests(client, url, requests)
+        return {
+            f'{page}_per_s': round(1000 * len(samples) / sum(samples), 1),
+            f'{page}_p50_ms': round(statistics.median(samples), 3),
+            f'{page}_bytes': body,
+        }
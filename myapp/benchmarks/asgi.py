@@ -0,0 +1,97 @@
+import asyncio
+import statistics
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.test import AsyncClient
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from myapp.catalog_cache import catalog_cache
+from myapp.models import Category, Client, Order, Product
+
+from . import Scenario, http_client, percentile, register, run_threads
+
+
+@register
+class WsgiVersusAsgi(Scenario):
+    name = 'asgi'
+    help = 'Throughput of the sync views under WSGI versus the async views under ASGI.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=16, help='Simultaneous clients.')
+        parser.add_argument('--requests', type=int, default=100, help='Requests per client.')
+        parser.add_argument('--products', type=int, default=200)
+
+    def run(self, stdout, concurrency, requests, products, **options):
+        category = Category.objects.create(name='Bench')
+        Product.objects.bulk_create(
+            Product(category=category, name=f'Product {i}', price=10) for i in range(products))
+        product = Product.objects.first()
+        client = Client.objects.create(username='bench-client')
+        Order.objects.bulk_create(Order(client=client, product=product, num_units=1) for _ in range(50))
+        catalog_cache.invalidate()
+
+        def urls(prefix):
+            return [
+                reverse(f'myapp:{prefix}index'),
+                reverse(f'myapp:{prefix}detail', args=[category.pk]),
+                reverse(f'myapp:{prefix}products'),
+                reverse(f'myapp:{prefix}productDetail', args=[product.pk]),
+                reverse(f'myapp:{prefix}orders'),
+            ]
+
+        # AsyncClient always sends Host: testserver; setting ALLOWED_HOSTS
+        # also drops the implicit localhost of DEBUG mode.
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'localhost', 'testserver']):
+            results = {'concurrency': concurrency}
+            results.update(self.wsgi(urls(''), client, concurrency, requests))
+            results.update(asyncio.run(self.asgi(urls('async-'), client, concurrency, requests)))
+        return results
+
+    def wsgi(self, urls, user, concurrency, requests):
+        samples = []
+        lock = threading.Lock()
+
+        def browse(index):
+            browser = http_client()
+            browser.force_login(user)
+            local = []
+            for number in range(requests):
+                url = urls[number % len(urls)]
+                start = time.perf_counter()
+                response = browser.get(url)
+                local.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 200:
+                    raise RuntimeError(f'GET {url} returned {response.status_code}')
+            with lock:
+                samples.extend(local)
+
+        return self.summary('wsgi', samples, run_threads(browse, concurrency))
+
+    async def asgi(self, urls, user, concurrency, requests):
+        samples = []
+
+        async def browse():
+            browser = AsyncClient()
+            await sync_to_async(browser.force_login)(user)
+            for number in range(requests):
+                url = urls[number % len(urls)]
+                start = time.perf_counter()
+                response = await browser.get(url)
+                samples.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 200:
+                    raise RuntimeError(f'GET {url} returned {response.status_code}')
+
+        start = time.perf_counter()
+        await asyncio.gather(*(browse() for _ in range(concurrency)))
+        return self.summary('asgi', samples, time.perf_counter() - start)
+
+    def summary(self, mode, samples, elapsed):
+        return {
+            f'{mode}_requests_per_s': round(len(samples) / elapsed, 1) if elapsed else 0.0,
+            f'{mode}_p50_ms': round(statistics.median(samples), 3),
+            f'{mode}_p95_ms': round(percentile(samples, 95), 3),
+        }
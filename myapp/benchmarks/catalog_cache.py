@@ -0,0 +1,48 @@
+import statistics
+
+from django.urls import reverse
+
+from myapp.catalog_cache import catalog_cache
+from myapp.models import Category, Product
+
+from . import Scenario, http_client, percentile, register, timed_requests
+
+
+@register
+class CatalogCacheLatency(Scenario):
+    name = 'catalog_cache'
+    help = 'Cold versus warm latency of the cached catalog pages.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--products', type=int, default=500, help='Products per category.')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per page and mode.')
+
+    def run(self, stdout, categories, products, requests, **options):
+        Category.objects.bulk_create(Category(name=f'Category {i}') for i in range(categories))
+        category_ids = list(Category.objects.values_list('pk', flat=True))
+        Product.objects.bulk_create(
+            Product(category_id=category_id, name=f'Product {category_id}-{i}', price=10)
+            for category_id in category_ids for i in range(products)
+        )
+        catalog_cache.invalidate()
+
+        client = http_client()
+        urls = {
+            'index': reverse('myapp:index'),
+            'detail': reverse('myapp:detail', args=[category_ids[0]]),
+            'products': reverse('myapp:products'),
+        }
+        results = {}
+        for view, url in urls.items():
+            cold = []
+            for _ in range(requests):
+                catalog_cache.invalidate()
+                cold.extend(timed_requests(client, url, 1))
+            warm = timed_requests(client, url, requests)
+            results[f'{view}_cold_p50_ms'] = round(statistics.median(cold), 3)
+            results[f'{view}_warm_p50_ms'] = round(statistics.median(warm), 3)
+            results[f'{view}_cold_p95_ms'] = round(percentile(cold, 95), 3)
+            results[f'{view}_warm_p95_ms'] = round(percentile(warm, 95), 3)
+        results.update(catalog_cache.stats())
+        return results
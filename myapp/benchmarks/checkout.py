@@ -0,0 +1,79 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.db.models import Sum
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from myapp.models import Category, Client, Order, Product
+from myapp.reservations import reserve_cart, reserve_order
+
+from . import Scenario, http_client, register
+from .sessions import FAST_HASHERS
+
+
+@register
+class CartCheckout(Scenario):
+    name = 'checkout'
+    help = 'Items per second through one-order-at-a-time placement versus multi-line cart checkout.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=2000, help='Order lines per flow.')
+        parser.add_argument('--cart-size', type=int, default=20)
+        parser.add_argument('--products', type=int, default=200)
+
+    def run(self, stdout, items, cart_size, products, **options):
+        if not 0 < cart_size <= min(products, settings.CART_MAX_LINES):
+            raise CommandError(f'--cart-size must be between 1 and {min(products, settings.CART_MAX_LINES)}.')
+        category = Category.objects.create(name='Bench')
+        Product.objects.bulk_create(Product(category=category, name=f'Product {i}', price=10, stock=1000)
+                                    for i in range(products))
+        product_ids = list(Product.objects.values_list('pk', flat=True))
+        with override_settings(PASSWORD_HASHERS=FAST_HASHERS):
+            client = Client(username='bench-client')
+            client.set_password('bench-password')
+            client.save()
+        browser = http_client()
+        browser.force_login(client)
+        lines = [(product_ids[i % len(product_ids)], 1) for i in range(items)]
+        carts = [lines[i:i + cart_size] for i in range(0, items, cart_size)]
+
+        def single_view():
+            for product_id, units in lines:
+                browser.post(reverse('myapp:placeOrder'),
+                             {'client': client.pk, 'product': product_id, 'num_units': units})
+
+        def cart_view():
+            for cart in carts:
+                data = {'client': client.pk, 'lines-TOTAL_FORMS': len(cart), 'lines-INITIAL_FORMS': 0}
+                for index, (product_id, units) in enumerate(cart):
+                    data[f'lines-{index}-product'] = product_id
+                    data[f'lines-{index}-num_units'] = units
+                browser.post(reverse('myapp:checkout'), data)
+
+        def single_function():
+            for product_id, units in lines:
+                reserve_order(Order(client_id=client.pk, product_id=product_id, num_units=units))
+
+        def cart_function():
+            for cart in carts:
+                reserve_cart(client.pk, cart)
+
+        results = {}
+        for name, flow in [('single_view', single_view), ('cart_view', cart_view),
+                           ('single_function', single_function), ('cart_function', cart_function)]:
+            before = Order.objects.count()
+            start = time.perf_counter()
+            flow()
+            elapsed = time.perf_counter() - start
+            placed = Order.objects.count() - before
+            if placed != items:
+                raise CommandError(f'{name} placed {placed} of {items} orders.')
+            results[f'{name}_items_per_s'] = round(items / elapsed, 1)
+            Product.objects.update(stock=1000)
+
+        sold = Order.objects.aggregate(units=Sum('num_units'))['units']
+        if sold != 4 * items:
+            raise CommandError(f'{sold} units sold, expected {4 * items}.')
+        return results
@@ -0,0 +1,66 @@
+import io
+import random
+import time
+import tracemalloc
+
+from django.contrib.auth.models import User
+from django.urls import reverse
+
+from myapp.catalog_io import write_rows
+from myapp.models import Order
+from myapp.order_export import FIELDS, export_rows
+
+from . import Scenario, http_client, register
+from .analytics import add_orders
+
+
+class NullWriter(io.TextIOBase):
+    def write(self, text):
+        return len(text)
+
+
+@register
+class OrderExport(Scenario):
+    name = 'order_export'
+    help = 'Peak memory, throughput and time to first byte of the streaming order export.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, nargs='+', default=[20000, 200000],
+                            help='Orders in the table at each measurement.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def run(self, stdout, orders, batch_size, **options):
+        admin = User.objects.create_superuser('bench-admin', 'bench@example.com', 'bench-password')
+        browser = http_client()
+        browser.force_login(admin)
+        results = {}
+        loaded = 0
+        for size in sorted(orders):
+            add_orders(size - loaded, 365, random.Random(size))
+            loaded = size
+            for fmt in ('csv', 'jsonl'):
+                start = time.perf_counter()
+                self.export(fmt, batch_size)
+                results[f'{size}_{fmt}_rows_per_s'] = round(size / (time.perf_counter() - start))
+                # a second pass, since tracing slows everything down
+                tracemalloc.start()
+                self.export(fmt, batch_size)
+                results[f'{size}_{fmt}_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)
+                tracemalloc.stop()
+
+            start = time.perf_counter()
+            response = browser.post(reverse('admin:myapp_order_changelist'), {
+                'action': 'export_orders_csv', 'select_across': '1', 'index': '0',
+                '_selected_action': Order.objects.values_list('pk', flat=True).first(),
+            })
+            chunks = iter(response.streaming_content)
+            next(chunks)
+            results[f'{size}_admin_first_byte_ms'] = round((time.perf_counter() - start) * 1000, 1)
+            body = sum(1 for _ in chunks)
+            results[f'{size}_admin_s'] = round(time.perf_counter() - start, 2)
+            results[f'{size}_admin_chunks'] = body + 1
+        return results
+
+    def export(self, fmt, batch_size):
+        for _ in write_rows(NullWriter(), export_rows(Order.objects.all(), batch_size=batch_size), fmt, FIELDS):
+            pass
@@ -0,0 +1,68 @@
+import statistics
+
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from myapp.models import Category, Client, Product
+
+from . import Scenario, count_queries, http_client, register, timed_requests
+from .sessions import FAST_HASHERS
+
+
+def add_clients(start, count):
+    """Insert ``count`` clients with raw SQL; Client is a multi-table model."""
+    now = timezone.now()
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(
+            'INSERT INTO auth_user (password, is_superuser, username, first_name, last_name, email, '
+            'is_staff, is_active, date_joined) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)',
+            [('!', False, f'client{i:07d}', 'Client', str(i), '', False, True, now)
+             for i in range(start, start + count)])
+        cursor.execute('SELECT id FROM auth_user WHERE username >= %s AND username < %s',
+                       [f'client{start:07d}', f'client{start + count:07d}'])
+        cursor.executemany(
+            "INSERT INTO myapp_client (user_ptr_id, company, city, province) VALUES (%s, '', 'Windsor', 'ON')",
+            cursor.fetchall())
+
+
+@register
+class OrderFormWeight(Scenario):
+    name = 'order_form'
+    help = 'Size, queries and latency of the order form and its lookups as the tables grow.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[1000, 100000],
+                            help='Clients and products at each measurement.')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per page and size.')
+
+    def run(self, stdout, rows, requests, **options):
+        with override_settings(PASSWORD_HASHERS=FAST_HASHERS):
+            user = Client(username='bench-client', first_name='Bench', last_name='Client')
+            user.set_password('bench-password')
+            user.save()
+        category = Category.objects.create(name='Bench')
+        browser = http_client()
+        browser.force_login(user)
+        pages = {
+            'form': reverse('myapp:placeOrder'),
+            'clients_lookup': reverse('myapp:lookup-clients') + '?q=client00',
+            'products_lookup': reverse('myapp:lookup-products') + '?q=product',
+        }
+        results = {}
+        loaded = 0
+        for size in sorted(rows):
+            add_clients(loaded, size - loaded)
+            Product.objects.bulk_create(
+                (Product(category=category, name=f'Product {i}', price=10) for i in range(loaded, size)),
+                batch_size=1000)
+            loaded = size
+            for page, url in pages.items():
+                with count_queries() as queries:
+                    body = len(browser.get(url).content)
+                samples = timed_requests(browser, url, requests)
+                results[f'{size}_{page}_bytes'] = body
+                results[f'{size}_{page}_queries'] = queries[0]
+                results[f'{size}_{page}_p50_ms'] = round(statistics.median(samples), 3)
+        return results
@@ -0,0 +1,114 @@
+import random
+import time
+
+from django.core.management.base import CommandError
+from django.urls import reverse
+
+from myapp.dataset import NOUNS, generate_dataset
+from myapp.models import Category, Client, Product
+
+from . import Scenario, count_queries, http_client, percentile, register, run_threads
+
+
+@register
+class PageLoad(Scenario):
+    name = 'views'
+    help = 'Latency percentiles, throughput and queries per request of every page under concurrent users.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=50)
+        parser.add_argument('--products', type=int, default=20000)
+        parser.add_argument('--clients', type=int, default=20000)
+        parser.add_argument('--orders', type=int, default=200000)
+        parser.add_argument('--users', type=int, default=8, help='Concurrent users per page.')
+        parser.add_argument('--requests', type=int, default=400, help='Requests per page, across all users.')
+        parser.add_argument('--pages', nargs='+', help='Only these pages, e.g. anonymous_index user_orders.')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def run(self, stdout, categories, products, clients, orders, users, requests, pages, seed, **options):
+        # the names alone, before spending minutes on the dataset
+        known = self.pages([], [])
+        unknown = sorted(set(pages or ()) - set(known))
+        if unknown:
+            raise CommandError(f'Unknown pages: {", ".join(unknown)}. Choose from: {", ".join(known)}.')
+        generate_dataset(categories, products, clients, orders, seed)
+        rng = random.Random(seed)
+        accounts = list(Client.objects.filter(order__isnull=False).distinct().order_by('pk')[:users])
+        anonymous = [http_client() for _ in range(users)]
+        logged_in = [http_client() for _ in range(users)]
+        for browser, client in zip(logged_in, accounts):
+            browser.force_login(client)
+
+        product_ids = list(Product.objects.values_list('pk', flat=True))
+        known = self.pages(list(Category.objects.values_list('pk', flat=True)),
+                           rng.sample(product_ids, min(50, len(product_ids))))
+        results = {'products': products, 'clients': clients, 'orders': orders, 'users': users}
+        for page, (authenticated, urls) in known.items():
+            if pages and page not in pages:
+                continue
+            results.update(self.measure(page, logged_in if authenticated else anonymous, urls, requests))
+        return results
+
+    def pages(self, category_ids, product_ids):
+        """page name -> (logged in, URLs its requests cycle through)"""
+        public = {
+            'index': [reverse('myapp:index')],
+            'about': [reverse('myapp:about')],
+            'detail': [reverse('myapp:detail', args=[pk]) for pk in category_ids],
+            'products': [reverse('myapp:products')],
+            'search': [reverse('myapp:search') + f'?q={noun}' for noun in NOUNS],
+            'api_categories': [reverse('myapp:api-categories')],
+            'api_category_products': [reverse('myapp:api-category-products', args=[pk]) for pk in category_ids],
+            'api_product': [reverse('myapp:api-product', args=[pk]) for pk in product_ids],
+        }
+        private = {
+            'product_detail': [reverse('myapp:productDetail', args=[pk]) for pk in product_ids],
+            'place_order': [reverse('myapp:placeOrder')],
+            'checkout': [reverse('myapp:checkout')],
+            'orders': [reverse('myapp:orders')],
+            'profile': [reverse('myapp:users-profile')],
+            'lookup_clients': [reverse('myapp:lookup-clients') + '?q=client00'],
+            'lookup_products': [reverse('myapp:lookup-products') + f'?q={noun[:3]}' for noun in NOUNS],
+            'async_index': [reverse('myapp:async-index')],
+            'async_detail': [reverse('myapp:async-detail', args=[pk]) for pk in category_ids],
+            'async_products': [reverse('myapp:async-products')],
+            'async_product_detail': [reverse('myapp:async-productDetail', args=[pk]) for pk in product_ids],
+            'async_orders': [reverse('myapp:async-orders')],
+        }
+        anonymous_only = {
+            'login': [reverse('myapp:login')],
+            'register': [reverse('myapp:register')],
+            'password_reset': [reverse('myapp:password_reset')],
+        }
+        pages = {f'anonymous_{name}': (False, urls) for name, urls in {**public, **anonymous_only}.items()}
+        pages.update({f'user_{name}': (True, urls) for name, urls in {**public, **private}.items()})
+        return pages
+
+    def measure(self, page, browsers, urls, requests):
+        per_user = max(1, requests // len(browsers))
+        samples = [[] for _ in browsers]
+        queries = [0] * len(browsers)
+
+        def user(index):
+            browser = browsers[index]
+            # untimed first request: template loading and the like
+            browser.get(urls[index % len(urls)])
+            with count_queries() as counter:
+                for number in range(per_user):
+                    url = urls[(index * per_user + number) % len(urls)]
+                    start = time.perf_counter()
+                    response = browser.get(url)
+                    samples[index].append((time.perf_counter() - start) * 1000)
+                    if response.status_code != 200:
+                        raise RuntimeError(f'GET {url} returned {response.status_code}')
+            queries[index] = counter[0]
+
+        elapsed = run_threads(user, len(browsers))
+        latencies = [sample for user_samples in samples for sample in user_samples]
+        return {
+            f'{page}_p50_ms': round(percentile(latencies, 50), 2),
+            f'{page}_p95_ms': round(percentile(latencies, 95), 2),
+            f'{page}_p99_ms': round(percentile(latencies, 99), 2),
+            f'{page}_per_s': round(len(latencies) / elapsed, 1),
+            f'{page}_queries': round(sum(queries) / len(latencies), 1),
+        }
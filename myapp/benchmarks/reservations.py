@@ -0,0 +1,59 @@
+import threading
+
+from django.core.management.base import CommandError
+from django.db.models import Sum
+
+from myapp.models import Category, Client, Order, Product
+from myapp.reservations import ReservationStatus, reserve_order
+
+from . import Scenario, register, run_threads
+
+
+@register
+class ReservationStress(Scenario):
+    name = 'reservations'
+    help = 'Concurrent checkouts against one product; fails on any oversell.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--stock', type=int, default=1000)
+        parser.add_argument('--units', type=int, default=1, help='Units per order.')
+        parser.add_argument('--overshoot', type=float, default=1.5,
+                            help='Attempted units as a multiple of the stock.')
+
+    def run(self, stdout, threads, stock, units, overshoot, **options):
+        category = Category.objects.create(name='Bench')
+        product = Product.objects.create(category=category, name='Bench product', price=1, stock=stock)
+        client = Client.objects.create(username='bench-client')
+
+        per_thread = int(stock * overshoot / units / threads) + 1
+        counts = {status: 0 for status in ReservationStatus}
+        lock = threading.Lock()
+
+        def checkout(index):
+            local = {status: 0 for status in ReservationStatus}
+            for _ in range(per_thread):
+                order = Order(product_id=product.pk, client_id=client.pk, num_units=units)
+                local[reserve_order(order).status] += 1
+            with lock:
+                for status, count in local.items():
+                    counts[status] += count
+
+        elapsed = run_threads(checkout, threads)
+
+        product.refresh_from_db()
+        sold = Order.objects.filter(product=product).aggregate(units=Sum('num_units'))['units'] or 0
+        if sold + product.stock != stock or product.stock < 0:
+            raise CommandError(f'Oversold: {sold} units sold, {product.stock} left of {stock}.')
+        reserved = counts[ReservationStatus.RESERVED]
+        return {
+            'threads': threads,
+            'attempts': sum(counts.values()),
+            'reserved': reserved,
+            'insufficient': counts[ReservationStatus.INSUFFICIENT],
+            'conflict': counts[ReservationStatus.CONFLICT],
+            'units_sold': sold,
+            'stock_left': product.stock,
+            'elapsed_s': round(elapsed, 3),
+            'orders_per_s': round(reserved / elapsed, 1) if elapsed else 0.0,
+        }
@@ -0,0 +1,82 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+
+from myapp.models import Category, Product
+from myapp.search import search_products
+
+from . import Scenario, percentile, register
+
+LETTERS = 'etaoinshrdlcumwfgypbvkjxqz'
+# English letter frequencies, so word prefixes are about as selective as real ones.
+LETTER_WEIGHTS = [12.7, 9.1, 8.2, 7.5, 7.0, 6.7, 6.3, 6.1, 6.0, 4.3, 4.0, 2.8, 2.8,
+                  2.4, 2.4, 2.2, 2.0, 2.0, 1.9, 1.5, 1.0, 0.8, 0.2, 0.2, 0.1, 0.1]
+
+
+def make_vocabulary(rng, size):
+    return sorted({''.join(rng.choices(LETTERS, LETTER_WEIGHTS, k=rng.randint(4, 10))) for _ in range(size)})
+
+
+@register
+class SearchLatency(Scenario):
+    name = 'search'
+    help = 'Full-text search latency over a large synthetic catalog; fails over the p95 budget.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100000)
+        parser.add_argument('--categories', type=int, default=50)
+        parser.add_argument('--vocabulary', type=int, default=20000, help='Distinct words.')
+        parser.add_argument('--queries', type=int, default=500)
+        parser.add_argument('--budget-ms', type=float, default=20.0, help='Maximum acceptable p95.')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def run(self, stdout, products, categories, vocabulary, queries, budget_ms, seed, **options):
+        rng = random.Random(seed)
+        words = make_vocabulary(rng, vocabulary)
+        Category.objects.bulk_create(Category(name=f'Category {i}') for i in range(categories))
+        category_ids = list(Category.objects.values_list('pk', flat=True))
+
+        start = time.perf_counter()
+        # Raw executemany: the FTS triggers index every row as it is inserted.
+        sql = ('INSERT INTO myapp_product (category_id, name, description, price, stock, available, '
+               'interested, updated_at) VALUES (%s, %s, %s, 10, 100, %s, 0, CURRENT_TIMESTAMP)')
+        with transaction.atomic(), connection.cursor() as cursor:
+            for offset in range(0, products, 10000):
+                cursor.executemany(sql, [
+                    (rng.choice(category_ids), ' '.join(rng.choices(words, k=3)),
+                     ' '.join(rng.choices(words, k=12)), rng.random() > 0.1)
+                    for _ in range(min(10000, products - offset))
+                ])
+        load_s = time.perf_counter() - start
+
+        # Users look for words of product names, often typing only a prefix.
+        names = list(Product.objects.order_by('?').values_list('name', flat=True)[:queries])
+        cases = []
+        for name in names:
+            picked = rng.sample(name.split(), rng.randint(1, 2))
+            terms = [word[:rng.randint(3, len(word))] for word in picked]
+            category = rng.choice(category_ids) if rng.random() < 0.3 else None
+            cases.append((' '.join(terms), category))
+        samples = []
+        for query, category in cases:
+            begin = time.perf_counter()
+            len(search_products(query, category=category))
+            samples.append((time.perf_counter() - begin) * 1000)
+
+        p95 = percentile(samples, 95)
+        results = {
+            'products': Product.objects.count(),
+            'load_s': round(load_s, 1),
+            'queries': len(samples),
+            'p50_ms': round(statistics.median(samples), 3),
+            'p95_ms': round(p95, 3),
+            'p99_ms': round(percentile(samples, 99), 3),
+            'budget_ms': budget_ms,
+        }
+        if p95 > budget_ms:
+            stdout.write('\n'.join(f'{key}: {value}' for key, value in results.items()))
+            raise CommandError(f'Search p95 {p95:.1f} ms is over the {budget_ms} ms budget.')
+        return results
@@ -0,0 +1,65 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from myapp.catalog_cache import catalog_cache
+from myapp.models import Category, Client, Product
+
+from . import Scenario, count_queries, http_client, register, timed_requests
+
+# Password hashing would dwarf the session cost being measured.
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+@register
+class SessionEngines(Scenario):
+    name = 'sessions'
+    help = 'Logins per second and queries per page view for each session engine.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--engines', nargs='+', choices=sorted(settings.SESSION_ENGINES),
+                            default=sorted(settings.SESSION_ENGINES))
+        parser.add_argument('--logins', type=int, default=300)
+        parser.add_argument('--requests', type=int, default=300, help='Requests per page.')
+
+    def run(self, stdout, engines, logins, requests, **options):
+        category = Category.objects.create(name='Bench')
+        Product.objects.bulk_create(Product(category=category, name=f'Product {i}', price=10) for i in range(50))
+        catalog_cache.invalidate()
+        with override_settings(PASSWORD_HASHERS=FAST_HASHERS):
+            user = Client(username='bench-client')
+            user.set_password('bench-password')
+            user.save()
+
+        pages = {
+            'anonymous_index': (False, reverse('myapp:index')),
+            'anonymous_products': (False, reverse('myapp:products')),
+            'authenticated_index': (True, reverse('myapp:index')),
+            'authenticated_orders': (True, reverse('myapp:orders')),
+        }
+        credentials = {'username': 'bench-client', 'password': 'bench-password'}
+        results = {}
+        for engine in engines:
+            with override_settings(SESSION_ENGINE=settings.SESSION_ENGINES[engine],
+                                   PASSWORD_HASHERS=FAST_HASHERS):
+                start = time.perf_counter()
+                for _ in range(logins):
+                    if http_client().post(reverse('myapp:login'), credentials).status_code != 302:
+                        raise RuntimeError('login failed')
+                results[f'{engine}_logins_per_s'] = round(logins / (time.perf_counter() - start), 1)
+
+                anonymous = http_client()
+                authenticated = http_client()
+                authenticated.post(reverse('myapp:login'), credentials)
+                for page, (logged_in, url) in pages.items():
+                    client = authenticated if logged_in else anonymous
+                    timed_requests(client, url, 1)
+                    with count_queries() as queries:
+                        timed_requests(client, url, 1)
+                    samples = timed_requests(client, url, requests)
+                    results[f'{engine}_{page}_queries'] = queries[0]
+                    results[f'{engine}_{page}_p50_ms'] = round(statistics.median(samples), 3)
+        return results
@@ -0,0 +1,125 @@
+import random
+import sqlite3
+import threading
+import time
+
+from mysiteF22.db.sqlite3.base import pragma_statements
+
+from myapp.models import Category, Client, Product
+
+from . import Scenario, percentile, register, run_threads
+
+PROFILES = {
+    # what settings.py did before: a new connection per request, rollback
+    # journal, deferred transactions and the driver's default 5s timeout
+    'default': {'persistent': False, 'timeout': 5.0, 'begin': 'BEGIN',
+                'pragmas': {'journal_mode': 'DELETE', 'synchronous': 'FULL'}},
+    'production': {'persistent': True, 'timeout': 20.0, 'begin': 'BEGIN IMMEDIATE',
+                   'pragmas': {'journal_mode': 'WAL', 'synchronous': 'NORMAL',
+                               'mmap_size': 256 * 1024 * 1024, 'cache_size': -64000,
+                               'temp_store': 'MEMORY'}},
+}
+
+
+@register
+class SQLiteProfiles(Scenario):
+    name = 'sqlite_profiles'
+    help = 'Concurrent catalog reads and order writes under the default and production SQLite profiles.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--duration', type=float, default=5.0, help='Seconds per profile.')
+
+    def run(self, stdout, readers, writers, duration, **options):
+        from django.db import connection
+
+        category = Category.objects.create(name='Bench')
+        Product.objects.bulk_create(
+            Product(category=category, name=f'Product {i}', price=10, stock=1000) for i in range(2000))
+        product_ids = list(Product.objects.values_list('pk', flat=True))
+        client = Client.objects.create(username='bench-client')
+        path = connection.settings_dict['NAME']
+        connection.close()
+
+        results = {'readers': readers, 'writers': writers}
+        for name, profile in PROFILES.items():
+            for key, value in self._run_profile(path, profile, readers, writers, duration,
+                                                category.pk, product_ids, client.pk).items():
+                results[f'{name}_{key}'] = value
+        return results
+
+    def _run_profile(self, path, profile, readers, writers, duration, category_id, product_ids, client_id):
+        setup = sqlite3.connect(path, isolation_level=None)
+        for statement in pragma_statements(profile['pragmas']):
+            setup.execute(statement)
+        setup.close()
+
+        lock = threading.Lock()
+        stats = {'reads': 0, 'writes': 0, 'locked': 0}
+        read_ms, write_ms = [], []
+        deadline = time.perf_counter() + duration
+
+        def connect():
+            conn = sqlite3.connect(path, timeout=profile['timeout'], isolation_level=None,
+                                   check_same_thread=False)
+            for statement in pragma_statements(profile['pragmas']):
+                if not statement.startswith('PRAGMA journal_mode'):
+                    conn.execute(statement)
+            return conn
+
+        def read(conn):
+            last_id = random.choice(product_ids)
+            conn.execute('SELECT id, name FROM myapp_product WHERE category_id = ? AND available '
+                         'AND id > ? ORDER BY id LIMIT 10', (category_id, last_id)).fetchall()
+            conn.execute('SELECT id, name FROM myapp_category ORDER BY id LIMIT 10').fetchall()
+
+        def write(conn):
+            product_id = random.choice(product_ids)
+            conn.execute(profile['begin'])
+            try:
+                updated = conn.execute('UPDATE myapp_product SET stock = stock - 1 '
+                                       'WHERE id = ? AND stock >= 1', (product_id,)).rowcount
+                if updated:
+                    conn.execute("INSERT INTO myapp_order (product_id, client_id, num_units, order_status, "
+                                 "status_date) VALUES (?, ?, 1, 1, date('now'))", (product_id, client_id))
+                conn.execute('COMMIT')
+            except sqlite3.Error:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                raise
+
+        def worker(index):
+            is_writer = index < writers
+            operation, samples = (write, write_ms) if is_writer else (read, read_ms)
+            conn = connect() if profile['persistent'] else None
+            local, local_locked, local_samples = 0, 0, []
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                current = conn or connect()
+                try:
+                    operation(current)
+                    local += 1
+                    local_samples.append((time.perf_counter() - start) * 1000)
+                except sqlite3.OperationalError as exc:
+                    if 'locked' not in str(exc) and 'busy' not in str(exc):
+                        raise
+                    local_locked += 1
+                finally:
+                    if conn is None:
+                        current.close()
+            if conn is not None:
+                conn.close()
+            with lock:
+                stats['writes' if is_writer else 'reads'] += local
+                stats['locked'] += local_locked
+                samples.extend(local_samples)
+
+        elapsed = run_threads(worker, readers + writers)
+        return {
+            'reads_per_s': round(stats['reads'] / elapsed, 1),
+            'writes_per_s': round(stats['writes'] / elapsed, 1),
+            'locked_errors': stats['locked'],
+            'read_p95_ms': round(percentile(read_ms, 95), 3),
+            'write_p95_ms': round(percentile(write_ms, 95), 3),
+        }
@@ -0,0 +1,89 @@
+import random
+import threading
+import time
+
+from django.core.management.base import CommandError
+from django.db.models import Sum
+
+from myapp.models import Category, Client, Order, Product
+from myapp.bulk import MAX_STOCK
+from myapp.reservations import ReservationStatus, reserve_order
+from myapp.status import advance_orders, orders_to_advance
+
+from . import Scenario, percentile, register, run_threads
+from .analytics import add_orders
+
+
+@register
+class StatusPipeline(Scenario):
+    name = 'status'
+    help = 'Bulk status transitions per second, and checkout latency while they run.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=200000)
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--pause', type=float, default=0.005, help='Seconds between chunks in the concurrent run.')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def run(self, stdout, orders, chunk_size, pause, seed, **options):
+        add_orders(orders, 365, random.Random(seed))
+        results = {'orders': Order.objects.count()}
+
+        for warehouse in sorted(set(Category.objects.values_list('warehouse', flat=True))):
+            result = advance_orders(orders_to_advance(Order.SHIPPED, warehouse), Order.SHIPPED, chunk_size)
+            results[f'ship_{warehouse.lower()}_per_s'] = round(result.per_second)
+
+        placed = Order.objects.filter(order_status=Order.PLACED).count()
+        if placed:
+            raise CommandError(f'{placed} placed orders left after shipping every warehouse.')
+        result = advance_orders(orders_to_advance(Order.DELIVERED), Order.DELIVERED, chunk_size)
+        results['deliver_per_s'] = round(result.per_second)
+
+        # Put orders back to Placed to have something to cancel, then time checkout alongside it.
+        Order.objects.filter(pk__in=Order.objects.order_by('?').values('pk')[:orders // 2]).update(
+            order_status=Order.PLACED)
+        Product.objects.update(stock=0)
+        units = Order.objects.filter(order_status=Order.PLACED).aggregate(units=Sum('num_units'))['units']
+        product = Product.objects.create(category=Category.objects.first(), name='Bench product', price=1,
+                                         stock=MAX_STOCK)
+        # leave the orders checkout places alone
+        to_cancel = orders_to_advance(Order.CANCELLED).exclude(product=product)
+        client_id = Client.objects.values_list('pk', flat=True).first()
+        done = threading.Event()
+        latencies = []
+        outcome = {}
+
+        def worker(index):
+            if index == 0:
+                try:
+                    outcome['cancel'] = advance_orders(to_cancel, Order.CANCELLED,
+                                                       chunk_size, pause)
+                finally:
+                    done.set()
+                return
+            while not done.is_set():
+                start = time.perf_counter()
+                result = reserve_order(Order(product_id=product.pk, client_id=client_id, num_units=1))
+                latencies.append((time.perf_counter() - start) * 1000)
+                if result.status == ReservationStatus.INSUFFICIENT:
+                    Product.objects.filter(pk=product.pk).update(stock=MAX_STOCK)
+
+        run_threads(worker, 2)
+        cancel = outcome['cancel']
+        results['cancel_per_s'] = round(cancel.per_second)
+        results['cancel_restocked_units'] = cancel.restocked
+        results['cancel_capped_units'] = cancel.capped
+        results['cancel_skipped'] = cancel.skipped
+        results['cancel_locked'] = cancel.locked
+        left = to_cancel.aggregate(units=Sum('num_units'))['units'] or 0
+        if cancel.locked or not cancel.rows:
+            raise CommandError(f'Cancelled {cancel.rows} orders with {cancel.locked} left in locked chunks; '
+                               'the cancellation made no progress next to checkout.')
+        if cancel.restocked + cancel.capped != units - left:
+            raise CommandError(f'{cancel.restocked} units restocked and {cancel.capped} capped, '
+                               f'expected {units - left} in all.')
+        results['checkouts_during_cancel'] = len(latencies)
+        results['checkout_p50_ms'] = round(percentile(latencies, 50), 2)
+        results['checkout_p95_ms'] = round(percentile(latencies, 95), 2)
+        results['checkout_max_ms'] = round(max(latencies, default=0.0), 2)
+        return results
@@ -0,0 +1,121 @@
+"""
+Set-based bulk updates for products.
+
+Every operation is a single ``UPDATE ... WHERE id IN (...)`` per chunk of
+primary keys, each chunk in its own short transaction, so a selection of tens
+of thousands of rows never holds the write lock for long.
+"""
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import Round
+from django.utils import timezone
+
+from .catalog_cache import catalog_cache
+
+MAX_STOCK = 1000
+
+
+@dataclass
+class BulkResult:
+    rows: int = 0
+    skipped: int = 0
+    elapsed: float = 0.0
+    skip_reason: str = ''
+
+    def __str__(self):
+        text = f'{self.rows} rows updated in {self.elapsed * 1000:.0f} ms'
+        if self.skipped:
+            text += f', {self.skipped} skipped'
+            if self.skip_reason:
+                text += f' ({self.skip_reason})'
+        return text
+
+
+def iter_pk_chunks(queryset, chunk_size):
+    """Yield lists of primary keys from ``queryset`` in ascending order."""
+    queryset = queryset.order_by('pk').values_list('pk', flat=True)
+    last = None
+    while True:
+        page = queryset if last is None else queryset.filter(pk__gt=last)
+        chunk = list(page[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last = chunk[-1]
+
+
+def iter_keyset(queryset, chunk_size):
+    """
+    Yield every object of ``queryset`` using primary-key keyset chunks.
+
+    Each chunk is a separate, short query, so memory stays flat and no read
+    transaction is held open across the whole table.
+    """
+    queryset = queryset.order_by('pk')
+    last = None
+    while True:
+        page = queryset if last is None else queryset.filter(pk__gt=last)
+        chunk = list(page[:chunk_size])
+        if not chunk:
+            return
+        yield from chunk
+        last = chunk[-1].pk
+
+
+def chunked_update(queryset, chunk_size=None, condition=None, **updates):
+    """
+    Apply ``updates`` to every row of ``queryset``, one chunk at a time.
+
+    ``condition`` (a Q) is checked again by each chunk's UPDATE, as rows may
+    have changed since their keys were read; rows it no longer matches, or
+    that are gone, are counted as skipped.
+    """
+    chunk_size = chunk_size or settings.BULK_UPDATE_CHUNK_SIZE
+    model = queryset.model
+    # update() skips auto_now.
+    updates.setdefault('updated_at', timezone.now())
+    result = BulkResult()
+    start = time.perf_counter()
+    for chunk in iter_pk_chunks(queryset, chunk_size):
+        with transaction.atomic():
+            rows = model.objects.filter(condition or Q(), pk__in=chunk).update(**updates)
+        result.rows += rows
+        result.skipped += len(chunk) - rows
+    result.elapsed = time.perf_counter() - start
+    if result.rows:
+        catalog_cache.invalidate()
+    return result
+
+
+def increase_stock(queryset, units, chunk_size=None):
+    """
+    Add ``units`` to the stock of every product in ``queryset``.
+
+    Products that would go over MAX_STOCK are left alone and counted as
+    skipped, the same rule MaxValueValidator applies in forms.
+    """
+    if units <= 0:
+        raise ValueError('The units to add must be positive.')
+    result = chunked_update(queryset, chunk_size, Q(stock__lte=MAX_STOCK - units), stock=F('stock') + units)
+    result.skip_reason = f'stock would exceed {MAX_STOCK}'
+    return result
+
+
+def toggle_availability(queryset, chunk_size=None):
+    return chunked_update(queryset, chunk_size, available=Case(
+        When(available=True, then=Value(False)),
+        default=Value(True),
+    ))
+
+
+def reprice(queryset, percent, chunk_size=None):
+    """Change prices by ``percent`` (e.g. 10 or -15), rounded to cents."""
+    factor = Decimal(1) + Decimal(percent) / Decimal(100)
+    if factor <= 0:
+        raise ValueError('A price cut must be smaller than 100%.')
+    return chunked_update(queryset, chunk_size, price=Round(F('price') * Value(factor), 2))
@@ -0,0 +1,105 @@
+"""
+Read-through cache for catalog data (categories and products).
+
+Entries live in the ``catalog`` cache alias, which evicts least recently used
+entries and expires them after the alias' ``TIMEOUT``. Every key
+embeds the current catalog version; the receivers in ``signals.py`` bump the
+version whenever a Category or Product is saved or deleted, so stale entries
+are simply never read again and age out on their own. Code that changes the
+catalog with ``QuerySet.update()`` must call ``invalidate()`` itself.
+"""
+import hashlib
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+
+VERSION_KEY = 'catalog:version'
+_MISSING = object()
+
+
+class CatalogCache:
+    def __init__(self, alias='catalog'):
+        self.alias = alias
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def version(self):
+        version = self.cache.get(VERSION_KEY)
+        if version is None:
+            version = self._reset_version()
+        return version
+
+    async def aversion(self):
+        version = await self.cache.aget(VERSION_KEY)
+        if version is None:
+            version = await sync_to_async(self._reset_version)()
+        return version
+
+    def invalidate(self):
+        """Move every reader onto a fresh set of keys."""
+        try:
+            self.cache.incr(VERSION_KEY)
+        except ValueError:
+            self._reset_version()
+
+    def _reset_version(self):
+        # Seeded from the clock so a version key lost to eviction can never
+        # come back as a number that older entries were stored under.
+        candidate = time.time_ns() // 1000
+        self.cache.add(VERSION_KEY, candidate, timeout=None)
+        return self.cache.get(VERSION_KEY, candidate)
+
+    def key(self, name, *parts, version=None):
+        suffix = ':'.join(str(part) for part in parts)
+        if len(suffix) > 64:
+            # Keep client-supplied parts (cursors) within memcached key limits.
+            suffix = hashlib.md5(suffix.encode()).hexdigest()
+        if version is None:
+            version = self.version()
+        return f'catalog:{version}:{name}:{suffix}'
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+
+    def get_or_load(self, name, loader, *parts):
+        """Return the cached value for ``name``/``parts``, calling ``loader`` on a miss."""
+        key = self.key(name, *parts)
+        value = self.cache.get(key, _MISSING)
+        self._count(value is not _MISSING)
+        if value is _MISSING:
+            value = loader()
+            self.cache.set(key, value)
+        return value
+
+    async def aget_or_load(self, name, loader, *parts):
+        """Async get_or_load; ``loader`` is called on a miss and its result awaited."""
+        key = self.key(name, *parts, version=await self.aversion())
+        value = await self.cache.aget(key, _MISSING)
+        self._count(value is not _MISSING)
+        if value is _MISSING:
+            value = await loader()
+            await self.cache.aset(key, value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_ratio': round(self._hits / total, 4) if total else 0.0,
+            }
+
+
+catalog_cache = CatalogCache()
@@ -0,0 +1,212 @@
+"""
+Streaming catalog import and export (CSV or JSON Lines).
+
+Rows are read and written through generators and applied in batches, so the
+memory used depends on the batch size and the number of categories, never on
+the size of the file. Products are matched on their natural key, the pair
+(category name, product name): new ones are inserted with ``bulk_create``,
+known ones are skipped when nothing changed and otherwise updated with one
+``executemany`` of a parameterised UPDATE. (``bulk_update`` builds a CASE
+expression per row and field and spends milliseconds per row in Python.)
+"""
+import csv
+import json
+import sys
+from contextlib import nullcontext
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from .bulk import MAX_STOCK, iter_keyset
+from .catalog_cache import catalog_cache
+from .models import Category, Product
+
+FIELDS = ('category', 'warehouse', 'name', 'description', 'price', 'stock', 'available')
+UPDATE_FIELDS = ('description', 'price', 'stock', 'available')
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 't'}
+
+
+class RowError(ValueError):
+    pass
+
+
+def guess_format(path, fmt=None):
+    if fmt:
+        return fmt
+    return 'jsonl' if str(path).endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+def open_text(path, mode):
+    if path == '-':
+        return nullcontext(sys.stdin if 'r' in mode else sys.stdout)
+    return open(path, mode, newline='', encoding='utf-8')
+
+
+def read_rows(stream, fmt):
+    if fmt == 'jsonl':
+        for number, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as exc:
+                # rejected by clean_row like any other bad row
+                yield RowError(f'line {number}: {exc}')
+    else:
+        yield from csv.DictReader(stream)
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def clean_row(row):
+    """Normalise one input row; raise RowError when it cannot be imported."""
+    if isinstance(row, RowError):
+        raise row
+    if not isinstance(row, dict):
+        raise RowError('each row must be an object')
+    category = (row.get('category') or '').strip()
+    name = (row.get('name') or '').strip()
+    if not category or not name:
+        raise RowError('category and name are required')
+    try:
+        price = Decimal(str(row.get('price')))
+        stock = int(row.get('stock') if row.get('stock') not in (None, '') else 100)
+    except (InvalidOperation, TypeError, ValueError):
+        raise RowError('price and stock must be numbers')
+    if not price.is_finite() or price < 0:
+        raise RowError('price must be a finite number, 0 or more')
+    if not 0 <= stock <= MAX_STOCK:
+        raise RowError(f'stock must be between 0 and {MAX_STOCK}')
+    available = row.get('available', True)
+    if isinstance(available, str):
+        available = available.strip().lower() in TRUE_VALUES
+    return {
+        'category': category,
+        'warehouse': (row.get('warehouse') or '').strip() or 'Windsor',
+        'name': name,
+        'description': row.get('description') or '',
+        'price': price,
+        'stock': stock,
+        'available': bool(available),
+    }
+
+
+class CatalogImporter:
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.categories = dict(Category.objects.values_list('name', 'pk'))
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.errors = 0
+
+    def _category_ids(self, rows):
+        missing = {}
+        for row in rows:
+            if row['category'] not in self.categories:
+                missing.setdefault(row['category'], row['warehouse'])
+        if missing:
+            Category.objects.bulk_create(Category(name=name, warehouse=warehouse)
+                                         for name, warehouse in missing.items())
+            self.categories.update(Category.objects.filter(name__in=missing).values_list('name', 'pk'))
+
+    def import_batch(self, raw_rows):
+        rows = {}
+        for raw in raw_rows:
+            try:
+                row = clean_row(raw)
+            except RowError:
+                self.errors += 1
+                continue
+            # Later rows for the same product win.
+            rows[(row['category'], row['name'])] = row
+        if not rows:
+            return
+        with transaction.atomic():
+            self._category_ids(rows.values())
+            existing = {}
+            matches = Product.objects.filter(
+                category_id__in={self.categories[category] for category, _ in rows},
+                name__in={name for _, name in rows},
+            ).order_by('-pk').values_list('category_id', 'name', 'pk', *UPDATE_FIELDS)
+            for category_id, name, *current in matches:
+                existing[(category_id, name)] = current
+
+            to_create, to_update = [], []
+            for (category, name), row in rows.items():
+                category_id = self.categories[category]
+                values = [row[field] for field in UPDATE_FIELDS]
+                current = existing.get((category_id, name))
+                if current is None:
+                    to_create.append(Product(category_id=category_id, name=name,
+                                             **dict(zip(UPDATE_FIELDS, values))))
+                elif current[1:] != values:
+                    to_update.append((current[0], values))
+            if to_create:
+                Product.objects.bulk_create(to_create)
+            if to_update:
+                self._update(to_update)
+        self.created += len(to_create)
+        self.updated += len(to_update)
+        self.unchanged += len(rows) - len(to_create) - len(to_update)
+
+    def _update(self, rows):
+        connection = connections[router.db_for_write(Product)]
+        fields = [Product._meta.get_field(name) for name in UPDATE_FIELDS + ('updated_at',)]
+        table = connection.ops.quote_name(Product._meta.db_table)
+        assignments = ', '.join(f'{connection.ops.quote_name(field.column)} = %s' for field in fields)
+        pk_column = connection.ops.quote_name(Product._meta.pk.column)
+        now = timezone.now()
+        params = [
+            [field.get_db_prep_save(value, connection) for field, value in zip(fields, [*values, now])] + [pk]
+            for pk, values in rows
+        ]
+        with connection.cursor() as cursor:
+            cursor.executemany(f'UPDATE {table} SET {assignments} WHERE {pk_column} = %s', params)
+
+    def run(self, raw_rows, progress=None):
+        total = 0
+        for batch in batched(raw_rows, self.batch_size):
+            self.import_batch(batch)
+            total += len(batch)
+            if progress:
+                progress(total)
+        catalog_cache.invalidate()
+        return total
+
+
+def export_rows(batch_size=1000):
+    products = Product.objects.select_related('category')
+    for product in iter_keyset(products, batch_size):
+        yield {
+            'category': product.category.name,
+            'warehouse': product.category.warehouse,
+            'name': product.name,
+            'description': product.description or '',
+            'price': str(product.price),
+            'stock': product.stock,
+            'available': product.available,
+        }
+
+
+def write_rows(stream, rows, fmt, fields=FIELDS):
+    if fmt == 'jsonl':
+        for row in rows:
+            stream.write(json.dumps(row, separators=(',', ':')) + '\n')
+            yield row
+    else:
+        writer = csv.DictWriter(stream, fieldnames=fields)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            yield row
@@ -0,0 +1,140 @@
+"""
+Write-behind counter for ``Product.interested``.
+
+Clicks are summed in process and written out as ``interested = interested + n``
+updates, either when the buffer reaches ``FLUSH_THRESHOLD`` increments or
+``FLUSH_INTERVAL`` seconds after the first buffered click. Products that share
+the same delta are updated by a single statement. Set ``SYNC`` to write every
+increment straight away (handy for tests and the shell).
+
+Configured through the ``INTEREST_COUNTER`` setting.
+"""
+import atexit
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+
+from .models import Product
+
+DEFAULTS = {
+    'SYNC': False,
+    'FLUSH_INTERVAL': 5.0,
+    'FLUSH_THRESHOLD': 100,
+}
+
+
+class InterestCounter:
+    def __init__(self, sync=False, flush_interval=5.0, flush_threshold=100):
+        self.sync = sync
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = Counter()
+        self._buffered = 0
+        self._timer = None
+        self._stats = {
+            'flushes': 0,
+            'flushed_delta': 0,
+            'flush_errors': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+            'total_flush_ms': 0.0,
+        }
+
+    def increment(self, product_id, amount=1):
+        if self.sync:
+            self._write({product_id: amount})
+            return
+        with self._lock:
+            self._pending[product_id] += amount
+            self._buffered += amount
+            full = self._buffered >= self.flush_threshold
+            if not full and self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self._flush_from_timer)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+
+    def pending(self, product_id):
+        """Clicks for ``product_id`` that are not in the database yet."""
+        with self._lock:
+            return self._pending.get(product_id, 0)
+
+    def flush(self):
+        """Write every buffered increment; return the number of clicks written."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, Counter()
+                self._buffered = 0
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            if not pending:
+                return 0
+            try:
+                self._write(pending)
+            except Exception:
+                # Put the clicks back so the next flush retries them.
+                with self._lock:
+                    self._pending.update(pending)
+                    self._buffered += sum(pending.values())
+                    self._stats['flush_errors'] += 1
+                raise
+            return sum(pending.values())
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['buffered_products'] = len(self._pending)
+            stats['buffered_delta'] = self._buffered
+        return stats
+
+    def _flush_from_timer(self):
+        try:
+            self.flush()
+        except Exception:
+            pass
+        finally:
+            connection.close()
+
+    def _write(self, deltas):
+        by_delta = defaultdict(list)
+        for product_id, delta in deltas.items():
+            by_delta[delta].append(product_id)
+        start = time.perf_counter()
+        with transaction.atomic():
+            for delta, product_ids in by_delta.items():
+                Product.objects.filter(pk__in=product_ids).update(interested=F('interested') + delta)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self._stats['flushes'] += 1
+            self._stats['flushed_delta'] += sum(deltas.values())
+            self._stats['last_flush_ms'] = round(elapsed_ms, 3)
+            self._stats['max_flush_ms'] = round(max(self._stats['max_flush_ms'], elapsed_ms), 3)
+            self._stats['total_flush_ms'] = round(self._stats['total_flush_ms'] + elapsed_ms, 3)
+
+
+_counter = None
+_counter_lock = threading.Lock()
+
+
+def get_interest_counter():
+    """Return the process-wide counter built from ``settings.INTEREST_COUNTER``."""
+    global _counter
+    if _counter is None:
+        with _counter_lock:
+            if _counter is None:
+                config = {**DEFAULTS, **getattr(settings, 'INTEREST_COUNTER', {})}
+                _counter = InterestCounter(
+                    sync=config['SYNC'],
+                    flush_interval=config['FLUSH_INTERVAL'],
+                    flush_threshold=config['FLUSH_THRESHOLD'],
+                )
+                atexit.register(_counter.flush)
+    return _counter
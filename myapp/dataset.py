@@ -0,0 +1,195 @@
+"""
+Synthetic data for reproducing production-sized performance locally.
+
+Everything is drawn from one seeded ``random.Random``, so the same arguments
+and ``until`` date give the same rows. Products get Zipfian popularity (with
+the default exponent of 1 the best seller is ordered twice as often as the
+second), clients are spread over the provinces by population, and orders
+cover every status over the ``days`` before ``until``.
+
+Categories and products go through ``bulk_create``; clients (a multi-table
+model), their profiles and interests, and the orders are inserted with raw
+``executemany`` in batches, one transaction per batch. On SQLite each batch of
+orders drops and recreates the rollup insert trigger inside its transaction,
+so other connections never see it missing, and the rollups are rebuilt once at
+the end instead; that halves the cost of an order.
+"""
+import datetime
+import itertools
+import random
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from .analytics import refresh_rollups
+from .bulk import MAX_STOCK
+from .catalog_cache import catalog_cache
+from .models import Category, Client, Order, Product, Profile
+
+WAREHOUSES = ['Windsor', 'London', 'Waterloo']
+# province -> (share of clients, cities)
+PROVINCES = {
+    'ON': (55, ['Toronto', 'Ottawa', 'Windsor', 'London', 'Waterloo']),
+    'QC': (25, ['Montreal', 'Quebec City', 'Laval']),
+    'AB': (13, ['Calgary', 'Edmonton']),
+    'MB': (7, ['Winnipeg', 'Brandon']),
+}
+# status -> share of orders
+STATUSES = {Order.DELIVERED: 60, Order.SHIPPED: 15, Order.PLACED: 15, Order.CANCELLED: 10}
+# units per order -> share
+UNITS = {1: 50, 2: 25, 3: 12, 4: 8, 5: 5}
+ADJECTIVES = ['Classic', 'Compact', 'Deluxe', 'Eco', 'Heavy', 'Light', 'Mini', 'Pro', 'Smart', 'Ultra']
+NOUNS = ['Blender', 'Camera', 'Chair', 'Desk', 'Headset', 'Kettle', 'Lamp', 'Monitor', 'Router', 'Speaker',
+         'Tablet', 'Toaster']
+# the M2M table the interested_in links go into
+INTERESTS = Client.interested_in.through
+# see migration 0014
+ORDER_TRIGGER = 'myapp_order_rollup_insert'
+# SQLite page cache while inserting orders, in KiB
+CACHE_KIB = 256 * 1024
+
+
+def zipf_weights(count, exponent):
+    """Cumulative weights of ranks 1..count under Zipf's law, for ``Random.choices``."""
+    return list(itertools.accumulate(1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+def _choices(rng, shares, count):
+    return rng.choices(list(shares), weights=list(shares.values()), k=count)
+
+
+def _batches(total, batch_size):
+    for offset in range(0, total, batch_size):
+        yield offset, min(batch_size, total - offset)
+
+
+def _insert(cursor, model, columns, rows):
+    qn = cursor.db.ops.quote_name
+    cursor.executemany(
+        f'INSERT INTO {qn(model._meta.db_table)} ({", ".join(qn(column) for column in columns)}) '
+        f'VALUES ({", ".join(["%s"] * len(columns))})', rows)
+
+
+def _add_catalog(rng, categories, products, using, batch_size):
+    created = Category.objects.using(using).bulk_create(
+        Category(name=f'Category {i}', warehouse=WAREHOUSES[i % len(WAREHOUSES)]) for i in range(categories))
+    # a few big categories and a long tail
+    category_weights = zipf_weights(len(created), 0.8)
+    for offset, count in _batches(products, batch_size):
+        rows = []
+        for i, category in zip(range(offset, offset + count), rng.choices(created, cum_weights=category_weights,
+                                                                          k=count)):
+            name = f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}'
+            rows.append(Product(
+                category=category, name=name, description=f'{name} from {category.name}.',
+                price=Decimal(f'{min(rng.lognormvariate(3.5, 1.0), 99999):.2f}'),
+                stock=rng.randint(0, MAX_STOCK), available=rng.random() < 0.95))
+        with transaction.atomic(using=using):
+            Product.objects.using(using).bulk_create(rows)
+    return [category.pk for category in created]
+
+
+def _add_clients(rng, clients, category_ids, using, password, batch_size):
+    if User.objects.using(using).filter(username='client00000000').exists():
+        raise ValueError('Generated clients already exist in this database; start from an empty one.')
+    now = timezone.now()
+    category_weights = zipf_weights(len(category_ids), 1.0)
+    connection = connections[using]
+    client_ids = []
+    for offset, count in _batches(clients, batch_size):
+        provinces = _choices(rng, {code: share for code, (share, cities) in PROVINCES.items()}, count)
+        names = [f'client{i:08d}' for i in range(offset, offset + count)]
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            _insert(cursor, User, ['password', 'is_superuser', 'username', 'first_name', 'last_name', 'email',
+                                   'is_staff', 'is_active', 'date_joined'],
+                    [(password, False, name, 'Client', str(i), f'{name}@example.com', False, True, now)
+                     for i, name in enumerate(names, offset)])
+            ids = list(User.objects.using(using).filter(username__gte=names[0], username__lte=names[-1])
+                       .order_by('username').values_list('pk', flat=True))
+            _insert(cursor, Client, ['user_ptr_id', 'company', 'city', 'province'],
+                    [(pk, '', rng.choice(PROVINCES[province][1]), province) for pk, province in zip(ids, provinces)])
+            _insert(cursor, Profile, ['user_id', 'avatar', 'bio', 'avatar_hash', 'processed_hash'],
+                    [(pk, 'default.jpg', '', '', '') for pk in ids])
+            _insert(cursor, INTERESTS, ['client_id', 'category_id'], [
+                (pk, category)
+                for pk in ids
+                for category in set(rng.choices(category_ids, cum_weights=category_weights, k=rng.randint(0, 3)))
+            ])
+        client_ids += ids
+    return client_ids
+
+
+def _add_orders(rng, orders, product_ids, client_ids, days, until, exponent, using, batch_size, progress):
+    # popularity follows a shuffled rank, so best sellers are spread over the categories
+    ranked = product_ids[:]
+    rng.shuffle(ranked)
+    product_weights = zipf_weights(len(ranked), exponent)
+    dates = [(until - datetime.timedelta(days=day)).isoformat() for day in range(days)]
+    connection = connections[using]
+    trigger = cache_size = None
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = %s", [ORDER_TRIGGER])
+            trigger = (cursor.fetchone() or [None])[0]
+            cache_size = cursor.execute('PRAGMA cache_size').fetchone()[0]
+            cursor.execute(f'PRAGMA cache_size = {-CACHE_KIB}')
+    try:
+        for offset, count in _batches(orders, batch_size):
+            rows = zip(rng.choices(ranked, cum_weights=product_weights, k=count), rng.choices(client_ids, k=count),
+                       _choices(rng, UNITS, count), _choices(rng, STATUSES, count), rng.choices(dates, k=count))
+            with transaction.atomic(using=using), connection.cursor() as cursor:
+                if trigger:
+                    cursor.execute(f'DROP TRIGGER {ORDER_TRIGGER}')
+                _insert(cursor, Order, ['product_id', 'client_id', 'num_units', 'order_status', 'status_date'],
+                        rows)
+                if trigger:
+                    cursor.execute(trigger)
+            if progress:
+                progress('orders', offset + count)
+    finally:
+        if cache_size is not None:
+            with connection.cursor() as cursor:
+                cursor.execute(f'PRAGMA cache_size = {cache_size}')
+
+
+def _check_sizes(categories, products, clients, orders, days, batch_size):
+    """Reject sizes the generator cannot honour, before anything is written."""
+    counts = {'categories': categories, 'products': products, 'clients': clients, 'orders': orders}
+    negative = [name for name, count in counts.items() if count < 0]
+    if negative:
+        raise ValueError(f'The number of {" and ".join(negative)} cannot be negative.')
+    if days < 1:
+        raise ValueError('Order history needs at least one day.')
+    if batch_size < 1:
+        raise ValueError('The batch size must be at least 1.')
+    if (products or clients) and not categories:
+        raise ValueError('Products and clients need at least one category.')
+    if orders and not (products and clients):
+        raise ValueError('Orders need at least one product and client.')
+
+
+def generate_dataset(categories, products, clients, orders, seed=1, exponent=1.0, days=365, until=None,
+                     password=None, batch_size=100000, progress=None):
+    """
+    Add the given numbers of rows. Clients get ``password``, or an unusable
+    one. ``progress(table, rows)`` is called after each batch of orders.
+    """
+    _check_sizes(categories, products, clients, orders, days, batch_size)
+    rng = random.Random(seed)
+    until = until or datetime.date.today()
+    using = router.db_for_write(Order)
+    category_ids = _add_catalog(rng, categories, products, using, batch_size)
+    if progress:
+        progress('products', products)
+    client_ids = _add_clients(rng, clients, category_ids, using, make_password(password), batch_size)
+    if progress:
+        progress('clients', clients)
+    product_ids = list(Product.objects.using(using).filter(category__in=category_ids)
+                       .order_by('pk').values_list('pk', flat=True))
+    _add_orders(rng, orders, product_ids, client_ids, days, until, exponent, using, batch_size, progress)
+    rollups = refresh_rollups(full=True)
+    catalog_cache.invalidate()
+    return rollups
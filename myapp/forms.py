@@ -1,16 +1,46 @@
 from django import forms
+from django.conf import settings
 from django.contrib.auth.forms import UserCreationForm
+from django.urls import reverse
+from myapp.lookups import selected_label
 from myapp.models import Order, Client, Profile
 from django.contrib.auth.models import User
 
 
+class LookupInput(forms.TextInput):
+    """
+    Text input holding a primary key, with suggestions fetched from a lookup
+    endpoint as the user types. Only the selected object is ever queried.
+    """
+    template_name = 'myapp/widgets/lookup.html'
+
+    class Media:
+        js = ('myapp/lookup.js',)
+
+    def __init__(self, lookup, attrs=None):
+        super().__init__(attrs)
+        self.lookup = lookup
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['url'] = reverse(f'myapp:lookup-{self.lookup}')
+        context['widget']['selected'] = selected_label(self.lookup, value)
+        return context
+
+
 class OrderForm(forms.ModelForm):
+    def __init__(self, *args, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if user is not None and user.is_authenticated:
+            self.fields['client'].initial = user.pk
+
     class Meta:
         model = Order
         fields = ('client', 'product', 'num_units')
 
         widgets = {
-            'client': forms.RadioSelect(),
+            'client': LookupInput('clients'),
+            'product': LookupInput('products'),
         }
 
         labels = {
@@ -19,6 +49,43 @@ class OrderForm(forms.ModelForm):
         }
 
 
+class CartForm(forms.Form):
+    client = forms.ModelChoiceField(queryset=Client.objects.all(), widget=LookupInput('clients'),
+                                    label='Client Name')
+
+    def __init__(self, *args, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if user is not None and user.is_authenticated:
+            self.fields['client'].initial = user.pk
+
+
+class CartLineForm(forms.Form):
+    # checked against the stock by reserve_cart, not one query per line here
+    product = forms.IntegerField(widget=LookupInput('products'))
+    num_units = forms.IntegerField(min_value=1, label='Quantity')
+
+
+class BaseCartFormSet(forms.BaseFormSet):
+    def clean(self):
+        if not any(self.errors) and not self.lines():
+            raise forms.ValidationError('Add at least one product.')
+
+    def lines(self):
+        return [(form.cleaned_data['product'], form.cleaned_data['num_units'])
+                for form in self.forms if form.cleaned_data]
+
+    def add_shortfalls(self, shortfalls):
+        available = {shortfall.product_id: shortfall.available for shortfall in shortfalls}
+        for form in self.forms:
+            product = form.cleaned_data.get('product')
+            if product in available:
+                form.add_error('num_units', f'Only {available[product]} in stock.')
+
+
+CartFormSet = forms.formset_factory(CartLineForm, formset=BaseCartFormSet, extra=10,
+                                    max_num=settings.CART_MAX_LINES, validate_max=True)
+
+
 class InterestForm(forms.Form):
     # interested = forms.CharField(widget=forms.RadioSelect)
     interested = forms.ChoiceField(choices=[(1, 'Yes'), (0, 'No')], widget=forms.RadioSelect)
@@ -0,0 +1,66 @@
+"""
+The queries behind the busiest views, with representative parameters.
+
+``manage.py explain_hot_queries`` runs each one through EXPLAIN QUERY PLAN so a
+missing or unusable index shows up before it shows up in production.
+"""
+import datetime
+
+from django.db.models import Q
+
+from .http_cache import last_modified_query
+from .lookups import prefix_filter
+from .models import Category, Client, Order, Product
+
+
+def hot_queries():
+    """Return (view, description, queryset) for every hot query."""
+    category_id = Category.objects.values_list('pk', flat=True).first() or 1
+    product_id = Product.objects.values_list('pk', flat=True).first() or 1
+    product_name = Product.objects.values_list('name', flat=True).first() or ''
+    client_id = Client.objects.values_list('pk', flat=True).first() or 1
+    username = Client.objects.values_list('username', flat=True).first() or 'a'
+    today = datetime.date.today()
+    orders = Order.objects.filter(client_id=client_id)
+    return [
+        ('index', 'first categories', Category.objects.order_by('id')[:11]),
+        ('index', 'catalog last modified', last_modified_query()),
+        ('detail', 'category last modified', last_modified_query(category_id)),
+        ('detail', 'category by pk', Category.objects.filter(pk=category_id)),
+        ('detail', 'available products of a category',
+         Product.objects.filter(category_id=category_id, available=True).order_by('id')[:11]),
+        ('detail', 'next page of a category',
+         Product.objects.filter(category_id=category_id, available=True, id__gt=product_id).order_by('id')[:11]),
+        ('products', 'available products',
+         Product.objects.filter(available=True).order_by('id')[:11]),
+        ('products', 'next page of available products',
+         Product.objects.filter(available=True, id__gt=product_id).order_by('id')[:11]),
+        ('place_order', 'stock reservation',
+         Product.objects.filter(pk=product_id, stock__gte=1)),
+        ('place_order', 'product by name', Product.objects.filter(name=product_name)),
+        ('lookups', 'clients by username prefix',
+         Client.objects.filter(**prefix_filter('username', username[:2])).order_by('username')[:21]),
+        ('lookups', 'first available products',
+         Product.objects.filter(available=True).order_by('id')[:21]),
+        ('productdetail', 'product by pk', Product.objects.filter(pk=product_id)),
+        ('myorders', 'client by pk', Client.objects.filter(pk=client_id)),
+        ('myorders', 'distinct ordered products',
+         Product.objects.filter(order__client_id=client_id).distinct().order_by('name').values_list('name')),
+        ('myorders', 'order history page',
+         orders.select_related('product').with_line_total().order_by('-status_date', '-id')[:21]),
+        ('myorders', 'next order history page',
+         orders.filter(Q(status_date__lt=today) | Q(status_date=today, id__lt=10 ** 9))
+         .select_related('product').order_by('-status_date', '-id')[:21]),
+    ]
+
+
+def full_scans(queryset, plan):
+    """Return the plan steps that read a whole table rather than an index."""
+    # A scan in primary key order that stops at LIMIT only reads one page.
+    rowid_order = (queryset.query.high_mark is not None
+                   and list(queryset.query.order_by) in (['id'], ['pk'])
+                   and not any('TEMP B-TREE FOR ORDER BY' in step for step in plan))
+    return [
+        step for step in plan
+        if step.startswith('SCAN ') and ' INDEX ' not in step and not rowid_order
+    ]
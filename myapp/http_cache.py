@@ -0,0 +1,65 @@
+"""
+HTTP caching for the public catalog pages.
+
+Anonymous responses get ``Last-Modified`` (the newest ``updated_at`` of the
+catalog, or of one category and its products, and the last category deletion) and ``Cache-Control: public``,
+so browsers and edge caches can keep them for CATALOG_HTTP_MAX_AGE seconds and
+then revalidate: an unchanged catalog answers ``If-Modified-Since`` with a 304
+after a single index-only query. Pages for logged-in users show the user and
+are marked private.
+"""
+from functools import wraps
+
+from django.conf import settings
+from django.db.models import Max, Value
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .models import CatalogDeletion, Category, Product
+
+
+def _latest(queryset, field='updated_at'):
+    # Grouping by a constant leaves a bare MAX(), answered from the index.
+    return queryset.order_by().annotate(catalog=Value(1)).values('catalog').values_list(Max(field))
+
+
+def last_modified_query(category_id=None):
+    categories = Category.objects.all()
+    products = Product.objects.all()
+    if category_id is not None:
+        # a deleted category's page is a 404 either way
+        return _latest(categories.filter(pk=category_id)).union(
+            _latest(products.filter(category_id=category_id)), all=True)
+    return _latest(categories).union(_latest(products), _latest(CatalogDeletion.objects.all(), 'deleted_at'),
+                                     all=True)
+
+
+def catalog_last_modified(category_id=None):
+    """When the catalog (or one category) last changed, or None if it is empty."""
+    return max((latest for latest, in last_modified_query(category_id) if latest), default=None)
+
+
+def cache_catalog_page(category_kwarg=None):
+    """
+    Decorate a catalog view with Last-Modified and Cache-Control handling.
+
+    ``category_kwarg`` names the URL argument holding a category id when the
+    page only depends on that category.
+    """
+    def last_modified(request, *args, **kwargs):
+        return catalog_last_modified(kwargs.get(category_kwarg) if category_kwarg else None)
+
+    def decorator(view):
+        conditional_view = condition(last_modified_func=last_modified)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.user.is_authenticated or getattr(request, 'login_expired', False):
+                response = view(request, *args, **kwargs)
+                patch_cache_control(response, private=True, no_cache=True)
+                return response
+            response = conditional_view(request, *args, **kwargs)
+            patch_cache_control(response, public=True, max_age=settings.CATALOG_HTTP_MAX_AGE)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,81 @@
+"""
+Lookups behind the order form's client and product inputs.
+
+    GET lookups/clients/?q=<username prefix>
+    GET lookups/products/?q=<words>
+
+Each returns one keyset page of ``{"id": pk, "text": label}`` items and the
+URL of the next page, so neither the form nor the endpoints ever load a whole
+table. Clients are matched on a username prefix (a range over the unique
+username index, so it is case-sensitive); products go through the full-text
+search, or list available products by id when ``q`` is empty.
+"""
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.views.decorators.http import require_safe
+
+from .api import next_page_url
+from .models import Client, Product
+from .pagination import keyset_page, page_size_from
+from .search import search_products
+
+
+def prefix_filter(field, prefix):
+    """Filter kwargs for ``field`` starting with ``prefix`` that an index can answer."""
+    return {f'{field}__gte': prefix, f'{field}__lt': prefix + '\U0010ffff'}
+
+
+def client_label(client):
+    return f'{client} ({client.username})'
+
+
+def find_clients(query, cursor=None, page_size=20):
+    clients = Client.objects.only('username', 'first_name', 'last_name')
+    if query:
+        clients = clients.filter(**prefix_filter('username', query))
+    return keyset_page(clients, ('username',), cursor, page_size)
+
+
+def find_products(query, cursor=None, page_size=20):
+    if query:
+        return search_products(query, cursor=cursor, page_size=page_size)
+    return keyset_page(Product.objects.filter(available=True).only('name'), ('id',), cursor, page_size)
+
+
+LOOKUPS = {
+    'clients': (Client, find_clients, client_label),
+    'products': (Product, find_products, str),
+}
+
+
+def selected_label(lookup, pk):
+    """Label of the object ``pk`` refers to, or '' when there is none."""
+    if pk in (None, ''):
+        return ''
+    model, find, label = LOOKUPS[lookup]
+    try:
+        obj = model.objects.filter(pk=pk).first()
+    except (TypeError, ValueError):
+        return ''
+    return label(obj) if obj is not None else ''
+
+
+def lookup_view(lookup):
+    model, find, label = LOOKUPS[lookup]
+
+    @login_required
+    @require_safe
+    def view(request):
+        page_size = page_size_from(request, settings.LOOKUP_PAGE_SIZE, settings.CATALOG_MAX_PAGE_SIZE)
+        page = find(request.GET.get('q', '').strip(), request.GET.get('cursor'), page_size)
+        return JsonResponse({
+            'results': [{'id': obj.pk, 'text': label(obj)} for obj in page],
+            'next': next_page_url(request, page),
+        })
+    view.__name__ = lookup
+    return view
+
+
+clients = lookup_view('clients')
+products = lookup_view('products')
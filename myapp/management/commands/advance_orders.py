@@ -0,0 +1,30 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.models import Category
+from myapp.status import STATUS_NAMES, advance_orders, orders_to_advance
+
+
+class Command(BaseCommand):
+    help = 'Move orders to shipped, delivered or cancelled in chunks, per warehouse or for all of them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('status', choices=sorted(STATUS_NAMES))
+        parser.add_argument('--warehouse', nargs='+',
+                            help='Only orders for products stored here; each warehouse is run separately.')
+        parser.add_argument('--before', type=datetime.date.fromisoformat,
+                            help='Only orders whose status last changed before this day, YYYY-MM-DD.')
+        parser.add_argument('--chunk-size', type=int)
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help='Seconds to wait between chunks, leaving the database to checkouts.')
+
+    def handle(self, *args, status, warehouse, before, chunk_size, pause, **options):
+        known = set(Category.objects.values_list('warehouse', flat=True))
+        unknown = sorted(set(warehouse or ()) - known)
+        if unknown:
+            raise CommandError(f'Unknown warehouse: {", ".join(unknown)}. Choose from: {", ".join(sorted(known))}.')
+        for name in warehouse or [None]:
+            orders = orders_to_advance(STATUS_NAMES[status], name, before)
+            result = advance_orders(orders, STATUS_NAMES[status], chunk_size, pause)
+            self.stdout.write(f'{name or "all warehouses"}: {result}')
@@ -0,0 +1,45 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.benchmarks import SCENARIOS, compare_to_baseline, scratch_database
+
+
+class Command(BaseCommand):
+    help = 'Run a benchmark scenario against a throwaway copy of the database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--json', dest='json_output', action='store_true',
+                            help='Print the results as JSON.')
+        parser.add_argument('--baseline', help='JSON results of an earlier run; fail on regressions against it.')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Allowed relative change in timings and throughput before failing.')
+        parser.add_argument('--save-baseline', metavar='FILE', help='Write the results to FILE as JSON.')
+        subparsers = parser.add_subparsers(dest='scenario', required=True)
+        for name, scenario in SCENARIOS.items():
+            scenario.add_arguments(subparsers.add_parser(name, help=scenario.help))
+
+    def handle(self, *args, scenario, json_output, baseline, tolerance, save_baseline, **options):
+        if baseline:
+            # read it first, so a bad path fails before the run rather than after
+            try:
+                with open(baseline) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f'Cannot read the baseline: {exc}')
+        with scratch_database():
+            results = SCENARIOS[scenario].run(self.stdout, **options)
+        if save_baseline:
+            with open(save_baseline, 'w') as f:
+                json.dump(results, f, indent=2)
+        if json_output:
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            width = max(len(key) for key in results)
+            for key, value in results.items():
+                self.stdout.write(f'{key.ljust(width)}  {value}')
+        if baseline:
+            regressions = compare_to_baseline(results, baseline, tolerance)
+            if regressions:
+                raise CommandError(f'{len(regressions)} regressions against the baseline:\n'
+                                   + '\n'.join(regressions))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.catalog_io import export_rows, guess_format, open_text, write_rows
+
+
+class Command(BaseCommand):
+    help = 'Stream all products to a CSV or JSON Lines file ("-" writes stdout).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'])
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--progress-every', type=int, default=100000,
+                            help='Print progress every N rows.')
+
+    def handle(self, *args, path, format, batch_size, progress_every, **options):
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1.')
+        fmt = guess_format(path, format)
+        start = time.perf_counter()
+        total = 0
+        with open_text(path, 'w') as stream:
+            for total, _ in enumerate(write_rows(stream, export_rows(batch_size), fmt), 1):
+                if total % progress_every == 0:
+                    self.stderr.write(f'{total} rows, {total / (time.perf_counter() - start):.0f} rows/s')
+        elapsed = time.perf_counter() - start
+        self.stderr.write(f'{total} rows in {elapsed:.1f}s ({total / elapsed if elapsed else 0:.0f} rows/s).')
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.catalog_io import CatalogImporter, guess_format, open_text, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Upsert categories and products from a CSV or JSON Lines file ("-" reads stdin).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'])
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--progress-every', type=int, default=100000,
+                            help='Print progress every N rows.')
+
+    def handle(self, *args, path, format, batch_size, progress_every, **options):
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1.')
+        fmt = guess_format(path, format)
+        importer = CatalogImporter(batch_size=batch_size)
+        start = time.perf_counter()
+        next_report = [progress_every]
+
+        def progress(total):
+            if total >= next_report[0]:
+                next_report[0] += progress_every
+                elapsed = time.perf_counter() - start
+                self.stderr.write(f'{total} rows, {total / elapsed:.0f} rows/s')
+
+        try:
+            with open_text(path, 'r') as stream:
+                total = importer.run(read_rows(stream, fmt), progress)
+        except (OSError, ValueError) as exc:
+            raise CommandError(exc)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f'{total} rows in {elapsed:.1f}s ({total / elapsed if elapsed else 0:.0f} rows/s): '
+            f'{importer.created} created, {importer.updated} updated, '
+            f'{importer.unchanged} unchanged, {importer.errors} rejected.'
+        )
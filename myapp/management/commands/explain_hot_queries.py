@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, router
+
+from myapp.hot_queries import full_scans, hot_queries
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN QUERY PLAN for every hot view query; fails on a full table scan.'
+
+    def handle(self, *args, **options):
+        failures = []
+        for view, description, queryset in hot_queries():
+            connection = connections[router.db_for_read(queryset.model)]
+            if connection.vendor != 'sqlite':
+                raise CommandError('explain_hot_queries understands SQLite query plans only.')
+            sql, params = queryset.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                plan = [row[-1] for row in cursor.fetchall()]
+            scans = full_scans(queryset, plan)
+            status = self.style.ERROR('SCAN') if scans else self.style.SUCCESS('ok')
+            self.stdout.write(f'[{status}] {view}: {description}')
+            for step in plan:
+                self.stdout.write(f'    {step}')
+            if scans:
+                failures.append(f'{view}: {description}')
+        if failures:
+            raise CommandError('Full table scans in: ' + '; '.join(failures))
@@ -0,0 +1,37 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.catalog_io import guess_format, open_text, write_rows
+from myapp.models import Order
+from myapp.order_export import FIELDS, export_ordering, export_rows, filter_orders
+
+
+class Command(BaseCommand):
+    help = 'Stream orders to a CSV or JSON Lines file ("-" writes stdout).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'])
+        parser.add_argument('--start', type=datetime.date.fromisoformat, help='First status date, YYYY-MM-DD.')
+        parser.add_argument('--end', type=datetime.date.fromisoformat, help='Last status date, YYYY-MM-DD.')
+        parser.add_argument('--status', type=int, nargs='+', choices=[value for value, label in Order.ORDER_STATUS])
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--progress-every', type=int, default=100000,
+                            help='Print progress every N rows.')
+
+    def handle(self, *args, path, format, start, end, status, batch_size, progress_every, **options):
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1.')
+        fmt = guess_format(path, format)
+        orders = filter_orders(start=start, end=end, statuses=status)
+        rows = export_rows(orders, export_ordering(start, end), batch_size)
+        began = time.perf_counter()
+        total = 0
+        with open_text(path, 'w') as stream:
+            for total, _ in enumerate(write_rows(stream, rows, fmt, FIELDS), 1):
+                if total % progress_every == 0:
+                    self.stderr.write(f'{total} rows, {total / (time.perf_counter() - began):.0f} rows/s')
+        elapsed = time.perf_counter() - began
+        self.stderr.write(f'{total} rows in {elapsed:.1f}s ({total / elapsed if elapsed else 0:.0f} rows/s).')
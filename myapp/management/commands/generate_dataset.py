@@ -0,0 +1,39 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.dataset import generate_dataset
+
+
+class Command(BaseCommand):
+    help = 'Add a synthetic, production-sized catalog, clients and orders, reproducibly from --seed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=50)
+        parser.add_argument('--products', type=int, default=100000)
+        parser.add_argument('--clients', type=int, default=100000)
+        parser.add_argument('--orders', type=int, default=1000000)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--zipf', type=float, default=1.0, help='Exponent of product popularity.')
+        parser.add_argument('--days', type=int, default=365, help='Days of order history.')
+        parser.add_argument('--until', type=datetime.date.fromisoformat,
+                            help='Last day of order history, YYYY-MM-DD (default today).')
+        parser.add_argument('--password', help='Password of every generated client (default unusable).')
+        parser.add_argument('--batch-size', type=int, default=100000)
+
+    def handle(self, *args, categories, products, clients, orders, seed, zipf, days, until, password, batch_size,
+               **options):
+        start = time.perf_counter()
+
+        def progress(table, rows):
+            elapsed = time.perf_counter() - start
+            self.stderr.write(f'{table}: {rows} rows, {elapsed:.1f}s')
+
+        try:
+            rollups = generate_dataset(categories, products, clients, orders, seed, zipf, days, until, password,
+                                       batch_size, progress)
+        except ValueError as exc:
+            raise CommandError(exc)
+        self.stdout.write(f'{categories} categories, {products} products, {clients} clients and {orders} orders '
+                          f'in {time.perf_counter() - start:.1f}s; {rollups} rollup rows rebuilt.')
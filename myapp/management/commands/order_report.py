@@ -0,0 +1,37 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.analytics import DIMENSIONS, order_totals, rollup_totals
+from myapp.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Print order counts, units and revenue grouped by the given dimensions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--by', nargs='+', choices=list(DIMENSIONS), default=['category'])
+        parser.add_argument('--start', type=datetime.date.fromisoformat, help='First day, YYYY-MM-DD.')
+        parser.add_argument('--end', type=datetime.date.fromisoformat, help='Last day, YYYY-MM-DD.')
+        parser.add_argument('--status', type=int, nargs='+', choices=[value for value, label in Order.ORDER_STATUS])
+        parser.add_argument('--live', action='store_true',
+                            help='Aggregate the orders instead of reading the rollups.')
+
+    def handle(self, *args, by, start, end, status, live, **options):
+        if live:
+            orders = Order.objects.all()
+            if start is not None:
+                orders = orders.filter(status_date__gte=start)
+            if end is not None:
+                orders = orders.filter(status_date__lte=end)
+            if status is not None:
+                orders = orders.filter(order_status__in=status)
+            rows = order_totals(by, orders)
+        else:
+            rows = rollup_totals(by, start, end, status)
+        if not rows:
+            raise CommandError('No orders match.')
+        columns = [*by, 'orders', 'units', 'revenue']
+        self.stdout.write('\t'.join(columns))
+        for row in rows:
+            self.stdout.write('\t'.join(str(row[column]) for column in columns))
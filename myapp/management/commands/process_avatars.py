@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.avatars import enqueue_avatar, process_job, reclaim_stalled
+from myapp.models import AvatarJob, Profile, content_hash
+
+
+class Command(BaseCommand):
+    help = 'Process queued avatar jobs in the foreground.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rehash', action='store_true',
+                            help='Hash and queue existing avatars that were uploaded before the pipeline.')
+        parser.add_argument('--retry-failed', action='store_true', help='Queue failed jobs again.')
+        parser.add_argument('--reclaim-running', type=int, metavar='SECONDS',
+                            help='Queue again jobs that have been running longer than this, '
+                                 'e.g. because their process was restarted.')
+
+    def handle(self, *args, rehash, retry_failed, reclaim_running, **options):
+        if rehash:
+            for profile in Profile.objects.filter(avatar_hash=''):
+                if not profile.avatar.storage.exists(profile.avatar.name):
+                    continue
+                profile.avatar_hash = content_hash(profile.avatar)
+                Profile.objects.filter(pk=profile.pk).update(avatar_hash=profile.avatar_hash)
+                enqueue_avatar(profile)
+        if reclaim_running is not None:
+            if reclaim_running < 0:
+                raise CommandError('--reclaim-running cannot be negative.')
+            self.stdout.write(f'{reclaim_stalled(reclaim_running)} stalled jobs queued again.')
+        if retry_failed:
+            AvatarJob.objects.filter(status=AvatarJob.FAILED).update(status=AvatarJob.PENDING, error='')
+
+        done = failed = 0
+        for job_id in AvatarJob.objects.filter(status=AvatarJob.PENDING).values_list('pk', flat=True):
+            status = process_job(job_id)
+            if status == AvatarJob.FAILED:
+                failed += 1
+            elif status == AvatarJob.DONE:
+                done += 1
+        self.stdout.write(f'{done} jobs processed, {failed} failed.')
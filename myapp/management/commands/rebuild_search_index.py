@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import router
+
+from myapp.models import Product
+from myapp.search import fts_enabled, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the product full-text index from the product table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--optimize', action='store_true',
+                            help='Merge the index into a single b-tree afterwards (faster queries).')
+
+    def handle(self, *args, optimize, **options):
+        if not fts_enabled(router.db_for_write(Product)):
+            raise CommandError('The full-text index only exists on SQLite.')
+        start = time.perf_counter()
+        count = rebuild_index(optimize)
+        self.stdout.write(f'Indexed {count} products in {time.perf_counter() - start:.1f}s.')
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from myapp.analytics import refresh_rollups
+
+
+class Command(BaseCommand):
+    help = 'Apply pending order changes to the daily rollups, once or every --interval seconds.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Rebuild every day from the orders, e.g. on databases without the triggers.')
+        parser.add_argument('--interval', type=float,
+                            help='Keep running and refresh every INTERVAL seconds.')
+
+    def handle(self, *args, full, interval, **options):
+        while True:
+            start = time.perf_counter()
+            count = refresh_rollups(full)
+            what = 'rollup rows rebuilt' if full else 'changes applied'
+            self.stdout.write(f'{count} {what} in {(time.perf_counter() - start) * 1000:.0f} ms')
+            if interval is None:
+                return
+            full = False
+            time.sleep(interval)
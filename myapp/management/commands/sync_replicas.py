@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.replicas import replica_aliases, sync_replica
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary database into every replica, once or every --interval seconds.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float,
+                            help='Keep running and sync every INTERVAL seconds.')
+
+    def handle(self, *args, interval, **options):
+        aliases = replica_aliases()
+        if not aliases:
+            raise CommandError('No replicas configured; set DJANGO_SQLITE_REPLICAS.')
+        while True:
+            for alias in aliases:
+                elapsed = sync_replica(alias)
+                self.stdout.write(f'{alias}: synced in {elapsed * 1000:.0f} ms')
+            if interval is None:
+                return
+            time.sleep(interval)
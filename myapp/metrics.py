@@ -0,0 +1,204 @@
+"""
+Per-view request metrics, served in the Prometheus text format at /metrics.
+
+MetricsMiddleware times each request and reports the view's wall time, its
+SQL queries and SQL time, and its template render time. Queries are counted
+by an execute wrapper installed on every new database connection, and
+templates are timed by the InstrumentedTemplates backend; both only record
+while a request is being timed, through a context variable, so the queries
+an async view runs on executor threads are counted too.
+
+Histograms are kept per thread and only merged when /metrics is read, so
+recording takes no lock. Those of finished threads are folded into one shared
+set whenever a thread starts recording or /metrics is read.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseForbidden
+from django.template.backends.django import DjangoTemplates
+
+# upper bounds of the histogram buckets, the last one being +Inf
+SECONDS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, float('inf'))
+QUERIES = (0, 1, 2, 5, 10, 20, 50, 100, float('inf'))
+# metric -> (buckets, help)
+METRICS = {
+    'myapp_request_seconds': (SECONDS, 'Wall time of a request, by view.'),
+    'myapp_request_queries': (QUERIES, 'SQL queries run by a request, by view.'),
+    'myapp_request_sql_seconds': (SECONDS, 'Time a request spent in SQL queries, by view.'),
+    'myapp_request_template_seconds': (SECONDS, 'Time a request spent rendering templates, by view.'),
+}
+UNRESOLVED = 'unresolved'
+
+_timer = ContextVar('request_timer', default=None)
+_local = threading.local()
+# thread -> its histograms, and the histograms of finished threads
+_stores = {}
+_retired = {}
+_stores_lock = threading.Lock()
+
+
+class Histogram:
+    __slots__ = ('counts', 'total')
+
+    def __init__(self, buckets):
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+
+
+class RequestTimer:
+    __slots__ = ('queries', 'sql', 'templates')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql = 0.0
+        self.templates = 0.0
+
+
+def _store():
+    """This thread's histograms, ``{(metric, view): Histogram}``."""
+    try:
+        return _local.store
+    except AttributeError:
+        store = _local.store = {}
+        with _stores_lock:
+            _retire_finished_threads()
+            _stores[threading.current_thread()] = store
+        return store
+
+
+def _add(merged, store):
+    for key, histogram in list(store.items()):
+        total = merged.get(key)
+        if total is None:
+            total = merged[key] = Histogram(METRICS[key[0]][0])
+        total.counts = [a + b for a, b in zip(total.counts, histogram.counts)]
+        total.total += histogram.total
+
+
+def _retire_finished_threads():
+    """Fold the histograms of finished threads into _retired; call with _stores_lock held."""
+    for thread in [thread for thread in _stores if not thread.is_alive()]:
+        _add(_retired, _stores.pop(thread))
+
+
+def observe(metric, view, value):
+    store = _store()
+    histogram = store.get((metric, view))
+    if histogram is None:
+        histogram = store[metric, view] = Histogram(METRICS[metric][0])
+    histogram.counts[bisect_left(METRICS[metric][0], value)] += 1
+    histogram.total += value
+
+
+def start_timer():
+    """Start timing a request; returns the token for ``stop_timer``."""
+    return _timer.set(RequestTimer())
+
+
+def stop_timer(token, view, elapsed):
+    """Record the request's histograms and return its RequestTimer."""
+    timer = _timer.get()
+    _timer.reset(token)
+    observe('myapp_request_seconds', view, elapsed)
+    observe('myapp_request_queries', view, timer.queries)
+    observe('myapp_request_sql_seconds', view, timer.sql)
+    observe('myapp_request_template_seconds', view, timer.templates)
+    return timer
+
+
+def server_timing(timer, elapsed):
+    return (f'app;dur={elapsed * 1000:.1f}, db;dur={timer.sql * 1000:.1f};desc="{timer.queries} queries", '
+            f'tpl;dur={timer.templates * 1000:.1f}')
+
+
+def time_query(execute, sql, params, many, context):
+    timer = _timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timer.queries += 1
+        timer.sql += time.perf_counter() - start
+
+
+@receiver(connection_created)
+def install_query_timer(sender, connection, **kwargs):
+    # The wrapper outlives the request, unlike the execute_wrapper() context
+    # manager, and stays idle outside timed requests.
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+class TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        timer = _timer.get()
+        if timer is None:
+            return self.template.render(context, request)
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            timer.templates += time.perf_counter() - start
+
+
+class InstrumentedTemplates(DjangoTemplates):
+    """The Django template backend, timing each top-level render."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _bound(bound):
+    return '+Inf' if bound == float('inf') else repr(bound)
+
+
+def render_metrics():
+    """All histograms, merged across threads, in the Prometheus text format."""
+    merged = {}
+    with _stores_lock:
+        _retire_finished_threads()
+        _add(merged, _retired)
+        stores = list(_stores.values())
+    for store in stores:
+        _add(merged, store)
+    lines = []
+    for metric, (buckets, help_text) in METRICS.items():
+        lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} histogram']
+        for (name, view), histogram in sorted(merged.items()):
+            if name != metric:
+                continue
+            view = _label(view)
+            cumulative = 0
+            for bound, count in zip(buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{view="{view}",le="{_bound(bound)}"}} {cumulative}')
+            lines.append(f'{metric}_sum{{view="{view}"}} {histogram.total}')
+            lines.append(f'{metric}_count{{view="{view}"}} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics(request):
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS['ALLOWED_IPS']:
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,131 @@
+"""
+Project middleware. Each class works in both sync and async stacks, so an
+ASGI deployment can run the async views without a thread per request.
+"""
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import logout
+
+from .metrics import UNRESOLVED, server_timing, start_timer, stop_timer
+from .routers import is_pinned, pin_to_primary, reset_pin
+
+LOGIN_AT = 'login_at'
+PIN_COOKIE = 'pin_primary'
+
+
+def mark_login(request):
+    """Record the login time as epoch seconds; call right after auth.login()."""
+    request.session[LOGIN_AT] = int(time.time())
+    # the stored session and its cookie end with the login too
+    request.session.set_expiry(settings.LOGIN_MAX_AGE)
+
+
+class Middleware:
+    """Dispatch to ``handle`` in a sync stack and ``__acall__`` in an async one."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # how Django 4.1 recognises an async middleware instance
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return self.handle(request)
+
+
+class LoginExpiryMiddleware(Middleware):
+    """
+    Log users out LOGIN_MAX_AGE seconds after they logged in.
+
+    Only sessions that already exist are read, so anonymous visitors without
+    a session cookie cost nothing. ``request.login_expired`` is True on the
+    request that ended the session.
+    """
+
+    def expire(self, request):
+        request.login_expired = False
+        if request.session.session_key:
+            login_at = request.session.get(LOGIN_AT)
+            if login_at is not None and time.time() - login_at > settings.LOGIN_MAX_AGE:
+                logout(request)
+                request.login_expired = True
+
+    def handle(self, request):
+        self.expire(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        # Loading the session is a blocking cache or database read.
+        await sync_to_async(self.expire)(request)
+        return await self.get_response(request)
+
+
+class ReplicaPinMiddleware(Middleware):
+    """
+    Read-your-writes across requests: after a request writes to the primary,
+    the client's reads stay on the primary for REPLICA_PIN_SECONDS, long
+    enough for the next replica sync.
+    """
+
+    def handle(self, request):
+        token = pin_to_primary(PIN_COOKIE in request.COOKIES)
+        try:
+            return self.pin(request, self.get_response(request))
+        finally:
+            reset_pin(token)
+
+    async def __acall__(self, request):
+        token = pin_to_primary(PIN_COOKIE in request.COOKIES)
+        try:
+            return self.pin(request, await self.get_response(request))
+        finally:
+            reset_pin(token)
+
+    def pin(self, request, response):
+        if is_pinned() and PIN_COOKIE not in request.COOKIES:
+            response.set_cookie(PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                                httponly=True, samesite='Lax')
+        return response
+
+
+class MetricsMiddleware(Middleware):
+    """
+    Record wall time, SQL and template time per view for /metrics, and send
+    them in a Server-Timing header when enabled. Goes first, to time the other
+    middleware too; a streamed body is timed up to its first byte.
+    """
+
+    def handle(self, request):
+        token, start = start_timer(), time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            elapsed = time.perf_counter() - start
+            timer = stop_timer(token, self.view(request), elapsed)
+        return self.add_header(response, timer, elapsed)
+
+    async def __acall__(self, request):
+        token, start = start_timer(), time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            elapsed = time.perf_counter() - start
+            timer = stop_timer(token, self.view(request), elapsed)
+        return self.add_header(response, timer, elapsed)
+
+    def view(self, request):
+        match = getattr(request, 'resolver_match', None)
+        return match.view_name if match else UNRESOLVED
+
+    def add_header(self, response, timer, elapsed):
+        if settings.METRICS['SERVER_TIMING']:
+            response['Server-Timing'] = server_timing(timer, elapsed)
+        return response
@@ -0,0 +1,17 @@
+# Generated by Django 4.1.1 on 2026-10-18 09:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0008_avatar_pipeline'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='product',
+            constraint=models.CheckConstraint(check=models.Q(('stock__lte', 1000)), name='product_stock_lte_1000'),
+        ),
+    ]
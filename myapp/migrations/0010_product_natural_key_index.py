@@ -0,0 +1,17 @@
+# Generated by Django 4.1.1 on 2026-10-18 09:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0009_product_stock_constraint'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'name'], name='product_category_name_idx'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Full-text index over product names and descriptions (SQLite FTS5).
+
+from django.db import migrations
+
+CREATE = [
+    """
+    CREATE VIRTUAL TABLE myapp_product_fts USING fts5(
+        name, description,
+        content='myapp_product', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    # External-content table: the triggers keep the index in step with
+    # myapp_product, including QuerySet.update() and raw SQL writes.
+    """
+    CREATE TRIGGER myapp_product_fts_insert AFTER INSERT ON myapp_product BEGIN
+        INSERT INTO myapp_product_fts(rowid, name, description)
+        VALUES (new.id, new.name, coalesce(new.description, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER myapp_product_fts_delete AFTER DELETE ON myapp_product BEGIN
+        INSERT INTO myapp_product_fts(myapp_product_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, coalesce(old.description, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER myapp_product_fts_update AFTER UPDATE OF name, description ON myapp_product BEGIN
+        INSERT INTO myapp_product_fts(myapp_product_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, coalesce(old.description, ''));
+        INSERT INTO myapp_product_fts(rowid, name, description)
+        VALUES (new.id, new.name, coalesce(new.description, ''));
+    END
+    """,
+    "INSERT INTO myapp_product_fts(myapp_product_fts) VALUES ('rebuild')",
+]
+
+DROP = [
+    'DROP TRIGGER IF EXISTS myapp_product_fts_update',
+    'DROP TRIGGER IF EXISTS myapp_product_fts_delete',
+    'DROP TRIGGER IF EXISTS myapp_product_fts_insert',
+    'DROP TABLE IF EXISTS myapp_product_fts',
+]
+
+
+def run(statements):
+    def apply(apps, schema_editor):
+        # Other databases fall back to LIKE matching in myapp.search.
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0012_catalog_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(CREATE), run(DROP)),
+    ]
@@ -0,0 +1,148 @@
+# Generated by Django 4.1.1 on 2026-10-18 10:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Every write that changes order totals appends the change to
+# myapp_rollupchange: the order's old values with a negative sign, its new
+# values with a positive one. QuerySet.update(), cascades and raw SQL are
+# covered too, and myapp.analytics.refresh_rollups() adds the changes up.
+# Repricing a product only queues its category in myapp_rolluprebuild.
+INSERT = """
+    INSERT INTO myapp_rollupchange(day, category_id, province, order_status, num_orders, num_units, total_revenue)
+"""
+
+
+def change(order, sign, product='p', client='c'):
+    """SELECT the signed change for ``order``; ``p`` and ``c`` are its product and client."""
+    return f"""
+        SELECT {order}.status_date, {product}.category_id, {client}.province, {order}.order_status,
+               {sign}1, {sign}{order}.num_units, {sign}{product}.price * {order}.num_units
+    """
+
+
+def of_order(order, sign):
+    return INSERT + change(order, sign) + f"""
+        FROM myapp_product p JOIN myapp_client c ON c.user_ptr_id = {order}.client_id
+        WHERE p.id = {order}.product_id;
+    """
+
+
+TRIGGERS = {
+    'myapp_order_rollup_insert': f"""
+        CREATE TRIGGER myapp_order_rollup_insert AFTER INSERT ON myapp_order BEGIN
+            {of_order('new', '+')}
+        END
+    """,
+    'myapp_order_rollup_delete': f"""
+        CREATE TRIGGER myapp_order_rollup_delete AFTER DELETE ON myapp_order BEGIN
+            {of_order('old', '-')}
+        END
+    """,
+    'myapp_order_rollup_update': f"""
+        CREATE TRIGGER myapp_order_rollup_update
+        AFTER UPDATE OF status_date, order_status, num_units, product_id, client_id ON myapp_order BEGIN
+            {of_order('old', '-')}
+            {of_order('new', '+')}
+        END
+    """,
+    # Revenue is at the current price, so a new price (or category) moves
+    # every order of the product. Rather than one change per order inside the
+    # repricing transaction, mark the categories involved and let
+    # refresh_rollups rebuild them from their orders.
+    'myapp_product_rollup_update': """
+        CREATE TRIGGER myapp_product_rollup_update AFTER UPDATE OF price, category_id ON myapp_product
+        WHEN new.price != old.price OR new.category_id != old.category_id BEGIN
+            INSERT INTO myapp_rolluprebuild(category_id) VALUES (old.category_id);
+            INSERT INTO myapp_rolluprebuild(category_id) SELECT new.category_id
+            WHERE new.category_id != old.category_id;
+        END
+    """,
+    'myapp_client_rollup_update': f"""
+        CREATE TRIGGER myapp_client_rollup_update AFTER UPDATE OF province ON myapp_client
+        WHEN new.province != old.province BEGIN
+            {INSERT} {change('o', '-', client='old')}
+            FROM myapp_order o JOIN myapp_product p ON p.id = o.product_id WHERE o.client_id = new.user_ptr_id;
+            {INSERT} {change('o', '+', client='new')}
+            FROM myapp_order o JOIN myapp_product p ON p.id = o.product_id WHERE o.client_id = new.user_ptr_id;
+        END
+    """,
+}
+
+
+def create_triggers(apps, schema_editor):
+    # Elsewhere run refresh_rollups --full instead.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in TRIGGERS.values():
+        schema_editor.execute(statement)
+
+
+def drop_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for name in TRIGGERS:
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {name}')
+
+
+def seed_rollups(apps, schema_editor):
+    # Orders placed before this migration never went through the triggers.
+    schema_editor.execute("""
+        INSERT INTO myapp_dailyorderrollup(day, category_id, province, order_status, num_orders, num_units,
+                                           total_revenue)
+        SELECT o.status_date, p.category_id, c.province, o.order_status,
+               COUNT(*), SUM(o.num_units), ROUND(SUM(p.price * o.num_units), 2)
+        FROM myapp_order o
+        JOIN myapp_product p ON p.id = o.product_id
+        JOIN myapp_client c ON c.user_ptr_id = o.client_id
+        GROUP BY o.status_date, p.category_id, c.province, o.order_status
+    """)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0013_product_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('category_id', models.IntegerField()),
+                ('province', models.CharField(max_length=2)),
+                ('order_status', models.IntegerField()),
+                ('num_orders', models.IntegerField()),
+                ('num_units', models.IntegerField()),
+                ('total_revenue', models.DecimalField(decimal_places=2, max_digits=20)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RollupRebuild',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category_id', models.IntegerField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyOrderRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('province', models.CharField(choices=[('AB', 'Alberta'), ('MB', 'Manitoba'), ('ON', 'Ontario'), ('QC', 'Quebec')], max_length=2)),
+                ('order_status', models.IntegerField(choices=[(0, 'Order Cancelled'), (1, 'Order Placed'), (2, 'Order Shipped'), (3, 'Order Delivered')])),
+                ('num_orders', models.IntegerField()),
+                ('num_units', models.IntegerField()),
+                ('total_revenue', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='myapp.category')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='dailyorderrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'category', 'province', 'order_status'), name='rollup_day_key'),
+        ),
+        migrations.RunPython(create_triggers, drop_triggers),
+        migrations.RunPython(seed_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.1.1 on 2026-10-18 10:33
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0014_order_rollups'),
+    ]
+
+    operations = [
+        # The column itself is unchanged. Altering it on SQLite would rebuild
+        # myapp_order and drop the rollup triggers from 0014 with it.
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.AlterField(
+                model_name='order',
+                name='status_date',
+                field=models.DateField(default=datetime.date.today),
+            ),
+        ]),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.1.1 on 2026-10-18 11:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0015_order_status_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogDeletion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('deleted_at', models.DateTimeField()),
+            ],
+        ),
+    ]
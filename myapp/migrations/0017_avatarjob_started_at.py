@@ -0,0 +1,18 @@
+# Generated by Django 4.1.1 on 2026-10-18 11:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0016_catalog_deletion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='avatarjob',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,8 +1,9 @@
-from django.db import models
+from django.db import connections, models
 import datetime
+import hashlib
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator
-from PIL import Image
 from django.utils import timezone
 
 
@@ -11,6 +12,7 @@ from django.utils import timezone
 class Category(models.Model):
     name = models.CharField(max_length=200)
     warehouse = models.CharField(max_length=200, default='Windsor')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         verbose_name_plural = "Categories"
@@ -27,13 +29,41 @@ class Product(models.Model):
     stock = models.PositiveIntegerField(default=100, validators=[MinValueValidator(0), MaxValueValidator(1000)])
     available = models.BooleanField(default=True)
     interested = models.PositiveIntegerField(choices=[(1, 'Yes'), (0, 'No')], default=0)
+    # Set by save() and by every bulk UPDATE of catalog data; stock
+    # reservations and the buffered interest counter deliberately leave it
+    # alone, as the catalog pages show neither.
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(check=models.Q(stock__lte=1000), name='product_stock_lte_1000'),
+        ]
+        indexes = [
+            # natural key used by catalog_import upserts
+            models.Index(fields=['category', 'name'], name='product_category_name_idx'),
+            # lookups by exact name or name prefix
+            models.Index(fields=['name'], name='product_name_idx'),
+            # catalog pages only list available products, paged by id
+            models.Index(fields=['category', 'id'], condition=models.Q(available=True),
+                         name='product_avail_category_idx'),
+            models.Index(fields=['id'], condition=models.Q(available=True), name='product_avail_idx'),
+            # Last-Modified of a category page
+            models.Index(fields=['category', 'updated_at'], name='product_category_updated_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
     def refill(self):
-        self.stock += 100
-        self.save()
+        """ Add 100 units in one UPDATE, unless that would exceed the stock limit """
+        from .bulk import increase_stock
+        increase_stock(Product.objects.filter(pk=self.pk), 100)
+        self.refresh_from_db(fields=['stock'])
+
+
+class CatalogDeletion(models.Model):
+    """ When a category was last deleted, which no remaining updated_at records; a single row """
+    deleted_at = models.DateTimeField()
 
 
 class Client(User):
@@ -51,37 +81,177 @@ class Client(User):
         verbose_name = "Client"
 
 
+class OrderQuerySet(models.QuerySet):
+    def with_line_total(self):
+        """ Annotate each order with price * num_units, computed in SQL """
+        return self.annotate(line_total=models.ExpressionWrapper(
+            models.F('product__price') * models.F('num_units'),
+            output_field=models.DecimalField(max_digits=20, decimal_places=2),
+        ))
+
+    def dates(self, field_name, kind, order='ASC'):
+        """
+        QuerySet.dates() with SQLite's built-in date() for the truncation.
+        Django runs its own truncation there as a Python function on every
+        row, which makes the admin date hierarchy take seconds on large tables.
+        """
+        field = self.model._meta.get_field(field_name)
+        if (kind not in ('year', 'month', 'day') or isinstance(field, models.DateTimeField)
+                or connections[self.db].vendor != 'sqlite'):
+            return super().dates(field_name, kind, order)
+        modifiers = {'year': ('start of year',), 'month': ('start of month',), 'day': ()}[kind]
+        truncated = models.Func(models.F(field_name), *map(models.Value, modifiers),
+                                function='DATE', output_field=models.DateField())
+        return self.annotate(datefield=truncated).values_list('datefield', flat=True).distinct().filter(
+            datefield__isnull=False).order_by(('-' if order == 'DESC' else '') + 'datefield')
+
+
 class Order(models.Model):
     ORDER_STATUS = [(0, 'Order Cancelled'), (1, 'Order Placed'), (2, 'Order Shipped'), (3, 'Order Delivered')]
+    CANCELLED, PLACED, SHIPPED, DELIVERED = 0, 1, 2, 3
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     client = models.ForeignKey(Client, on_delete=models.CASCADE)
     num_units = models.PositiveIntegerField(default=1)
     order_status = models.IntegerField(default=1, choices=ORDER_STATUS)
-    status_date = models.DateField(auto_now=True)
+    # the day order_status last changed; see save() and myapp.status
+    status_date = models.DateField(default=datetime.date.today)
+
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # order history: one client's orders, newest first
+            models.Index(fields=['client', 'status_date', 'id'], name='order_client_date_idx'),
+            # distinct products a client has ordered
+            models.Index(fields=['client', 'product'], name='order_client_product_idx'),
+            # admin date hierarchy
+            models.Index(fields=['status_date'], name='order_status_date_idx'),
+        ]
 
     def __str__(self):
         return self.product.__str__() + ' -- ' + self.client.__str__()
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        order = super().from_db(db, field_names, values)
+        order._loaded_status = order.__dict__.get('order_status')
+        return order
+
+    def clean(self):
+        old = getattr(self, '_loaded_status', None)
+        if self._state.adding or old is None or old == self.order_status:
+            return
+        from .status import TRANSITIONS
+        statuses = dict(self.ORDER_STATUS)
+        if old not in TRANSITIONS.get(self.order_status, ()):
+            raise ValidationError({'order_status': f'An order cannot go from "{statuses[old]}" '
+                                                   f'to "{statuses[self.order_status]}".'})
+        if self.order_status == self.CANCELLED:
+            raise ValidationError({'order_status': 'Use the "Cancel selected orders" action, '
+                                                   'which also returns the stock.'})
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and self.order_status != getattr(self, '_loaded_status', self.order_status):
+            self.status_date = datetime.date.today()
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'status_date'}
+        super().save(*args, **kwargs)
+        self._loaded_status = self.order_status
+
     def total_cost(self):
         """ Total cost for all items in the order """
+        if hasattr(self, 'line_total'):
+            # annotated by OrderQuerySet.with_line_total()
+            return self.line_total
         return self.product.price * self.num_units
 
 
+class DailyOrderRollup(models.Model):
+    """ Order totals per day, category, client province and status; kept by myapp.analytics """
+    day = models.DateField()
+    category = models.ForeignKey(Category, related_name='+', on_delete=models.CASCADE)
+    province = models.CharField(max_length=2, choices=Client.PROVINCE_CHOICES)
+    order_status = models.IntegerField(choices=Order.ORDER_STATUS)
+    # plain integers: SQLite checks the candidate row of an upsert, which may
+    # hold a negative change, before resolving the conflict
+    num_orders = models.IntegerField()
+    num_units = models.IntegerField()
+    total_revenue = models.DecimalField(max_digits=20, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            # also the index behind day-range reports
+            models.UniqueConstraint(fields=['day', 'category', 'province', 'order_status'],
+                                    name='rollup_day_key'),
+        ]
+
+    def __str__(self):
+        return f'{self.day} -- {self.category_id}/{self.province}/{self.order_status}'
+
+
+class RollupChange(models.Model):
+    """ A pending change to one DailyOrderRollup row; written by database triggers (migration 0014) """
+    day = models.DateField()
+    category_id = models.IntegerField()
+    province = models.CharField(max_length=2)
+    order_status = models.IntegerField()
+    num_orders = models.IntegerField()
+    num_units = models.IntegerField()
+    total_revenue = models.DecimalField(max_digits=20, decimal_places=2)
+
+
+class RollupRebuild(models.Model):
+    """ A category whose rollups must be rebuilt from its orders, after one of its products was repriced or moved """
+    category_id = models.IntegerField()
+
+
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     avatar = models.ImageField(default='default.jpg', upload_to='profile_images')
     bio = models.TextField()
+    avatar_hash = models.CharField(max_length=64, blank=True, editable=False)
+    processed_hash = models.CharField(max_length=64, blank=True, editable=False)
 
     def __str__(self):
         return self.user.username
 
-    # resizing images
+    # resized variants are produced off-request by myapp.avatars
     def save(self, *args, **kwargs):
-        super().save()
+        changed = False
+        if self.avatar and not self.avatar._committed:
+            digest = content_hash(self.avatar)
+            changed = digest != self.avatar_hash
+            self.avatar_hash = digest
+        super().save(*args, **kwargs)
+        if changed:
+            from .avatars import enqueue_avatar
+            enqueue_avatar(self)
+
+    def avatar_url(self, size=100):
+        """ URL of the resized avatar, or a placeholder while it is being processed """
+        from .avatars import variant_url
+        return variant_url(self, size)
+
+
+class AvatarJob(models.Model):
+    JOB_STATUS = [(0, 'Pending'), (1, 'Running'), (2, 'Done'), (3, 'Failed')]
+    PENDING, RUNNING, DONE, FAILED = 0, 1, 2, 3
+    profile = models.ForeignKey(Profile, related_name='avatar_jobs', on_delete=models.CASCADE)
+    source_hash = models.CharField(max_length=64)
+    status = models.IntegerField(default=PENDING, choices=JOB_STATUS)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # when a worker claimed it; a job running for too long was lost with its worker
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.profile} -- {self.source_hash[:12]} ({self.get_status_display()})'
 
-        img = Image.open(self.avatar.path)
 
-        if img.height > 100 or img.width > 100:
-            new_img = (100, 100)
-            img.thumbnail(new_img)
-            img.save(self.avatar.path)
+def content_hash(field_file):
+    """ SHA-256 of a (possibly uncommitted) file field's content """
+    digest = hashlib.sha256()
+    for chunk in field_file.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
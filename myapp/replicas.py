@@ -0,0 +1,62 @@
+"""
+Local read replicas for SQLite.
+
+A replica is a plain copy of the primary database file, refreshed with the
+SQLite online backup API by ``manage.py sync_replicas``. Replication lag is
+the age of the last copy, taken from the replica file's modification time.
+"""
+import os
+import sqlite3
+import time
+
+from django.conf import settings
+from django.db import connections
+
+_LAG_CACHE_SECONDS = 1.0
+_lag_cache = {}
+
+
+def replica_aliases():
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+def replica_lag(alias):
+    """Seconds since ``alias`` was last synced, or None if it was never synced."""
+    now = time.monotonic()
+    cached = _lag_cache.get(alias)
+    if cached and now - cached[0] < _LAG_CACHE_SECONDS:
+        return cached[1]
+    try:
+        lag = max(0.0, time.time() - os.path.getmtime(connections[alias].settings_dict['NAME']))
+    except OSError:
+        lag = None
+    _lag_cache[alias] = (now, lag)
+    return lag
+
+
+def fresh_replicas(max_lag=None):
+    """Replicas whose lag is within ``max_lag`` (REPLICA_MAX_LAG by default)."""
+    if max_lag is None:
+        max_lag = getattr(settings, 'REPLICA_MAX_LAG', 30)
+    fresh = []
+    for alias in replica_aliases():
+        lag = replica_lag(alias)
+        if lag is not None and lag <= max_lag:
+            fresh.append(alias)
+    return fresh
+
+
+def sync_replica(alias, primary='default'):
+    """Copy the primary database into ``alias``; returns the seconds it took."""
+    start = time.perf_counter()
+    source = sqlite3.connect(connections[primary].settings_dict['NAME'])
+    target = sqlite3.connect(connections[alias].settings_dict['NAME'])
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+    # The copy may leave the file's mtime untouched when no page changed.
+    os.utime(connections[alias].settings_dict['NAME'])
+    _lag_cache.pop(alias, None)
+    return time.perf_counter() - start
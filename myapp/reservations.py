@@ -0,0 +1,154 @@
+"""
+Stock reservation for orders.
+
+The stock check and the decrement happen in one conditional UPDATE inside a
+transaction, so two concurrent checkouts can never sell the same units twice.
+A cart locks and decrements all of its products in primary key order, so two
+carts sharing products take their locks in the same order and cannot
+deadlock, and either every line is reserved or none is.
+"""
+import enum
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+from django.db import OperationalError, connections, router, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from .models import Order, Product
+
+
+class ReservationStatus(enum.Enum):
+    RESERVED = 'reserved'
+    INSUFFICIENT = 'insufficient'
+    CONFLICT = 'conflict'
+
+
+@dataclass(frozen=True)
+class ReservationResult:
+    status: ReservationStatus
+    order: object = None
+    attempts: int = 1
+
+    @property
+    def reserved(self):
+        return self.status is ReservationStatus.RESERVED
+
+
+@dataclass(frozen=True)
+class Shortfall:
+    product_id: int
+    requested: int
+    available: int
+
+
+@dataclass(frozen=True)
+class CartResult:
+    status: ReservationStatus
+    orders: list = field(default_factory=list)
+    shortfalls: list = field(default_factory=list)
+    attempts: int = 1
+
+    @property
+    def reserved(self):
+        return self.status is ReservationStatus.RESERVED
+
+
+def _is_lock_error(exc):
+    return 'locked' in str(exc) or 'busy' in str(exc)
+
+
+def _take_write_lock(using=None):
+    """
+    Take SQLite's write lock at the start of the current transaction, as BEGIN
+    IMMEDIATE does under the production profile. A deferred transaction that
+    reads first cannot wait for the lock when it then writes: it fails with
+    "database is locked" whenever a checkout committed in between.
+    """
+    connection = connections[using or router.db_for_write(Product)]
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            # writes nothing, but a write statement waits for and takes the lock
+            cursor.execute(f'UPDATE {connection.ops.quote_name(Product._meta.db_table)} SET stock = stock WHERE 0')
+
+
+def _with_retries(reserve, attempts, backoff, conflict, using=None):
+    """
+    Run ``reserve(attempt)`` in a transaction on ``using``. When SQLite reports the
+    database as locked it is retried with jittered exponential backoff; after
+    ``attempts`` failures ``conflict`` is returned and nothing is written.
+    """
+    in_outer_block = transaction.get_connection(using).in_atomic_block
+    for attempt in range(1, attempts + 1):
+        try:
+            with transaction.atomic(using=using):
+                return reserve(attempt)
+        except OperationalError as exc:
+            # A savepoint inside someone else's transaction cannot be retried.
+            if in_outer_block or not _is_lock_error(exc):
+                raise
+            if attempt < attempts:
+                time.sleep(backoff * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5))
+    return conflict
+
+
+def reserve_order(order, attempts=5, backoff=0.02):
+    """
+    Decrement the product stock and save ``order`` in one transaction.
+
+    The product row is addressed by primary key and only updated when it still
+    holds ``order.num_units``.
+    """
+    def reserve(attempt):
+        updated = Product.objects.filter(
+            pk=order.product_id, stock__gte=order.num_units,
+        ).update(stock=F('stock') - order.num_units)
+        if not updated:
+            return ReservationResult(ReservationStatus.INSUFFICIENT, attempts=attempt)
+        order.save()
+        return ReservationResult(ReservationStatus.RESERVED, order, attempt)
+
+    conflict = ReservationResult(ReservationStatus.CONFLICT, attempts=attempts)
+    return _with_retries(reserve, attempts, backoff, conflict)
+
+
+def reserve_cart(client_id, lines, attempts=5, backoff=0.02):
+    """
+    Reserve every ``(product_id, num_units)`` line and create one order per
+    product, all in one transaction.
+
+    Lines for the same product are added together. When any product is short,
+    nothing is written and the result lists a Shortfall for each short product.
+    """
+    wanted = Counter()
+    for product_id, num_units in lines:
+        wanted[product_id] += num_units
+    product_ids = sorted(wanted)
+
+    def reserve(attempt):
+        # FOR UPDATE in pk order where the database has row locks; on SQLite
+        # take the write lock before reading, so no checkout can commit between
+        # the read and the update. Either way this reads the primary, not a
+        # replica.
+        _take_write_lock()
+        locked = Product.objects.select_for_update().filter(pk__in=product_ids).order_by('pk')
+        stock = dict(locked.values_list('pk', 'stock'))
+        shortfalls = [Shortfall(pk, wanted[pk], stock.get(pk, 0))
+                      for pk in product_ids if stock.get(pk, 0) < wanted[pk]]
+        if shortfalls:
+            return CartResult(ReservationStatus.INSUFFICIENT, shortfalls=shortfalls, attempts=attempt)
+        units = Case(*(When(pk=pk, then=Value(wanted[pk])) for pk in product_ids), output_field=IntegerField())
+        updated = Product.objects.filter(pk__in=product_ids, stock__gte=units).update(stock=F('stock') - units)
+        if updated < len(product_ids):
+            # Stock sold since the read; only possible without row or write locks.
+            transaction.set_rollback(True)
+            return CartResult(ReservationStatus.CONFLICT, attempts=attempt)
+        orders = Order.objects.bulk_create(
+            Order(client_id=client_id, product_id=pk, num_units=wanted[pk]) for pk in product_ids)
+        return CartResult(ReservationStatus.RESERVED, orders=orders, attempts=attempt)
+
+    if not product_ids:
+        return CartResult(ReservationStatus.RESERVED)
+    conflict = CartResult(ReservationStatus.CONFLICT, attempts=attempts)
+    return _with_retries(reserve, attempts, backoff, conflict)
@@ -0,0 +1,57 @@
+import contextvars
+import random
+
+from .replicas import fresh_replicas, replica_aliases
+
+# Catalog and order-history reads may be served slightly stale.
+REPLICATED_MODELS = {'myapp.category', 'myapp.product', 'myapp.order'}
+
+_pinned = contextvars.ContextVar('pinned_to_primary', default=False)
+
+
+def pin_to_primary(pinned=True):
+    """Send all reads in the current context to the primary; returns a reset token."""
+    return _pinned.set(pinned)
+
+
+def reset_pin(token):
+    _pinned.reset(token)
+
+
+def is_pinned():
+    return _pinned.get()
+
+
+class PrimaryReplicaRouter:
+    """
+    Send catalog and order-history reads to a fresh replica, everything else
+    (and every write) to the primary.
+
+    Once a request writes a replicated model, its later reads are pinned to the primary so it
+    always sees its own writes; ReplicaPinMiddleware carries that pin over
+    to the client's next requests for REPLICA_PIN_SECONDS.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _pinned.get() or model._meta.label_lower not in REPLICATED_MODELS:
+            return 'default'
+        replicas = fresh_replicas()
+        return random.choice(replicas) if replicas else 'default'
+
+    def db_for_write(self, model, **hints):
+        # Only writes to replicated tables can be missing from a replica.
+        if model._meta.label_lower in REPLICATED_MODELS:
+            _pinned.set(True)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {'default', *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are file copies of the primary, never migrated directly.
+        if db in replica_aliases():
+            return False
+        return None
@@ -0,0 +1,127 @@
+"""
+Product search over name and description.
+
+On SQLite the ``myapp_product_fts`` FTS5 table (migration 0013, kept in sync
+by triggers) answers the query: every word of the input is matched as a
+prefix, matches are ranked with BM25 (a name hit weighs ten times a
+description hit), and the best SEARCH_MAX_CANDIDATES are paged with a
+(rank, id) cursor. Other databases fall back to case-insensitive LIKE
+matching ordered by id.
+"""
+import re
+
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import Q
+
+from .models import Product
+from .pagination import KeysetPage, decode_cursor, encode_cursor, keyset_page
+
+FTS_TABLE = 'myapp_product_fts'
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+MAX_TERMS = 8
+# ?available= values
+AVAILABILITY = {'1': True, '0': False, 'any': None}
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def search_terms(query):
+    return _WORD.findall(query or '')[:MAX_TERMS]
+
+
+def match_expression(terms):
+    """FTS5 query matching rows that contain every term as a word prefix."""
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def fts_enabled(using):
+    return connections[using].vendor == 'sqlite'
+
+
+def search_products(query, category=None, available=True, cursor=None, page_size=20):
+    """
+    Return a KeysetPage of products matching ``query``, best match first.
+
+    ``category`` is a category id; ``available`` is True, False, or None for
+    both. An empty query matches nothing.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return KeysetPage()
+    using = router.db_for_read(Product)
+    if not fts_enabled(using):
+        return _like_search(terms, category, available, cursor, page_size)
+
+    qn = connections[using].ops.quote_name
+    table = qn(Product._meta.db_table)
+    where = [f'{FTS_TABLE} MATCH %s']
+    params = [match_expression(terms)]
+    if category is not None:
+        where.append(f'{table}.{qn("category_id")} = %s')
+        params.append(category)
+    if available is not None:
+        where.append(f'{table}.{qn("available")} = %s')
+        params.append(available)
+    # Keep the best SEARCH_MAX_CANDIDATES matches: SQLite scores every match
+    # but only keeps that many sorted, so the outer query joins and pages a
+    # bounded set for terms found in a large part of the catalog. CROSS JOIN
+    # keeps the FTS index as the outer loop; driven from the category index
+    # instead, SQLite would re-run the MATCH for every product in the category.
+    candidates = (
+        f'SELECT {FTS_TABLE}.rowid AS id, bm25({FTS_TABLE}, {NAME_WEIGHT}, {DESCRIPTION_WEIGHT}) AS rank '
+        f'FROM {FTS_TABLE} CROSS JOIN {table} ON {table}.{qn("id")} = {FTS_TABLE}.rowid '
+        f'WHERE {" AND ".join(where)} ORDER BY rank, id LIMIT %s'
+    )
+    params.append(settings.SEARCH_MAX_CANDIDATES)
+    after = _search_cursor(cursor)
+    outer = ''
+    if after is not None:
+        outer = 'WHERE hits.rank > %s OR (hits.rank = %s AND hits.id > %s) '
+        params.extend([after[0], after[0], after[1]])
+    sql = (
+        f'SELECT {table}.*, hits.rank AS rank FROM ({candidates}) hits '
+        f'JOIN {table} ON {table}.{qn("id")} = hits.id '
+        f'{outer}ORDER BY hits.rank, hits.id LIMIT %s'
+    )
+    items = list(Product.objects.db_manager(using).raw(sql, params + [page_size + 1]))
+    page = KeysetPage(items[:page_size])
+    if len(items) > page_size:
+        last = page.items[-1]
+        page.next_cursor = encode_cursor([last.rank, last.pk])
+    return page
+
+
+def _search_cursor(token):
+    """The (rank, id) after which the page starts, or None for the first page."""
+    after = decode_cursor(token, 2)
+    if after is None:
+        return None
+    rank, pk = after
+    # type(), not isinstance(): JSON true and false decode to bools, which are ints
+    if type(rank) not in (int, float) or type(pk) is not int:
+        return None
+    return after
+
+
+def _like_search(terms, category, available, cursor, page_size):
+    products = Product.objects.all()
+    for term in terms:
+        products = products.filter(Q(name__icontains=term) | Q(description__icontains=term))
+    if category is not None:
+        products = products.filter(category_id=category)
+    if available is not None:
+        products = products.filter(available=available)
+    return keyset_page(products, ('id',), cursor, page_size)
+
+
+def rebuild_index(optimize=False):
+    """Re-index every product from scratch; returns the number indexed."""
+    using = router.db_for_write(Product)
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        if optimize:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+        cursor.execute(f'SELECT count(*) FROM {FTS_TABLE}')
+        return cursor.fetchone()[0]
@@ -1,8 +1,10 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.contrib.auth.models import User
 from django.dispatch import receiver
+from django.utils import timezone
 
-from .models import Profile
+from .catalog_cache import catalog_cache
+from .models import CatalogDeletion, Category, Product, Profile
 
 
 @receiver(post_save, sender=User)
@@ -13,4 +15,24 @@ def create_profile(sender, instance, created, **kwargs):
 
 @receiver(post_save, sender=User)
 def save_profile(sender, instance, **kwargs):
-    instance.profile.save()
\ No newline at end of file
+    if hasattr(instance, 'profile'):
+        instance.profile.save()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_catalog(sender, **kwargs):
+    catalog_cache.invalidate()
+
+
+@receiver(post_delete, sender=Product)
+def touch_category(sender, instance, **kwargs):
+    # A deleted row can no longer raise MAX(updated_at); its category can.
+    Category.objects.filter(pk=instance.category_id).update(updated_at=timezone.now())
+
+
+@receiver(post_delete, sender=Category)
+def record_category_deletion(sender, instance, **kwargs):
+    CatalogDeletion.objects.update_or_create(pk=1, defaults={'deleted_at': timezone.now()})
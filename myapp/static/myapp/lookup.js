@@ -0,0 +1,41 @@
+// Suggestions for LookupInput widgets: the input holds a primary key, the
+// datalist offers matches from the lookup endpoint for whatever was typed.
+document.addEventListener('DOMContentLoaded', function () {
+    document.querySelectorAll('input[data-lookup]').forEach(function (input) {
+        var options = document.getElementById(input.id + '-options');
+        var selected = document.getElementById(input.id + '-selected');
+        var labels = {};
+        var timer = null;
+
+        input.addEventListener('input', function () {
+            if (labels[input.value] !== undefined) {
+                selected.textContent = labels[input.value];
+                return;
+            }
+            selected.textContent = '';
+            clearTimeout(timer);
+            // digits may be a key typed by hand or part of a name ("1984"),
+            // so they are looked up like any other text
+            if (!input.value.trim()) {
+                return;
+            }
+            timer = setTimeout(function () {
+                fetch(input.dataset.lookup + '?q=' + encodeURIComponent(input.value))
+                    .then(function (response) { return response.json(); })
+                    .then(function (page) {
+                        options.innerHTML = '';
+                        page.results.forEach(function (item) {
+                            var option = document.createElement('option');
+                            option.value = item.id;
+                            option.label = item.text;
+                            labels[item.id] = item.text;
+                            options.appendChild(option);
+                        });
+                        if (labels[input.value] !== undefined) {
+                            selected.textContent = labels[input.value];
+                        }
+                    });
+            }, 200);
+        });
+    });
+});
@@ -0,0 +1,146 @@
+"""
+Bulk order status transitions.
+
+Only these moves are allowed:
+
+    Placed  -> Shipped -> Delivered
+    Placed  -> Cancelled
+
+Orders are advanced with one set-based UPDATE per chunk of primary keys, each
+chunk in its own short transaction with an optional pause after it, so a run
+over a whole warehouse never holds the write lock long enough to stall
+checkout; each chunk takes the write lock before it reads, and one that finds
+the database locked is retried with backoff, like a reservation. The UPDATE
+re-checks the source status, so an order changed since it was selected is
+skipped rather than moved twice. A cancellation returns the stock in the same
+transaction, capped at MAX_STOCK like increase_stock; units over the cap are
+counted but not returned.
+"""
+import datetime
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import router
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+from django.db.models.functions import Least
+
+from .bulk import MAX_STOCK, BulkResult, iter_pk_chunks
+from .catalog_cache import catalog_cache
+from .models import Order, Product
+from .reservations import _take_write_lock, _with_retries
+
+# target status -> statuses an order may be moved from
+TRANSITIONS = {
+    Order.SHIPPED: (Order.PLACED,),
+    Order.DELIVERED: (Order.SHIPPED,),
+    Order.CANCELLED: (Order.PLACED,),
+}
+# command-line and admin names
+STATUS_NAMES = {'shipped': Order.SHIPPED, 'delivered': Order.DELIVERED, 'cancelled': Order.CANCELLED}
+
+
+@dataclass
+class TransitionResult(BulkResult):
+    # units given back to stock, and units a cancellation could not return
+    # without going over MAX_STOCK
+    restocked: int = 0
+    capped: int = 0
+    # orders of chunks that stayed locked, not counted in skipped
+    locked: int = 0
+
+    @property
+    def per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        text = f'{self.rows} orders moved in {self.elapsed * 1000:.0f} ms ({self.per_second:.0f}/s)'
+        if self.skipped:
+            text += f', {self.skipped} skipped ({self.skip_reason})'
+        if self.locked:
+            text += f', {self.locked} left in locked chunks'
+        if self.restocked:
+            text += f', {self.restocked} units back in stock'
+        if self.capped:
+            text += f', {self.capped} units over the stock limit dropped'
+        return text
+
+
+def orders_to_advance(status, warehouse=None, before=None, orders=None):
+    """Orders that may move to ``status``, optionally of one warehouse and last changed before a date."""
+    if status not in TRANSITIONS:
+        raise ValueError(f'Orders cannot be moved to status {status}.')
+    orders = Order.objects.all() if orders is None else orders
+    orders = orders.filter(order_status__in=TRANSITIONS[status])
+    if warehouse is not None:
+        orders = orders.filter(product__category__warehouse=warehouse)
+    if before is not None:
+        orders = orders.filter(status_date__lt=before)
+    return orders
+
+
+def _restock(using, chunk, sources):
+    """
+    Give the units of the orders in ``chunk`` back to their products. Returns
+    the units returned and those dropped at MAX_STOCK.
+    """
+    units = dict(Order.objects.using(using).filter(pk__in=chunk, order_status__in=sources)
+                 .order_by().values('product').annotate(units=Sum('num_units')).values_list('product', 'units'))
+    if not units:
+        return 0, 0
+    # Locked like a checkout locks them (on SQLite the whole database already
+    # is), so the stock read here is what the UPDATE adds to.
+    stock = dict(Product.objects.using(using).select_for_update().filter(pk__in=sorted(units))
+                 .order_by('pk').values_list('pk', 'stock'))
+    returned_units = sum(min(count, MAX_STOCK - stock[pk]) for pk, count in units.items())
+    # One WHEN per distinct amount rather than per product keeps the statement small.
+    by_amount = defaultdict(list)
+    for pk, count in units.items():
+        by_amount[count].append(pk)
+    returned = Case(*(When(pk__in=pks, then=Value(count)) for count, pks in by_amount.items()),
+                    output_field=IntegerField())
+    Product.objects.using(using).filter(pk__in=sorted(units)).update(
+        stock=Least(F('stock') + returned, Value(MAX_STOCK)))
+    return returned_units, sum(units.values()) - returned_units
+
+
+def advance_orders(orders, status, chunk_size=None, pause=0.0, attempts=5, backoff=0.02):
+    """
+    Move every order of ``orders`` that is allowed to go to ``status`` there.
+
+    Orders in any other status are counted as skipped; those of a chunk that
+    stayed locked by checkouts for ``attempts`` tries are counted as locked.
+    """
+    chunk_size = chunk_size or settings.BULK_UPDATE_CHUNK_SIZE
+    sources = TRANSITIONS.get(status)
+    if sources is None:
+        raise ValueError(f'Orders cannot be moved to status {status}.')
+    result = TransitionResult(skip_reason='not allowed from their status')
+    total = orders.count()
+    today = datetime.date.today()
+    using = router.db_for_write(Order)
+    start = time.perf_counter()
+    for chunk in iter_pk_chunks(orders.filter(order_status__in=sources), chunk_size):
+        def move(attempt):
+            # before the first read, or checkouts committing in between make every write fail
+            _take_write_lock(using)
+            restocked, capped = _restock(using, chunk, sources) if status == Order.CANCELLED else (0, 0)
+            moved = Order.objects.using(using).filter(pk__in=chunk, order_status__in=sources).update(
+                order_status=status, status_date=today)
+            return moved, restocked, capped
+
+        outcome = _with_retries(move, attempts, backoff, None, using)
+        if outcome is None:
+            result.locked += len(chunk)
+        else:
+            result.rows += outcome[0]
+            result.restocked += outcome[1]
+            result.capped += outcome[2]
+        if pause:
+            time.sleep(pause)
+    result.elapsed = time.perf_counter() - start
+    result.skipped = total - result.rows - result.locked
+    if result.restocked:
+        catalog_cache.invalidate()
+    return result
@@ -1,3 +1,999 @@
-from django.test import TestCase
+import contextvars
+import datetime
+import io
+import json
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import urllib.parse
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection, models, transaction
+from django.db.models import F, Sum
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from mysiteF22.db.sqlite3.base import DatabaseWrapper
+from PIL import Image
+
+from .avatars import process_job, variant_name
+from .analytics import order_totals, refresh_rollups, rollup_totals
+from . import bulk
+from .bulk import MAX_STOCK, increase_stock
+from .catalog_cache import catalog_cache
+from .catalog_io import RowError, clean_row
+from .counters import InterestCounter
+from .dataset import generate_dataset
+from .hot_queries import full_scans
+from .http_cache import catalog_last_modified
+from .middleware import LOGIN_AT, PIN_COOKIE, LoginExpiryMiddleware, ReplicaPinMiddleware
+from .models import AvatarJob, Category, Client, Order, Product, RollupChange, RollupRebuild
+from .order_export import FIELDS as ORDER_EXPORT_FIELDS
+from .pagination import ApproximateCountPaginator, encode_cursor, keyset_page
+from . import metrics
+from .benchmarks import SCENARIOS, run_threads
+from .replicas import fresh_replicas
+from .reservations import ReservationStatus, Shortfall, reserve_cart, reserve_order
+from .routers import PrimaryReplicaRouter
+from .search import search_products
+from .status import advance_orders
+
+
+class AsyncViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Books')
+
+    def test_middleware_is_async_in_an_async_stack(self):
+        async def get_response(request):
+            pass
+
+        self.assertTrue(LoginExpiryMiddleware(get_response).is_async)
+        self.assertFalse(LoginExpiryMiddleware(lambda request: None).is_async)
+
+    async def test_async_stack_serves_catalog(self):
+        response = await self.async_client.get(reverse('myapp:async-detail', args=[self.category.pk]))
+        self.assertEqual(response.status_code, 200)
+
+
+class LoginSessionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Client.objects.create(username='reader')
+        cls.user.set_password('secret')
+        cls.user.save()
+
+    def login(self):
+        response = self.client.post(reverse('myapp:login'), {'username': 'reader', 'password': 'secret'})
+        self.assertRedirects(response, reverse('myapp:orders'), fetch_redirect_response=False)
+
+    def test_login_expires_after_max_age(self):
+        self.login()
+        self.assertEqual(self.client.session.get_expiry_age(), settings.LOGIN_MAX_AGE)
+        session = self.client.session
+        session[LOGIN_AT] -= settings.LOGIN_MAX_AGE + 1
+        session.save()
+        response = self.client.get(reverse('myapp:index'))
+        self.assertContains(response, 'Your last login was more than one hour ago')
+        self.assertNotIn('_auth_user_id', self.client.session)
+        self.assertEqual(self.client.get(reverse('myapp:orders')).status_code, 302)
+
+    def test_logout_invalidates_the_session_everywhere(self):
+        self.login()
+        # a second browser, or worker, presenting the same session cookie
+        other = type(self.client)()
+        other.cookies[settings.SESSION_COOKIE_NAME] = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+        self.assertEqual(other.get(reverse('myapp:orders')).status_code, 200)
+        self.client.get(reverse('myapp:logout'))
+        self.assertEqual(other.get(reverse('myapp:orders')).status_code, 302)
+
+
+def png(color='red'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (500, 300), color).save(buffer, format='PNG')
+    return SimpleUploadedFile('avatar.png', buffer.getvalue(), content_type='image/png')
+
+
+@override_settings(AVATAR_PIPELINE={'SYNC': True, 'SIZES': (100,)})
+class AvatarPipelineTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        media_root = override_settings(MEDIA_ROOT=media)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        self.profile = User.objects.create_user('reader').profile
+
+    def upload(self, upload):
+        self.profile.avatar = upload
+        with self.captureOnCommitCallbacks(execute=True):
+            self.profile.save()
+        self.profile.refresh_from_db()
+        return self.profile.avatar_jobs.latest('pk')
+
+    def test_sync_upload_publishes_variants(self):
+        job = self.upload(png())
+        self.assertEqual(job.status, AvatarJob.DONE)
+        self.assertEqual(self.profile.processed_hash, self.profile.avatar_hash)
+        self.assertTrue(default_storage.exists(variant_name(job.source_hash, 100, 'webp')))
+
+    def test_corrupt_upload_fails_the_job(self):
+        job = self.upload(SimpleUploadedFile('avatar.png', b'not a picture', content_type='image/png'))
+        self.assertEqual(job.status, AvatarJob.FAILED)
+        self.assertTrue(job.error)
+        self.assertEqual(self.profile.processed_hash, '')
+
+    def test_superseded_upload_is_not_published(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            self.profile.avatar = png('blue')
+            self.profile.save()
+        stale = self.profile.avatar_jobs.latest('pk')
+        current = self.upload(png('green'))
+        self.assertEqual(process_job(stale.pk), AvatarJob.DONE)
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.processed_hash, current.source_hash)
+        self.assertFalse(default_storage.exists(variant_name(stale.source_hash, 100)))
+
+    def test_errors_outside_rendering_fail_the_job(self):
+        job = AvatarJob.objects.create(profile=self.profile, source_hash='abc')
+        with mock.patch('myapp.avatars.AvatarJob.objects.select_related', side_effect=RuntimeError('gone')):
+            self.assertEqual(process_job(job.pk), AvatarJob.FAILED)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), (AvatarJob.FAILED, 'gone'))
+
+    def test_stalled_running_jobs_are_reclaimed(self):
+        job = AvatarJob.objects.create(profile=self.profile, source_hash='old', status=AvatarJob.RUNNING,
+                                       started_at=timezone.now() - datetime.timedelta(hours=2))
+        fresh = AvatarJob.objects.create(profile=self.profile, source_hash='new', status=AvatarJob.RUNNING,
+                                         started_at=timezone.now())
+        call_command('process_avatars', '--reclaim-running', '600', stdout=io.StringIO())
+        job.refresh_from_db()
+        fresh.refresh_from_db()
+        # superseded by the profile's current (default) avatar, so done without rendering
+        self.assertEqual(job.status, AvatarJob.DONE)
+        self.assertEqual(fresh.status, AvatarJob.RUNNING)
+
+
+class ApiEtagTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Books')
+        cls.product = Product.objects.create(category=category, name='Novel', price=10, stock=5)
+        cls.client_user = Client.objects.create(username='reader')
+
+    def setUp(self):
+        self.url = reverse('myapp:api-product', args=[self.product.pk])
+
+    def test_unchanged_body_is_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_revalidation_skips_rendering(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(0), mock.patch('myapp.api.encode_body') as encode:
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        encode.assert_not_called()
+
+    def test_unknown_query_parameters_share_one_entry(self):
+        url = reverse('myapp:api-categories')
+        Category.objects.bulk_create(Category(name=f'Category {i}') for i in range(3))
+        first = self.client.get(url, {'size': 1, 'junk': 'a'})
+        with self.assertNumQueries(0):
+            second = self.client.get(url, {'junk': 'b', 'size': 1, 'utm_source': 'x'})
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertNotIn('junk', second.json()['next'])
+
+    def test_gzip_and_identity_differ(self):
+        url = self.url + '?fields=id,name,description,price,stock,available,interested,category'
+        Product.objects.filter(pk=self.product.pk).update(description='A long description. ' * 20)
+        catalog_cache.invalidate()
+        identity = self.client.get(url)
+        gzipped = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(gzipped['Content-Encoding'], 'gzip')
+        self.assertNotEqual(identity['ETag'], gzipped['ETag'])
+        self.assertFalse(gzipped['ETag'].startswith('W/'))
+
+    def test_stock_change_gets_a_new_etag_once_the_entry_expires(self):
+        etag = self.client.get(self.url)['ETag']
+        reserve_order(Order(product=self.product, client=self.client_user, num_units=2))
+        # a sale does not touch the catalog version; expire the cached payload instead
+        catalog_cache.cache.clear()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['stock'], 3)
+
+
+class LastModifiedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.books = Category.objects.create(name='Books')
+        cls.games = Category.objects.create(name='Games')
+        cls.product = Product.objects.create(category=cls.books, name='Novel', price=10, stock=5)
+        cls.client_user = Client.objects.create(username='reader')
+
+    def test_checkouts_keep_the_catalog_fresh(self):
+        last_modified = self.client.get(reverse('myapp:index'))['Last-Modified']
+        before = catalog_last_modified()
+        reserve_order(Order(product=self.product, client=self.client_user, num_units=2))
+        self.assertEqual(catalog_last_modified(), before)
+        response = self.client.get(reverse('myapp:index'), HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_deleting_a_category_modifies_the_catalog(self):
+        before = catalog_last_modified()
+        self.games.delete()
+        self.assertGreater(catalog_last_modified(), before)
+        self.assertEqual(catalog_last_modified(self.books.pk), self.product.updated_at)
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Books')
+        Product.objects.bulk_create(Product(category=cls.category, name=f'Book {i}', price=10) for i in range(25))
+
+    def test_pages_cover_every_row_once(self):
+        seen, cursor = [], None
+        while True:
+            page = keyset_page(Product.objects.all(), ('id',), cursor, page_size=10)
+            seen += [product.pk for product in page]
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, list(Product.objects.order_by('id').values_list('pk', flat=True)))
+
+    def test_ill_typed_cursors_start_from_the_first_page(self):
+        first = [product.pk for product in keyset_page(Product.objects.all(), ('id',), None, 10)]
+        for values in (['abc'], [{'x': 1}], [None], [[1]], [True], ['1', 2]):
+            page = keyset_page(Product.objects.all(), ('id',), encode_cursor(values), 10)
+            self.assertEqual([product.pk for product in page], first, values)
+        for token in ('not base64!', encode_cursor({'id': 1})):
+            self.assertEqual([product.pk for product in keyset_page(Product.objects.all(), ('id',), token, 10)],
+                             first)
+
+    def test_catalog_pages_ignore_bad_cursors(self):
+        for values in (['abc'], [{'x': 1}], [None]):
+            cursor = encode_cursor(values)
+            self.assertEqual(self.client.get(reverse('myapp:products'), {'cursor': cursor}).status_code, 200)
+            url = reverse('myapp:api-category-products', args=[self.category.pk])
+            self.assertEqual(self.client.get(url, {'cursor': cursor}).status_code, 200)
+
+
+class CatalogImportTests(TestCase):
+    def import_lines(self, *lines, batch_size=2):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = f'{directory}/catalog.jsonl'
+        with open(path, 'w', encoding='utf-8') as stream:
+            stream.write('\n'.join(lines) + '\n')
+        out = io.StringIO()
+        call_command('catalog_import', path, '--batch-size', str(batch_size), stdout=out, stderr=io.StringIO())
+        return out.getvalue()
+
+    def test_bad_lines_are_rejected_one_by_one(self):
+        output = self.import_lines(
+            '{"category": "Books", "name": "Novel", "price": "12.50", "stock": 3}',
+            '{"category": "Books", "name": ',
+            '["Books", "Atlas"]',
+            '{"category": "Books", "name": "Atlas", "price": "-1"}',
+            '{"category": "Books", "name": "Atlas", "price": 30}',
+        )
+        self.assertIn('2 created, 0 updated, 0 unchanged, 3 rejected.', output)
+        self.assertEqual(sorted(Product.objects.values_list('name', 'stock')), [('Atlas', 100), ('Novel', 3)])
+
+    def test_prices_must_be_finite_and_not_negative(self):
+        for price in ('-0.01', 'NaN', 'sNaN', 'Infinity', '-Infinity', 'abc'):
+            with self.assertRaises(RowError, msg=price):
+                clean_row({'category': 'Books', 'name': 'Novel', 'price': price})
+        self.assertEqual(clean_row({'category': 'Books', 'name': 'Novel', 'price': '0'})['stock'], 100)
+        with self.assertRaisesMessage(RowError, 'line 1:'):
+            clean_row(RowError('line 1: Expecting value'))
+
+    def test_batch_size_must_be_positive(self):
+        with self.assertRaisesMessage(CommandError, '--batch-size must be at least 1.'):
+            self.import_lines('{"category": "Books", "name": "Novel", "price": 1}', batch_size=0)
+        with self.assertRaisesMessage(CommandError, '--batch-size must be at least 1.'):
+            call_command('catalog_export', '-', '--batch-size', '-1')
+        self.assertFalse(Product.objects.exists())
+
+
+class AdminChangelistTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # a User that is not a Client, with a lower key
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'secret')
+        category = Category.objects.create(name='Books')
+        product = Product.objects.create(category=category, name='Novel', price=10)
+        cls.customer = Client.objects.create(username='reader')
+        for day in ('2022-01-31', '2022-01-31', '2022-03-02', '2023-07-15'):
+            Order.objects.create(product=product, client=cls.customer, status_date=day)
+
+    def test_dates_is_a_queryset_matching_django(self):
+        for kind in ('year', 'month', 'day'):
+            for order in ('ASC', 'DESC'):
+                dates = Order.objects.dates('status_date', kind, order)
+                expected = list(models.QuerySet.dates(Order.objects.all(), 'status_date', kind, order))
+                self.assertIsInstance(dates, models.QuerySet)
+                self.assertEqual(list(dates), expected, (kind, order))
+        self.assertEqual(Order.objects.filter(status_date__year=2022).dates('status_date', 'month').count(), 2)
+
+    def test_date_hierarchy_lists_the_months(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('admin:myapp_order_changelist'), {'status_date__year': 2022})
+        self.assertContains(response, 'status_date__month=1')
+        self.assertContains(response, 'status_date__month=3')
+
+    def test_client_count_ignores_other_users(self):
+        paginator = ApproximateCountPaginator(Client.objects.order_by('pk'), 20)
+        self.assertEqual(paginator.count, 1)
+        self.assertEqual(ApproximateCountPaginator(Order.objects.order_by('pk'), 20).count, 4)
+
+
+class StockActionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Books')
+        cls.product = Product.objects.create(category=category, name='Novel', price=10, stock=5)
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'secret')
+
+    def increase(self, amount):
+        self.client.force_login(self.admin)
+        return self.client.post(reverse('admin:myapp_product_changelist'), {
+            'action': 'increase_product_stock', '_selected_action': [self.product.pk], 'amount': amount,
+        }, follow=True)
+
+    def test_negative_units_are_rejected(self):
+        with self.assertRaises(ValueError):
+            increase_stock(Product.objects.all(), -5)
+        response = self.increase('-5')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Amount: Ensure this value is greater than or equal to 1.')
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 5)
+
+    def test_stock_raised_after_the_keys_were_read_is_skipped(self):
+        category = self.product.category
+        products = Product.objects.bulk_create(
+            Product(category=category, name=f'Book {i}', price=10, stock=0) for i in range(3))
+        products.append(Product.objects.create(category=category, name='Full', price=10, stock=MAX_STOCK))
+        chunks = bulk.iter_pk_chunks
+
+        def restocked(queryset, chunk_size):
+            for chunk in chunks(queryset, chunk_size):
+                # another admin refilled these between the read and the update
+                Product.objects.filter(pk__in=chunk, pk__gt=products[0].pk).update(stock=MAX_STOCK - 10)
+                yield chunk
+
+        with mock.patch('myapp.bulk.iter_pk_chunks', restocked):
+            result = increase_stock(Product.objects.filter(pk__in=[p.pk for p in products]), 20, chunk_size=2)
+        self.assertEqual((result.rows, result.skipped), (1, 3))
+        self.assertEqual(list(Product.objects.filter(pk__in=[p.pk for p in products])
+                              .order_by('pk').values_list('stock', flat=True)),
+                         [20, MAX_STOCK - 10, MAX_STOCK - 10, MAX_STOCK - 10])
+
+    def test_amount_defaults_to_fifty(self):
+        self.increase('')
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 55)
+
+
+class HotQueryTests(TestCase):
+    def test_hot_queries_use_indexes(self):
+        Category.objects.create(name='Books')
+        out = io.StringIO()
+        call_command('explain_hot_queries', stdout=out)
+        self.assertNotIn('[SCAN]', out.getvalue())
+
+    def test_a_full_table_scan_fails_the_command(self):
+        unindexed = ('detail', 'products by description', Product.objects.filter(description='Fits any lamp.'))
+        with mock.patch('myapp.management.commands.explain_hot_queries.hot_queries', return_value=[unindexed]):
+            with self.assertRaisesMessage(CommandError, 'Full table scans in: detail: products by description'):
+                call_command('explain_hot_queries', stdout=io.StringIO())
+
+    def test_a_limited_scan_in_key_order_is_an_index_read(self):
+        first_page = Product.objects.order_by('id')[:11]
+        self.assertEqual(full_scans(first_page, ['SCAN myapp_product']), [])
+        self.assertEqual(full_scans(Product.objects.order_by('id'), ['SCAN myapp_product']), ['SCAN myapp_product'])
+
+
+class SQLiteProfileTests(SimpleTestCase):
+    def test_production_backend_applies_pragmas_and_begins_immediate(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = f'{directory}/profile.sqlite3'
+        profile = DatabaseWrapper({
+            **connection.settings_dict, 'NAME': path, 'OPTIONS': {'timeout': 0},
+            'TRANSACTION_MODE': 'IMMEDIATE', 'PRAGMAS': {'journal_mode': 'WAL', 'synchronous': 'NORMAL'},
+        }, alias='profile')
+        self.addCleanup(profile.close)
+        with profile.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute('CREATE TABLE item (id INTEGER PRIMARY KEY)')
+        other = sqlite3.connect(path, timeout=0)
+        self.addCleanup(other.close)
+        profile.set_autocommit(False, force_begin_transaction_with_broken_autocommit=True)
+        try:
+            # nothing read or written yet, but the write lock is already taken
+            with self.assertRaisesMessage(sqlite3.OperationalError, 'locked'):
+                other.execute('INSERT INTO item VALUES (1)')
+        finally:
+            profile.rollback()
+            profile.set_autocommit(True)
+        other.execute('INSERT INTO item VALUES (1)')
+
+
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch('myapp.routers.fresh_replicas', return_value=['replica1'])
+        self.fresh_replicas = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.router = PrimaryReplicaRouter()
+
+    def in_new_context(self, function):
+        # the pin is a context variable, already set by other tests' writes
+        return contextvars.Context().run(function)
+
+    def test_catalog_reads_go_to_a_fresh_replica(self):
+        self.assertEqual(self.in_new_context(lambda: self.router.db_for_read(Product)), 'replica1')
+        self.assertEqual(self.in_new_context(lambda: self.router.db_for_read(Client)), 'default')
+        self.fresh_replicas.return_value = []
+        self.assertEqual(self.in_new_context(lambda: self.router.db_for_read(Order)), 'default')
+
+    def test_reads_after_a_catalog_write_stay_on_the_primary(self):
+        def write(model):
+            self.router.db_for_write(model)
+            return self.router.db_for_read(Product)
+
+        self.assertEqual(self.in_new_context(lambda: write(Client)), 'replica1')
+        self.assertEqual(self.in_new_context(lambda: write(Order)), 'default')
+
+    def test_the_pin_is_carried_to_the_next_request_by_a_cookie(self):
+        def place_order(request):
+            self.router.db_for_write(Order)
+            return HttpResponse()
+
+        def browse(request):
+            return HttpResponse(self.router.db_for_read(Product))
+
+        request = RequestFactory().post('/')
+        response = self.in_new_context(lambda: ReplicaPinMiddleware(place_order)(request))
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], settings.REPLICA_PIN_SECONDS)
+        request = RequestFactory().get('/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        self.assertEqual(self.in_new_context(lambda: ReplicaPinMiddleware(browse)(request)).content, b'default')
+        response = self.in_new_context(lambda: ReplicaPinMiddleware(browse)(RequestFactory().get('/')))
+        self.assertEqual(response.content, b'replica1')
+
+    def test_stale_replicas_are_left_out(self):
+        lags = {'replica1': 5.0, 'replica2': 60.0, 'replica3': None}
+        with self.settings(DATABASE_REPLICAS=list(lags), REPLICA_MAX_LAG=30), \
+                mock.patch('myapp.replicas.replica_lag', side_effect=lags.get):
+            self.assertEqual(fresh_replicas(), ['replica1'])
+            self.assertEqual(fresh_replicas(max_lag=120), ['replica1', 'replica2'])
+
+
+class OrderExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Books')
+        product = Product.objects.create(category=category, name='Novel', price='12.50')
+        customer = Client.objects.create(username='reader', first_name='Ada', last_name='Lovelace', province='ON')
+        for day, status in ((1, Order.PLACED), (2, Order.SHIPPED), (3, Order.PLACED), (4, Order.CANCELLED)):
+            Order.objects.create(product=product, client=customer, num_units=day, order_status=status,
+                                 status_date=datetime.date(2022, 5, day))
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'secret')
+
+    def export(self, *arguments):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = f'{directory}/orders.jsonl'
+        call_command('export_orders', path, '--batch-size', '1', *arguments, stderr=io.StringIO())
+        with open(path, encoding='utf-8') as stream:
+            return [json.loads(line) for line in stream]
+
+    def test_filters_select_the_rows(self):
+        rows = self.export('--start', '2022-05-02', '--end', '2022-05-04', '--status', '1', '2')
+        self.assertEqual([row['status_date'] for row in rows], ['2022-05-02', '2022-05-03'])
+        self.assertEqual(rows[0], {
+            'id': rows[0]['id'], 'status_date': '2022-05-02', 'order_status': Order.SHIPPED,
+            'status': 'Order Shipped', 'client': 'reader', 'client_name': 'Ada Lovelace', 'province': 'ON',
+            'product': 'Novel', 'price': '12.50', 'num_units': 2, 'total': '25.00',
+        })
+        self.assertEqual(len(self.export()), 4)
+        with self.assertRaisesMessage(CommandError, '--batch-size must be at least 1.'):
+            call_command('export_orders', '-', '--batch-size', '0')
+
+    def test_admin_action_streams_csv(self):
+        self.client.force_login(self.admin)
+        response = self.client.post(reverse('admin:myapp_order_changelist'), {
+            'action': 'export_orders_csv', 'select_across': '1', 'index': '0',
+            '_selected_action': list(Order.objects.values_list('pk', flat=True)),
+        })
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], ','.join(ORDER_EXPORT_FIELDS))
+        self.assertEqual(len(lines), 5)
+
+
+class PageBenchmarkTests(SimpleTestCase):
+    def test_unknown_pages_fail_before_the_dataset_is_built(self):
+        scenario = SCENARIOS['views']
+        with mock.patch('myapp.benchmarks.pages.generate_dataset') as generate:
+            with self.assertRaisesMessage(CommandError, 'Unknown pages: anonymous_orders, user_nope.'):
+                scenario.run(io.StringIO(), categories=1, products=1, clients=1, orders=1, users=1, requests=1,
+                             pages=['user_orders', 'anonymous_orders', 'user_nope'], seed=1)
+        generate.assert_not_called()
+
+    def test_orders_are_only_measured_logged_in(self):
+        pages = SCENARIOS['views'].pages([1], [1])
+        self.assertEqual(pages['user_orders'], (True, [reverse('myapp:orders')]))
+        self.assertNotIn('anonymous_orders', pages)
+        self.assertFalse(pages['anonymous_login'][0])
+
+
+@override_settings(ORDER_HISTORY_PAGE_SIZE=5)
+class OrderHistoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Books')
+        cls.products = [Product.objects.create(category=category, name=name, price=price)
+                        for name, price in (('Novel', '12.50'), ('Atlas', 30))]
+        cls.customer = Client.objects.create(username='reader')
+
+    def order(self, count, num_units=2):
+        for i in range(count):
+            Order.objects.create(product=self.products[i % 2], client=self.customer, num_units=num_units,
+                                 status_date=datetime.date(2022, 1, 1) + datetime.timedelta(days=i))
+
+    def get(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('myapp:orders'), params)
+        return response, len(queries)
+
+    def test_queries_do_not_grow_with_the_orders(self):
+        self.client.force_login(self.customer)
+        self.order(2)
+        response, few = self.get()
+        self.assertContains(response, '<td>25.00</td>', html=True)
+        self.order(20, num_units=1)
+        response, many = self.get()
+        self.assertEqual(few, many)
+        self.assertEqual(list(response.context['orders']), ['Atlas', 'Novel'])
+
+    def test_history_is_paged_newest_first(self):
+        self.client.force_login(self.customer)
+        self.order(7)
+        seen, params = [], {}
+        while True:
+            response, _ = self.get(**params)
+            history = response.context['history']
+            seen += [order.status_date.day for order in history]
+            if not history.has_next:
+                break
+            params = {'cursor': history.next_cursor}
+        self.assertEqual(seen, [7, 6, 5, 4, 3, 2, 1])
+
+    def test_a_user_without_orders_is_told_so(self):
+        self.client.force_login(self.customer)
+        self.assertContains(self.get()[0], 'has not placed any orders')
+
+
+class InterestCounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Books')
+        cls.novel = Product.objects.create(category=category, name='Novel', price=10)
+        cls.atlas = Product.objects.create(category=category, name='Atlas', price=30)
+
+    def interested(self):
+        return list(Product.objects.order_by('pk').values_list('interested', flat=True))
+
+    def test_sync_mode_writes_every_click(self):
+        counter = InterestCounter(sync=True)
+        counter.increment(self.novel.pk)
+        counter.increment(self.novel.pk, 2)
+        self.assertEqual(self.interested(), [3, 0])
+        self.assertEqual((counter.pending(self.novel.pk), counter.flush()), (0, 0))
+
+    def test_buffered_clicks_are_written_in_one_flush(self):
+        counter = InterestCounter(flush_interval=60, flush_threshold=5)
+        self.addCleanup(counter.flush)
+        counter.increment(self.novel.pk)
+        counter.increment(self.atlas.pk)
+        self.assertEqual((self.interested(), counter.pending(self.novel.pk)), ([0, 0], 1))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(counter.flush(), 2)
+        # both products had one click, so one UPDATE covers them
+        self.assertEqual([query['sql'][:6] for query in queries].count('UPDATE'), 1)
+        for _ in range(5):
+            counter.increment(self.atlas.pk)
+        self.assertEqual(self.interested(), [1, 6])
+        self.assertEqual(counter.metrics()['flushes'], 2)
+
+    def test_a_failed_flush_keeps_the_clicks(self):
+        counter = InterestCounter(flush_interval=60)
+        counter.increment(self.novel.pk, 4)
+        with mock.patch.object(counter, '_write', side_effect=RuntimeError('disk full')):
+            with self.assertRaises(RuntimeError):
+                counter.flush()
+        self.assertEqual(counter.pending(self.novel.pk), 4)
+        self.assertEqual(counter.flush(), 4)
+        self.assertEqual(self.interested(), [4, 0])
+
+
+class LookupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Books')
+        cls.book = Product.objects.create(category=category, name='1984', price=10)
+        Product.objects.create(category=category, name='Atlas', price=30, available=False)
+        cls.customer = Client.objects.create(username='reader')
+        for i in range(4):
+            Client.objects.create(username=f'reader{i}')
+
+    def get(self, lookup, **params):
+        return self.client.get(reverse(f'myapp:lookup-{lookup}'), params)
+
+    def test_lookups_need_a_login_and_a_safe_method(self):
+        for lookup in ('clients', 'products'):
+            response = self.get(lookup, q='reader')
+            self.assertEqual(response.status_code, 302)
+            self.assertTrue(response.url.startswith(settings.LOGIN_URL))
+        self.client.force_login(self.customer)
+        self.assertEqual(self.client.post(reverse('myapp:lookup-clients')).status_code, 405)
+
+    def test_clients_are_paged_by_username_prefix(self):
+        self.client.force_login(self.customer)
+        usernames, params = [], {'q': 'reader', 'size': 2}
+        while params:
+            page = self.get('clients', **params).json()
+            usernames += [item['text'].rsplit('(', 1)[1].rstrip(')') for item in page['results']]
+            params = page['next'] and dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(page['next']).query))
+        self.assertEqual(usernames, ['reader', 'reader0', 'reader1', 'reader2', 'reader3'])
+        self.assertEqual(self.get('clients', q='Reader').json()['results'], [])
+
+    def test_digits_search_product_names(self):
+        self.client.force_login(self.customer)
+        self.assertEqual(self.get('products', q='1984').json()['results'], [{'id': self.book.pk, 'text': '1984'}])
+        self.assertEqual([item['id'] for item in self.get('products').json()['results']], [self.book.pk])
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Home')
+        Product.objects.bulk_create(Product(category=category, name=f'Shade {i}', description='Fits any lamp.',
+                                            price=10) for i in range(5))
+        cls.lamp = Product.objects.create(category=category, name='Desk Lamp', price=30)
+
+    @override_settings(SEARCH_MAX_CANDIDATES=2)
+    def test_candidates_are_the_best_matches(self):
+        page = search_products('lamp')
+        self.assertEqual(page.items[0], self.lamp)
+        self.assertEqual(len(page.items), 2)
+
+    def test_cursor_pages_in_rank_order(self):
+        seen, cursor = [], None
+        while True:
+            page = search_products('lamp', cursor=cursor, page_size=2)
+            seen += page.items
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(len(seen), 6)
+        self.assertEqual(seen[0], self.lamp)
+        self.assertEqual([product.rank for product in seen], sorted(product.rank for product in seen))
+
+    def test_ill_typed_cursors_start_from_the_first_page(self):
+        first = search_products('lamp', page_size=2).items
+        for values in (['abc', 1], [1.5, 'x'], [None, 1], [True, 1], [1.5, False], [{'x': 1}, 1]):
+            self.assertEqual(search_products('lamp', cursor=encode_cursor(values), page_size=2).items, first)
+        response = self.client.get(reverse('myapp:search'), {'q': 'lamp', 'cursor': encode_cursor(['abc', 1])})
+        self.assertEqual(response.status_code, 200)
+
+
+class RollupTests(TestCase):
+    by = ('day', 'category', 'province', 'status')
+
+    @classmethod
+    def setUpTestData(cls):
+        books, games = Category.objects.create(name='Books'), Category.objects.create(name='Games')
+        cls.novel = Product.objects.create(category=books, name='Novel', price=10, stock=100)
+        cls.chess = Product.objects.create(category=games, name='Chess', price=25, stock=100)
+        ontario = Client.objects.create(username='ontario', province='ON')
+        quebec = Client.objects.create(username='quebec', province='QC')
+        for product, client, units in ((cls.novel, ontario, 1), (cls.novel, quebec, 2), (cls.chess, quebec, 3)):
+            Order.objects.create(product=product, client=client, num_units=units, order_status=Order.PLACED)
+        refresh_rollups()
+
+    def test_refresh_matches_the_orders(self):
+        self.assertEqual(rollup_totals(self.by), order_totals(self.by))
+        Order.objects.filter(product=self.chess).update(order_status=Order.SHIPPED)
+        Order.objects.filter(product=self.novel, num_units=1).delete()
+        self.assertEqual(refresh_rollups(), 3)
+        self.assertEqual(rollup_totals(self.by), order_totals(self.by))
+        self.assertFalse(RollupChange.objects.exists())
+
+    def test_repricing_rebuilds_the_category(self):
+        changes = RollupChange.objects.count()
+        Product.objects.filter(pk=self.novel.pk).update(price=F('price') * 2)
+        Product.objects.filter(pk=self.chess.pk).update(category=self.novel.category)
+        # one row per product, not per order
+        self.assertEqual(RollupChange.objects.count(), changes)
+        self.assertEqual(RollupRebuild.objects.count(), 3)
+        refresh_rollups()
+        self.assertEqual(rollup_totals(self.by), order_totals(self.by))
+        self.assertEqual(rollup_totals(('category',)), [{'category': self.novel.category_id, 'orders': 3,
+                                                         'units': 6, 'revenue': 135}])
+
+    def test_full_refresh_rebuilds_everything(self):
+        Product.objects.filter(pk=self.novel.pk).update(price=12)
+        self.assertEqual(refresh_rollups(full=True), len(order_totals(self.by)))
+        self.assertEqual(rollup_totals(self.by), order_totals(self.by))
+        self.assertFalse(RollupRebuild.objects.exists())
+
+
+class StatusTransitionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Books')
+        cls.product = Product.objects.create(category=category, name='Novel', price=10, stock=998)
+        client = Client.objects.create(username='reader')
+        cls.placed = [Order.objects.create(product=cls.product, client=client, num_units=units,
+                                           order_status=Order.PLACED) for units in (1, 4)]
+        cls.delivered = Order.objects.create(product=cls.product, client=client, num_units=1,
+                                             order_status=Order.DELIVERED)
+
+    def test_only_allowed_moves_are_made(self):
+        result = advance_orders(Order.objects.all(), Order.SHIPPED)
+        self.assertEqual((result.rows, result.skipped, result.locked), (2, 1, 0))
+        self.assertEqual(Order.objects.filter(order_status=Order.SHIPPED).count(), 2)
+        self.delivered.refresh_from_db()
+        self.assertEqual(self.delivered.order_status, Order.DELIVERED)
+        with self.assertRaises(ValueError):
+            advance_orders(Order.objects.all(), Order.PLACED)
+
+    def test_cancelling_reports_the_units_over_the_limit(self):
+        result = advance_orders(Order.objects.filter(pk__in=[order.pk for order in self.placed]), Order.CANCELLED)
+        self.assertEqual((result.rows, result.restocked, result.capped), (2, 2, 3))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 1000)
+
+    def test_locked_chunks_are_not_skips(self):
+        with mock.patch('myapp.status._with_retries', return_value=None):
+            result = advance_orders(Order.objects.all(), Order.SHIPPED)
+        self.assertEqual((result.rows, result.skipped, result.locked), (0, 1, 2))
+        self.assertIn('2 left in locked chunks', str(result))
+
+
+class CancelUnderLoadTests(TransactionTestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Books')
+        self.customer = Client.objects.create(username='reader')
+        products = Product.objects.bulk_create(
+            Product(category=category, name=f'Book {i}', price=10, stock=0) for i in range(10))
+        Order.objects.bulk_create(Order(product=products[i % 10], client=self.customer, num_units=1,
+                                        order_status=Order.PLACED) for i in range(200))
+        self.hot = Product.objects.create(category=category, name='Hot', price=1, stock=MAX_STOCK)
+
+    def test_cancelling_while_another_connection_reads(self):
+        reading = threading.Event()
+
+        def worker(index):
+            if index == 0:
+                with transaction.atomic():
+                    list(Order.objects.all()[:10])
+                    reading.set()
+                    time.sleep(0.2)
+                return
+            reading.wait()
+            outcome['cancel'] = advance_orders(Order.objects.exclude(product=self.hot), Order.CANCELLED, 50)
+
+        outcome = {}
+        run_threads(worker, 2)
+        self.assertEqual((outcome['cancel'].rows, outcome['cancel'].locked), (200, 0))
+
+    def test_cancelling_next_to_checkouts_makes_progress(self):
+        client, hot = self.customer, self.hot
+        done = threading.Event()
+
+        def worker(index):
+            if index == 0:
+                try:
+                    outcome['cancel'] = advance_orders(Order.objects.exclude(product=hot), Order.CANCELLED, 20)
+                finally:
+                    done.set()
+                return
+            while not done.is_set():
+                if not reserve_order(Order(product_id=hot.pk, client_id=client.pk, num_units=1)).reserved:
+                    Product.objects.filter(pk=hot.pk).update(stock=MAX_STOCK)
+
+        outcome = {}
+        run_threads(worker, 3)
+        result = outcome['cancel']
+        self.assertEqual((result.rows, result.locked, result.restocked), (200, 0, 200))
+        self.assertEqual(Product.objects.exclude(pk=hot.pk).aggregate(stock=Sum('stock'))['stock'], 200)
+
+
+class MetricsTests(TestCase):
+    allowed = {'SERVER_TIMING': True, 'ALLOWED_IPS': ['127.0.0.1']}
+
+    def test_endpoint_is_off_by_default(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+
+    def test_server_timing_is_off_by_default(self):
+        self.assertNotIn('Server-Timing', self.client.get(reverse('myapp:about')))
+        with self.settings(METRICS={**settings.METRICS, 'SERVER_TIMING': True}):
+            self.assertIn('db;dur=', self.client.get(reverse('myapp:about'))['Server-Timing'])
+
+    def test_only_allowed_addresses_are_answered(self):
+        with self.settings(METRICS=self.allowed):
+            self.client.get(reverse('myapp:about'))
+            response = self.client.get(reverse('metrics'))
+            self.assertEqual(response.status_code, 200)
+            self.assertContains(response, 'myapp_request_seconds_count{view="myapp:about"}')
+            self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='10.0.0.1').status_code, 403)
+
+    def test_finished_threads_are_folded_into_the_totals(self):
+        def record():
+            metrics.observe('myapp_request_queries', 'test:thread', 3)
+
+        thread = threading.Thread(target=record)
+        thread.start()
+        thread.join()
+        self.assertIn('myapp_request_queries_count{view="test:thread"} 1', metrics.render_metrics())
+        self.assertNotIn(thread, metrics._stores)
+        run_threads(lambda index: record(), 2)
+        self.assertIn('myapp_request_queries_count{view="test:thread"} 3', metrics.render_metrics())
+
+
+class DatasetTests(TestCase):
+    def test_sizes_are_checked_before_writing(self):
+        for sizes in ({'categories': -1}, {'orders': -5}, {'days': 0}, {'batch_size': 0},
+                      {'categories': 0}, {'products': 0}):
+            arguments = {'categories': 2, 'products': 5, 'clients': 3, 'orders': 10, **sizes}
+            with self.assertRaises(ValueError, msg=sizes):
+                generate_dataset(**arguments)
+        self.assertFalse(Category.objects.exists())
+        with self.assertRaisesMessage(CommandError, 'Order history needs at least one day.'):
+            call_command('generate_dataset', '--days', '0')
+
+    def test_generates_the_requested_rows(self):
+        generate_dataset(categories=2, products=5, clients=3, orders=10, days=7)
+        self.assertEqual((Category.objects.count(), Product.objects.count(), Client.objects.count(),
+                          Order.objects.count()), (2, 5, 3, 10))
+        self.assertEqual(rollup_totals(('category',)), order_totals(('category',)))
+
+
+class ReservationStressTests(TransactionTestCase):
+    """Concurrent checkouts against one product, as in ``manage.py benchmark reservations``."""
+    threads = 8
+    attempts_per_thread = 20
+    stock = 50
+
+    def test_concurrent_reservations_never_oversell_or_lose_orders(self):
+        category = Category.objects.create(name='Books')
+        product = Product.objects.create(category=category, name='Novel', price=10, stock=self.stock)
+        client = Client.objects.create(username='reader')
+        results = []
+        lock = threading.Lock()
+
+        def checkout(index):
+            for _ in range(self.attempts_per_thread):
+                result = reserve_order(Order(product_id=product.pk, client_id=client.pk, num_units=1))
+                with lock:
+                    results.append(result.status)
+
+        run_threads(checkout, self.threads)
+
+        product.refresh_from_db()
+        reserved = results.count(ReservationStatus.RESERVED)
+        self.assertEqual(len(results), self.threads * self.attempts_per_thread)
+        self.assertGreaterEqual(product.stock, 0)
+        self.assertEqual(Order.objects.filter(product=product).count(), reserved)
+        self.assertEqual(Order.objects.filter(product=product).aggregate(units=Sum('num_units'))['units'],
+                         self.stock - product.stock)
+        self.assertGreater(reserved, 0)
+
+    def test_concurrent_carts_wait_for_each_other(self):
+        category = Category.objects.create(name='Books')
+        products = [Product.objects.create(category=category, name=name, price=10, stock=1000)
+                    for name in ('Novel', 'Atlas')]
+        client = Client.objects.create(username='reader')
+        lines = [(product.pk, 1) for product in products]
+        results = []
+        lock = threading.Lock()
+
+        def checkout(index):
+            for _ in range(30):
+                result = reserve_cart(client.pk, lines)
+                with lock:
+                    results.append(result.status)
+
+        run_threads(checkout, 6)
+
+        self.assertEqual(results, [ReservationStatus.RESERVED] * 180)
+        self.assertEqual(sorted(Product.objects.values_list('stock', flat=True)), [820, 820])
+        self.assertEqual(Order.objects.count(), 360)
+
+
+    def test_a_cart_that_cannot_get_the_lock_is_a_conflict(self):
+        # outside a test transaction, so the retries can run
+        category = Category.objects.create(name='Books')
+        product = Product.objects.create(category=category, name='Novel', price=10, stock=5)
+        client = Client.objects.create(username='reader')
+        locked = mock.patch('myapp.reservations._take_write_lock',
+                            side_effect=OperationalError('database is locked'))
+        with locked as take_write_lock:
+            result = reserve_cart(client.pk, [(product.pk, 1)], attempts=3, backoff=0)
+        self.assertEqual((result.status, result.attempts), (ReservationStatus.CONFLICT, 3))
+        self.assertEqual(take_write_lock.call_count, 3)
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 5)
+        self.assertFalse(Order.objects.exists())
+
+
+class CartReservationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Books')
+        cls.novel = Product.objects.create(category=category, name='Novel', price=10, stock=5)
+        cls.atlas = Product.objects.create(category=category, name='Atlas', price=30, stock=1)
+        cls.customer = Client.objects.create(username='reader')
+
+    def stock(self):
+        return list(Product.objects.order_by('pk').values_list('stock', flat=True))
+
+    def test_lines_for_one_product_are_added_together(self):
+        result = reserve_cart(self.customer.pk, [(self.novel.pk, 2), (self.atlas.pk, 1), (self.novel.pk, 3)])
+        self.assertIs(result.status, ReservationStatus.RESERVED)
+        self.assertEqual(sorted(order.num_units for order in result.orders), [1, 5])
+        self.assertEqual(self.stock(), [0, 0])
+
+    def test_a_shortfall_writes_nothing(self):
+        result = reserve_cart(self.customer.pk, [(self.novel.pk, 2), (self.atlas.pk, 2)])
+        self.assertIs(result.status, ReservationStatus.INSUFFICIENT)
+        self.assertEqual(result.shortfalls, [Shortfall(self.atlas.pk, 2, 1)])
+        self.assertEqual(self.stock(), [5, 1])
+        self.assertFalse(Order.objects.exists())
+
+    def test_an_unknown_product_is_a_shortfall(self):
+        unknown = self.atlas.pk + 100
+        result = reserve_cart(self.customer.pk, [(self.novel.pk, 1), (unknown, 1)])
+        self.assertEqual(result.shortfalls, [Shortfall(unknown, 1, 0)])
+        self.assertFalse(Order.objects.exists())
+
+    def post(self, *lines):
+        data = {'client': self.customer.pk, 'lines-TOTAL_FORMS': len(lines), 'lines-INITIAL_FORMS': 0}
+        for index, (product, num_units) in enumerate(lines):
+            data[f'lines-{index}-product'] = product
+            data[f'lines-{index}-num_units'] = num_units
+        self.client.force_login(self.customer)
+        return self.client.post(reverse('myapp:checkout'), data)
+
+    def test_checkout_places_one_order_per_product(self):
+        response = self.post((self.novel.pk, 2), (self.atlas.pk, 1))
+        self.assertContains(response, 'Your order of 2 products has been placed successfully.')
+        self.assertEqual(self.stock(), [3, 0])
+
+    def test_checkout_reports_the_stock_next_to_short_lines(self):
+        response = self.post((self.novel.pk, 2), (self.atlas.pk, 3))
+        self.assertContains(response, 'We do not have sufficient stock for some of the products')
+        self.assertContains(response, 'Only 1 in stock.')
+        self.assertEqual(self.stock(), [5, 1])
@@ -1,5 +1,5 @@
 from django.urls import path
-from myapp import views
+from myapp import api, async_views, lookups, views
 from myapp.views import ResetPasswordView
 from django.contrib.auth import views as auth_views
 
@@ -22,10 +22,30 @@ urlpatterns = [
     path(r'about/', views.about, name='about'),
     path(r'<int:cat_no>/', views.detail, name='detail'),
     path(r'products/', views.products, name='products'),
+    path(r'search/', views.search, name='search'),
     path(r'place_order/', views.place_order, name='placeOrder'),
+    path(r'checkout/', views.checkout, name='checkout'),
     path(r'products/<int:prod_id>/', views.productdetail, name='productDetail'),
     path(r'orders/', views.myorders, name='orders'),
     path(r'profile/', views.profile, name='users-profile'),
 
+    # the same catalog and order pages as async views, for ASGI servers
+    path(r'async/', async_views.index, name='async-index'),
+    path(r'async/<int:cat_no>/', async_views.detail, name='async-detail'),
+    path(r'async/products/', async_views.products, name='async-products'),
+    path(r'async/place_order/', async_views.place_order, name='async-placeOrder'),
+    path(r'async/products/<int:prod_id>/', async_views.productdetail, name='async-productDetail'),
+    path(r'async/orders/', async_views.myorders, name='async-orders'),
+
+    # read-only JSON catalog
+    path(r'api/categories/', api.categories, name='api-categories'),
+    path(r'api/categories/<int:cat_no>/products/', api.category_products, name='api-category-products'),
+    path(r'api/products/<int:prod_id>/', api.product, name='api-product'),
+    path(r'api/search/', api.search, name='api-search'),
+
+    # order form suggestions
+    path(r'lookups/clients/', lookups.clients, name='lookup-clients'),
+    path(r'lookups/products/', lookups.products, name='lookup-products'),
+
     # path(r"password_change", views.password_change, name="password_change")
 ]
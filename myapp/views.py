@@ -1,11 +1,20 @@
 from datetime import datetime
+from django.conf import settings
 from django.contrib.auth.views import PasswordResetView
 from django.contrib.messages.views import SuccessMessageMixin
-from django.http import HttpResponse
-from django.shortcuts import get_object_or_404, render, redirect, HttpResponseRedirect
+from django.http import Http404, HttpResponse
+from django.shortcuts import render, redirect, HttpResponseRedirect
 from django.urls import reverse, reverse_lazy
+from django.utils.http import urlencode
 from .models import Category, Product, Client, Order
-from .forms import OrderForm, InterestForm, RegisterForm, UpdateUserForm, UpdateProfileForm
+from .forms import CartForm, CartFormSet, OrderForm, InterestForm, RegisterForm, UpdateUserForm, UpdateProfileForm
+from .catalog_cache import catalog_cache
+from .counters import get_interest_counter
+from .http_cache import cache_catalog_page
+from .middleware import LOGIN_AT, mark_login
+from .pagination import keyset_page, page_size_from
+from .reservations import ReservationStatus, reserve_cart, reserve_order
+from .search import AVAILABILITY, search_products
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 
@@ -18,8 +27,6 @@ def user_register(request):
         if form.is_valid():
             form.save(commit=True)
             return redirect("myapp:login")
-        else:
-            print('form invalid')
     else:
         form = RegisterForm()
     return render(request=request, template_name="myapp/register.html", context={"register_form": form})
@@ -33,9 +40,7 @@ def user_login(request):
         if user:
             if user.is_active:
                 login(request, user)
-                cur_datetime = datetime.now()
-                request.session['last_login'] = str(cur_datetime)
-                request.session.set_expiry(3600)
+                mark_login(request)
                 return HttpResponseRedirect(reverse('myapp:orders'))
             else:
                 return HttpResponse('Your account is disabled.')
@@ -62,25 +67,16 @@ class ResetPasswordView(SuccessMessageMixin, PasswordResetView):
     success_url = reverse_lazy('myapp:login')
 
 
+@cache_catalog_page()
 def index(request):
-    cat_list = Category.objects.all().order_by('id')[:10]
+    cat_list = catalog_cache.get_or_load('categories', lambda: list(Category.objects.all().order_by('id')[:10]))
     msg = ""
     last_login = "your logged out"
-    # print(request.user)
-    if request.session.get('last_login', False):
-        last_login = datetime.strptime(request.session.get('last_login').split(".")[0], '%Y-%m-%d %H:%M:%S')
-        # print(last_login, type(last_login))
-        # sleep(2)
-        # print(datetime.now(), type(datetime.now()))
-        time = datetime.now() - last_login
-        if time.total_seconds() > 3600:
-            msg = "Your last login was more than one hour ago"
-            logout(request)
-        # last_login = request.session.get('last_login')
-        # login_flag = True
-    # else:
-    #     last_login = "Your last login was more than one hour ago"
-    #     login_flag = False
+    # expiry itself is enforced by LoginExpiryMiddleware
+    if request.login_expired:
+        msg = "Your last login was more than one hour ago"
+    elif request.session.get(LOGIN_AT):
+        last_login = datetime.fromtimestamp(request.session[LOGIN_AT]).replace(microsecond=0)
     context = {
         'cat_list': cat_list,
         'last_login': last_login,
@@ -101,39 +97,96 @@ def about(request):
     return response
 
 
+@cache_catalog_page('cat_no')
 def detail(request, cat_no):
-    category = get_object_or_404(Category, pk=cat_no)
-    products = Product.objects.filter(category=category)
+    category = catalog_cache.get_or_load('category', lambda: Category.objects.filter(pk=cat_no).first(), cat_no)
+    if category is None:
+        raise Http404('No Category matches the given query.')
+    cursor = request.GET.get('cursor')
+    page_size = page_size_from(request, settings.CATALOG_PAGE_SIZE, settings.CATALOG_MAX_PAGE_SIZE)
+    products = catalog_cache.get_or_load(
+        'category-products',
+        lambda: keyset_page(Product.objects.filter(category=category, available=True), ('id',), cursor, page_size),
+        cat_no, page_size, cursor,
+    )
     # return render(request, 'myapp/detail0.html', {'category': category, 'products': products})
     return render(request, 'myapp/detail.html', {'category': category, 'products': products})
 
 
+@cache_catalog_page()
 def products(request):
-    prodlist = Product.objects.all().order_by('id')[:10]
+    cursor = request.GET.get('cursor')
+    page_size = page_size_from(request, settings.CATALOG_PAGE_SIZE, settings.CATALOG_MAX_PAGE_SIZE)
+    prodlist = catalog_cache.get_or_load(
+        'products',
+        lambda: keyset_page(Product.objects.filter(available=True), ('id',), cursor, page_size),
+        page_size, cursor,
+    )
     return render(request, 'myapp/products.html', {'prodlist': prodlist})
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    try:
+        category = int(request.GET['category'])
+    except (KeyError, ValueError):
+        category = None
+    available = request.GET.get('available', '1')
+    if available not in AVAILABILITY:
+        available = '1'
+    page_size = page_size_from(request, settings.CATALOG_PAGE_SIZE, settings.CATALOG_MAX_PAGE_SIZE)
+    results = search_products(query, category, AVAILABILITY[available], request.GET.get('cursor'), page_size)
+    next_url = None
+    if results.has_next:
+        next_url = '?' + urlencode({**request.GET.dict(), 'cursor': results.next_cursor})
+    categories = catalog_cache.get_or_load('all-categories', lambda: list(Category.objects.order_by('name')))
+    return render(request, 'myapp/search.html', {
+        'query': query, 'category': category, 'available': available, 'categories': categories,
+        'results': results, 'next_url': next_url,
+    })
+
+
 @login_required
 def place_order(request):
     msg = ''
-    prodlist = Product.objects.all()
     if request.method == 'POST':
-        form = OrderForm(request.POST)
+        form = OrderForm(request.POST, user=request.user)
         if form.is_valid():
-            product_name = form.cleaned_data['product']
             order = form.save(commit=False)
-            if order.num_units <= order.product.stock:
-                order.save()
-                product = Product.objects.get(name=product_name)
-                product.stock = product.stock - order.num_units
-                product.save()
+            result = reserve_order(order)
+            if result.reserved:
                 msg = 'Your order has been placed successfully.'
             else:
-                msg = 'We do not have sufficient stock to fill your order !!!'
+                if result.status is ReservationStatus.INSUFFICIENT:
+                    msg = 'We do not have sufficient stock to fill your order !!!'
+                else:
+                    msg = 'The store is busy right now, please try placing your order again.'
                 return render(request, 'myapp/order_response.html', {'msg': msg})
     else:
-        form = OrderForm()
-    return render(request, 'myapp/placeorder.html', {'form': form, 'msg': msg, 'prodlist': prodlist})
+        form = OrderForm(user=request.user)
+    return render(request, 'myapp/placeorder.html', {'form': form, 'msg': msg})
+
+
+@login_required
+def checkout(request):
+    msg = ''
+    if request.method == 'POST':
+        form = CartForm(request.POST, user=request.user)
+        lines = CartFormSet(request.POST, prefix='lines')
+        if form.is_valid() and lines.is_valid():
+            result = reserve_cart(form.cleaned_data['client'].pk, lines.lines())
+            if result.reserved:
+                msg = f'Your order of {len(result.orders)} products has been placed successfully.'
+                return render(request, 'myapp/order_response.html', {'msg': msg})
+            if result.status is ReservationStatus.INSUFFICIENT:
+                lines.add_shortfalls(result.shortfalls)
+                msg = 'We do not have sufficient stock for some of the products !!!'
+            else:
+                msg = 'The store is busy right now, please try placing your order again.'
+    else:
+        form = CartForm(user=request.user)
+        lines = CartFormSet(prefix='lines')
+    return render(request, 'myapp/checkout.html', {'form': form, 'lines': lines, 'msg': msg})
 
 
 @login_required
@@ -142,20 +195,19 @@ def productdetail(request, prod_id):
         msg = ''
         product = Product.objects.get(id=prod_id)
         # product = get_object_or_404(Product, pk=prod_id)
+        counter = get_interest_counter()
         if request.method == 'GET':
             form = InterestForm()
         elif request.method == 'POST':
             form = InterestForm(request.POST)
             if form.is_valid():
                 interested = form.cleaned_data['interested']
-                print("Interested: ", interested)
                 if int(interested) == 1:
-                    product.interested += 1
-                    product.save()
-                    print('form is valid')
+                    counter.increment(product.id)
                     return redirect(reverse('myapp:index'))
         # else:
         #     form = InterestForm()
+        product.interested += counter.pending(product.id)
         return render(request, 'myapp/productdetail.html', {'form': form, 'msg': msg, 'product': product})
     except Product.DoesNotExist:
         msg = 'The requested product does not exist. Please provide correct product id !!!'
@@ -167,17 +219,19 @@ def myorders(request):
         user = request.user
         if not user.is_authenticated:
             return redirect('myapp:login')
-        client = Client.objects.get(username=user.username)
-        orders = Order.objects.filter(client=client)
-        distinct_orders = []
-        for order in orders:
-            print(order.product.name)
-            if order.product.name not in distinct_orders:
-                distinct_orders.append(order.product.name)
+        client = Client.objects.get(pk=user.pk)
+        products = Product.objects.filter(order__client=client).distinct().order_by('name')
+        product_names = list(products.values_list('name', flat=True))
         msg = f'Orders placed by {client} :-'
-        if orders.count() == 0:
+        if not product_names:
             msg = f'{client} has not placed any orders'
-        return render(request, 'myapp/myorders.html', {'orders': distinct_orders, 'msg': msg})
+        history = keyset_page(
+            Order.objects.filter(client=client).select_related('product').with_line_total(),
+            ('-status_date', '-id'),
+            cursor=request.GET.get('cursor'),
+            page_size=settings.ORDER_HISTORY_PAGE_SIZE,
+        )
+        return render(request, 'myapp/myorders.html', {'orders': product_names, 'history': history, 'msg': msg})
     except Client.DoesNotExist:
         msg = 'You are not a registered client'
         return render(request, 'myapp/myorders.html', {'msg': msg})
@@ -188,16 +242,12 @@ def profile(request):
     if request.method == 'POST':
         user_form = UpdateUserForm(request.POST, instance=request.user)
         profile_form = UpdateProfileForm(request.POST, request.FILES, instance=request.user.profile)
-        print(profile_form)
-        print(request.user.profile)
 
         if user_form.is_valid() and profile_form.is_valid():
             user_form.save()
             profile_form.save()
             # messages.success(request, 'Your profile is updated successfully')
             return redirect('myapp:users-profile')
-        else:
-            print("invalid")
     else:
         user_form = UpdateUserForm(instance=request.user)
         profile_form = UpdateProfileForm(instance=request.user.profile)
@@ -0,0 +1,38 @@
+"""
+SQLite backend for production use.
+
+Same as Django's backend, plus two extra keys in the DATABASES entry:
+
+* ``PRAGMAS``: applied to every new connection by a ``connection_created``
+  receiver (journal mode, synchronous, mmap and cache size, ...).
+* ``TRANSACTION_MODE``: ``'IMMEDIATE'`` starts write transactions with
+  ``BEGIN IMMEDIATE``, so a transaction takes the write lock up front and waits
+  on the busy timeout instead of failing with "database is locked" when it
+  upgrades from a read lock half way through.
+"""
+from django.db.backends.signals import connection_created
+from django.db.backends.sqlite3 import base
+from django.dispatch import receiver
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def _start_transaction_under_autocommit(self):
+        mode = self.settings_dict.get('TRANSACTION_MODE')
+        if mode:
+            self.cursor().execute(f'BEGIN {mode}')
+        else:
+            super()._start_transaction_under_autocommit()
+
+
+def pragma_statements(pragmas):
+    return [f'PRAGMA {name} = {value}' for name, value in pragmas.items()]
+
+
+@receiver(connection_created)
+def apply_pragmas(sender, connection, **kwargs):
+    pragmas = connection.settings_dict.get('PRAGMAS')
+    if connection.vendor != 'sqlite' or not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for statement in pragma_statements(pragmas):
+            cursor.execute(statement)
@@ -42,11 +42,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'myapp.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'myapp.middleware.LoginExpiryMiddleware',
+    'myapp.middleware.ReplicaPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -55,7 +58,8 @@ ROOT_URLCONF = 'mysiteF22.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Django's backend, timing renders for myapp.metrics
+        'BACKEND': 'myapp.metrics.InstrumentedTemplates',
         'DIRS': [BASE_DIR / 'templates']
         ,
         'APP_DIRS': True,
@@ -80,9 +84,132 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Tests run checkouts on several threads, which need a real file rather
+        # than the shared in-memory database, with its table-level locking.
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
+# DJANGO_SQLITE_PROFILE=production switches to WAL journaling, a busy timeout,
+# persistent connections and BEGIN IMMEDIATE for write transactions. The
+# pragmas are applied by a connection_created hook in mysiteF22/db/sqlite3.
+SQLITE_PROFILE = os.getenv('DJANGO_SQLITE_PROFILE', 'default')
+
+if SQLITE_PROFILE == 'production':
+    DATABASES['default'].update({
+        'ENGINE': 'mysiteF22.db.sqlite3',
+        'CONN_MAX_AGE': int(os.getenv('DJANGO_DB_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # seconds to wait for a lock before "database is locked"
+            'timeout': float(os.getenv('DJANGO_SQLITE_BUSY_TIMEOUT', 20)),
+        },
+        'TRANSACTION_MODE': os.getenv('DJANGO_SQLITE_TRANSACTION_MODE', 'IMMEDIATE'),
+        'PRAGMAS': {
+            'journal_mode': os.getenv('DJANGO_SQLITE_JOURNAL_MODE', 'WAL'),
+            'synchronous': os.getenv('DJANGO_SQLITE_SYNCHRONOUS', 'NORMAL'),
+            'mmap_size': int(os.getenv('DJANGO_SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+            'cache_size': int(os.getenv('DJANGO_SQLITE_CACHE_SIZE', -64000)),
+            'temp_store': 'MEMORY',
+        },
+    })
+elif SQLITE_PROFILE != 'default':
+    raise ValueError(f'Unknown DJANGO_SQLITE_PROFILE {SQLITE_PROFILE!r}')
+
+# Read replicas. DJANGO_SQLITE_REPLICAS=N adds aliases replica1..N, local
+# copies of the primary refreshed by "manage.py sync_replicas --interval 5".
+# Catalog and order-history reads go to a replica unless the request has
+# written, or every replica is more than REPLICA_MAX_LAG seconds behind.
+DATABASE_REPLICAS = []
+
+for number in range(1, int(os.getenv('DJANGO_SQLITE_REPLICAS', 0)) + 1):
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': BASE_DIR / f'db.{alias}.sqlite3',
+        'TRANSACTION_MODE': None,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['myapp.routers.PrimaryReplicaRouter']
+
+REPLICA_MAX_LAG = float(os.getenv('DJANGO_REPLICA_MAX_LAG', 30))
+
+# How long a client's reads stay on the primary after it wrote.
+REPLICA_PIN_SECONDS = int(os.getenv('DJANGO_REPLICA_PIN_SECONDS', 10))
+
+
+# Caches
+# The catalog and sessions aliases are bounded caches; point them at a shared
+# backend (e.g. django.core.cache.backends.redis.RedisCache) through the
+# environment. MAX_ENTRIES only applies to Django's own backends: Redis and
+# Memcached hand OPTIONS to their client and evict by their memory limit.
+
+CATALOG_CACHE_BACKEND = os.getenv('CATALOG_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+SESSION_CACHE_BACKEND = os.getenv('SESSION_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+ENTRY_LIMITED_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.filebased.FileBasedCache',
+    'django.core.cache.backends.db.DatabaseCache',
+)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalog': {
+        'BACKEND': CATALOG_CACHE_BACKEND,
+        'LOCATION': os.getenv('CATALOG_CACHE_LOCATION', 'catalog'),
+        'TIMEOUT': int(os.getenv('CATALOG_CACHE_TIMEOUT', 300)),
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('CATALOG_CACHE_MAX_ENTRIES', 5000))}
+        if CATALOG_CACHE_BACKEND in ENTRY_LIMITED_CACHES else {},
+    },
+    'sessions': {
+        'BACKEND': SESSION_CACHE_BACKEND,
+        'LOCATION': os.getenv('SESSION_CACHE_LOCATION', 'sessions'),
+        'TIMEOUT': None,
+        # one entry per active session; past this LocMemCache culls a third of them
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('SESSION_CACHE_MAX_ENTRIES', 100000))}
+        if SESSION_CACHE_BACKEND in ENTRY_LIMITED_CACHES else {},
+    },
+}
+
+
+# Sessions
+# DJANGO_SESSION_ENGINE picks the store: db, cached_db (database behind the
+# sessions cache), cache (sessions cache only, lost on eviction) or
+# signed_cookies (no server-side state at all). The cache-backed engines need
+# SESSION_CACHE_BACKEND to be shared by every worker: with a per-process cache
+# a logout in one worker leaves the session valid in the others.
+
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+
+SHARED_CACHES = (
+    'django.core.cache.backends.redis.RedisCache',
+    'django.core.cache.backends.memcached.PyMemcacheCache',
+    'django.core.cache.backends.memcached.PyLibMCCache',
+)
+
+SESSION_ENGINE_NAME = os.getenv('DJANGO_SESSION_ENGINE', 'db')
+if SESSION_ENGINE_NAME in ('cached_db', 'cache') and SESSION_CACHE_BACKEND not in SHARED_CACHES:
+    raise ValueError(f'DJANGO_SESSION_ENGINE={SESSION_ENGINE_NAME} needs a shared SESSION_CACHE_BACKEND '
+                     f'(one of {", ".join(SHARED_CACHES)}), not {SESSION_CACHE_BACKEND}.')
+
+SESSION_ENGINE = SESSION_ENGINES[SESSION_ENGINE_NAME]
+
+SESSION_CACHE_ALIAS = 'sessions'
+
+SESSION_SAVE_EVERY_REQUEST = False
+
+# Seconds after login before LoginExpiryMiddleware logs the user out.
+LOGIN_MAX_AGE = int(os.getenv('DJANGO_LOGIN_MAX_AGE', 3600))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -142,6 +269,53 @@ EMAIL_PORT = 587
 EMAIL_USE_TLS = True
 PASSWORD_RESET_TIMEOUT = 14400
 
+# Write-behind buffer for "interested" clicks, see myapp/counters.py
+INTEREST_COUNTER = {
+    'SYNC': False,
+    'FLUSH_INTERVAL': 5.0,
+    'FLUSH_THRESHOLD': 100,
+}
+
+# Off-request avatar resizing, see myapp/avatars.py
+AVATAR_PIPELINE = {
+    'SYNC': False,
+    'WORKERS': 2,
+    'SIZES': (100, 200, 400),
+}
+
+# Number of orders per page on the order history page
+ORDER_HISTORY_PAGE_SIZE = 20
+
+# Products per page on the catalog pages; ?size= may ask for up to the maximum
+CATALOG_PAGE_SIZE = 10
+CATALOG_MAX_PAGE_SIZE = 100
+# Most lines one checkout may hold
+CART_MAX_LINES = 50
+# Suggestions per lookup request for the order form's client and product inputs
+LOOKUP_PAGE_SIZE = 20
+
+# Product search pages through at most this many of the best matches (see myapp/search.py).
+SEARCH_MAX_CANDIDATES = int(os.getenv('SEARCH_MAX_CANDIDATES', 2000))
+
+# Seconds browsers and edge caches may reuse anonymous catalog pages before
+# revalidating with If-Modified-Since.
+CATALOG_HTTP_MAX_AGE = int(os.getenv('CATALOG_HTTP_MAX_AGE', 60))
+
+# Per-view request metrics, see myapp/metrics.py. /metrics only answers
+# ALLOWED_IPS, and none by default: it checks REMOTE_ADDR, which behind a
+# reverse proxy on the same host is 127.0.0.1 for every visitor, so list the
+# scraper's address only where the app is reached directly, e.g.
+# METRICS_ALLOWED_IPS="127.0.0.1 ::1". METRICS_SERVER_TIMING=1 adds the
+# timings, SQL query count included, to every response, anonymous ones too;
+# keep it for development.
+METRICS = {
+    'SERVER_TIMING': os.getenv('METRICS_SERVER_TIMING', '0') == '1',
+    'ALLOWED_IPS': os.getenv('METRICS_ALLOWED_IPS', '').split(),
+}
+
+# Rows per UPDATE statement in admin bulk actions, see myapp/bulk.py
+BULK_UPDATE_CHUNK_SIZE = 1000
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
 